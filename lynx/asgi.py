@@ -12,5 +12,22 @@ import os
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'lynx.settings')
+# Serve the task pages with the async views of todo/async_views.py
+os.environ.setdefault('TODO_ASYNC_VIEWS', '1')
+# Push task changes to open pages through todo/events.py
+os.environ.setdefault('TODO_LIVE_UPDATES', '1')
 
-application = get_asgi_application()
+django_application = get_asgi_application()
+
+from todo.events import EventStream  # noqa: E402 (needs the app registry)
+
+event_stream = EventStream()
+
+
+async def application(scope, receive, send):
+    """
+    Route the live update stream to EventStream and the rest to Django.
+    """
+    if scope['type'] == 'http' and scope['path'] == '/events/':
+        return await event_stream(scope, receive, send)
+    return await django_application(scope, receive, send)
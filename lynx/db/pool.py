@@ -0,0 +1,199 @@
+"""
+A thread-safe database connection pool.
+
+The pool keeps up to ``size`` idle connections and lets up to ``max_overflow``
+more be opened under load; overflow connections are closed instead of being
+returned once the pool is full again. Checking a connection out optionally
+pings it first (``pre_ping``) and replaces connections that have been idle
+for longer than ``recycle`` seconds. Callers that find every connection in use
+wait up to ``timeout`` seconds for one to be returned.
+
+The pool is shared by every thread of a process, so it works the same under
+WSGI workers and under ASGI, where each request may run its database code in a
+different thread. A pool inherited through ``fork()`` is discarded, never used.
+"""
+import os
+import threading
+import time
+from collections import deque
+
+
+class PoolTimeout(Exception):
+    """
+    Raised when no connection is returned to the pool within its timeout.
+    """
+
+
+class ConnectionPool:
+    """
+    A pool of connections produced by ``creator``.
+
+    Attributes:
+        creator (callable): Opens a new connection.
+        size (int): The number of idle connections kept open.
+        max_overflow (int): How many connections may be opened beyond ``size``.
+        timeout (float): Seconds to wait for a connection before giving up.
+        recycle (float): Idle seconds after which a connection is replaced.
+        pre_ping (bool): Whether to check a connection before handing it out.
+    """
+
+    def __init__(self, creator, size=10, max_overflow=10, timeout=30.0,
+                 recycle=300.0, pre_ping=True):
+        self.creator = creator
+        self.size = size
+        self.max_overflow = max_overflow
+        self.timeout = timeout
+        self.recycle = recycle
+        self.pre_ping = pre_ping
+        self.pid = os.getpid()
+        self._idle = deque()
+        self._open = 0
+        self._available = threading.Condition(threading.Lock())
+        self._stats = dict.fromkeys(
+            ('checkouts', 'waits', 'wait_time', 'timeouts', 'created',
+             'recycled', 'failed_pings', 'discarded'), 0)
+
+    def checkout(self):
+        """
+        Return a connection, opening a new one if the pool allows it.
+
+        Raises:
+            PoolTimeout: If every connection is in use for longer than ``timeout``.
+        """
+        deadline = None
+        with self._available:
+            while True:
+                if self._idle:
+                    connection, idle_since = self._idle.pop()
+                    break
+                if self._open < self.size + self.max_overflow:
+                    self._open += 1
+                    connection = None
+                    break
+                if deadline is None:
+                    deadline = time.monotonic() + self.timeout
+                    self._stats['waits'] += 1
+                    wait_started = time.monotonic()
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self._stats['timeouts'] += 1
+                    self._stats['wait_time'] += time.monotonic() - wait_started
+                    raise PoolTimeout(f'No connection available within {self.timeout}s')
+                self._available.wait(remaining)
+            if deadline is not None:
+                self._stats['wait_time'] += time.monotonic() - wait_started
+            self._stats['checkouts'] += 1
+
+        if connection is not None:
+            if time.monotonic() - idle_since > self.recycle:
+                self._count('recycled')
+                self._close(connection)
+                connection = None
+            elif self.pre_ping and not self._ping(connection):
+                self._count('failed_pings')
+                self._close(connection)
+                connection = None
+        if connection is None:
+            try:
+                connection = self.creator()
+            except Exception:
+                self._release_slot()
+                raise
+            self._count('created')
+        return connection
+
+    def checkin(self, connection, reusable=True):
+        """
+        Give a connection back, closing it if the pool is full or it is broken.
+        """
+        with self._available:
+            if reusable and len(self._idle) < self.size:
+                self._idle.append((connection, time.monotonic()))
+                self._available.notify()
+                return
+        self._count('discarded')
+        self._close(connection)
+        self._release_slot()
+
+    def dispose(self):
+        """
+        Close every idle connection. Checked out connections are unaffected.
+        """
+        with self._available:
+            idle, self._idle = list(self._idle), deque()
+            self._open -= len(idle)
+            self._available.notify_all()
+        for connection, _ in idle:
+            self._close(connection)
+
+    def stats(self) -> dict:
+        """
+        Return the pool counters, with ``wait_time`` in milliseconds.
+        """
+        with self._available:
+            stats = dict(self._stats, idle=len(self._idle), open=self._open,
+                         checked_out=self._open - len(self._idle),
+                         size=self.size, max_overflow=self.max_overflow)
+        stats['wait_time'] = round(stats['wait_time'] * 1000, 3)
+        return stats
+
+    def _ping(self, connection) -> bool:
+        try:
+            with connection.cursor() as cursor:
+                cursor.execute('SELECT 1')
+            return True
+        except Exception:
+            return False
+
+    def _close(self, connection):
+        try:
+            connection.close()
+        except Exception:
+            pass
+
+    def _release_slot(self):
+        with self._available:
+            self._open -= 1
+            self._available.notify()
+
+    def _count(self, name):
+        with self._available:
+            self._stats[name] += 1
+
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def get_pool(alias: str, creator, options: dict) -> ConnectionPool:
+    """
+    Return the pool of the database ``alias``, creating it on first use.
+
+    A pool created before the process forked belongs to the parent: it is
+    dropped without closing the parent's connections and a new one is made.
+
+    Args:
+        alias (str): The database alias.
+        creator (callable): Opens a new connection.
+        options (dict): The POOL entry of the database settings.
+    """
+    with _pools_lock:
+        pool = _pools.get(alias)
+        if pool is None or pool.pid != os.getpid():
+            pool = _pools[alias] = ConnectionPool(
+                creator,
+                size=options.get('SIZE', 10),
+                max_overflow=options.get('MAX_OVERFLOW', 10),
+                timeout=options.get('TIMEOUT', 30.0),
+                recycle=options.get('RECYCLE', 300.0),
+                pre_ping=options.get('PRE_PING', True))
+        return pool
+
+
+def stats() -> dict:
+    """
+    Return the counters of every pool of this process, by database alias.
+    """
+    with _pools_lock:
+        pools = dict(_pools)
+    return {alias: pool.stats() for alias, pool in pools.items()}
@@ -0,0 +1,40 @@
+"""
+PostgreSQL backend that takes its connections from ``lynx.db.pool``.
+
+Use it as ``'ENGINE': 'lynx.db.postgresql'`` with a ``POOL`` dict in the
+database settings (SIZE, MAX_OVERFLOW, TIMEOUT, RECYCLE, PRE_PING). When Django
+closes the connection at the end of a request, it goes back to the pool
+instead of being torn down, so requests skip the TCP handshake,
+authentication and backend start-up of a new PostgreSQL session.
+"""
+from django.db.backends.postgresql import base
+from psycopg2 import extensions
+
+from lynx.db.pool import get_pool
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+
+    @property
+    def pool(self):
+        return get_pool(self.alias, self._create_connection, self.settings_dict.get('POOL', {}))
+
+    def _create_connection(self):
+        return super().get_new_connection(self.get_connection_params())
+
+    def get_new_connection(self, conn_params):
+        return self.pool.checkout()
+
+    def _close(self):
+        if self.connection is None:
+            return
+        with self.wrap_database_errors:
+            status = self.connection.info.transaction_status
+            reusable = not self.connection.closed
+            if reusable and status != extensions.TRANSACTION_STATUS_IDLE:
+                # Never hand out a connection with an open or failed transaction.
+                try:
+                    self.connection.rollback()
+                except Exception:
+                    reusable = False
+            self.pool.checkin(self.connection, reusable=reusable)
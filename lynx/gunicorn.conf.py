@@ -0,0 +1,51 @@
+"""
+Gunicorn settings of the production serving profile.
+
+Run ``gunicorn -c lynx/gunicorn.conf.py`` to serve lynx.wsgi with sync
+workers, or set SERVER_MODE=asgi to serve lynx.asgi with uvicorn workers. The
+number of workers follows the CPUs the process may run on; every setting can
+be overridden from the environment (see the Configuration section of the
+README).
+"""
+import multiprocessing
+import os
+
+asgi = os.environ.get('SERVER_MODE', 'wsgi') == 'asgi'
+
+wsgi_app = 'lynx.asgi:application' if asgi else 'lynx.wsgi:application'
+worker_class = 'uvicorn.workers.UvicornWorker' if asgi else 'sync'
+bind = os.environ.get('BIND', '0.0.0.0:8000')
+
+try:
+    cores = len(os.sched_getaffinity(0))
+except AttributeError:
+    cores = multiprocessing.cpu_count()
+
+# A sync worker waits on the database for part of each request, so two per
+# core keep the CPUs busy; an event loop per core is enough for ASGI
+workers = int(os.environ.get('WEB_CONCURRENCY', cores if asgi else 2 * cores + 1))
+threads = int(os.environ.get('WEB_THREADS', 1))
+timeout = int(os.environ.get('WEB_TIMEOUT', 30))
+keepalive = int(os.environ.get('WEB_KEEPALIVE', 5))
+
+# Restart workers now and then, at different times, to bound memory growth
+max_requests = int(os.environ.get('WEB_MAX_REQUESTS', 10000))
+max_requests_jitter = max_requests // 10
+
+# Load the application once in the master so workers fork ready to serve
+preload_app = os.environ.get('WEB_PRELOAD', '1') == '1'
+
+accesslog = '-' if os.environ.get('WEB_ACCESS_LOG', '0') == '1' else None
+
+
+def when_ready(server):
+    # With the app preloaded, load the password hashers and the common
+    # password list in the master too, so the workers fork with them
+    if preload_app:
+        from todo.hashers import preload
+        preload()
+
+
+def post_worker_init(worker):
+    from todo.hashers import preload
+    preload()
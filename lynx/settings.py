@@ -12,7 +12,7 @@ https://docs.djangoproject.com/en/4.1/ref/settings/
 
 import os
 from pathlib import Path
-from django.core.management.utils import get_random_secret_key
+from django.core.exceptions import ImproperlyConfigured
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
@@ -21,12 +21,17 @@ BASE_DIR = Path(__file__).resolve().parent.parent
 # Quick-start development settings - unsuitable for production
 # See https://docs.djangoproject.com/en/4.1/howto/deployment/checklist/
 
-# SECURITY WARNING: keep the secret key used in production secret!
-SECRET_KEY = os.environ.get('SECRET_KEY', default=get_random_secret_key())
-
-
 # SECURITY WARNING: don't run with debug turned on in production!
-DEBUG = True
+DEBUG = os.environ.get('DEBUG', '1') == '1'
+
+# SECURITY WARNING: keep the secret key used in production secret!
+# Development runs share a fixed key, so every worker and restart signs
+# sessions alike; production must set SECRET_KEY.
+SECRET_KEY = os.environ.get('SECRET_KEY')
+if not SECRET_KEY:
+    if not DEBUG:
+        raise ImproperlyConfigured('SECRET_KEY must be set when DEBUG is off')
+    SECRET_KEY = 'django-insecure-lynx-development-key'
 
 ALLOWED_HOSTS = ['*']
 
@@ -62,8 +67,15 @@ TEMPLATES = [
         'DIRS': [
             os.path.join(BASE_DIR, 'templates')
         ],
-        'APP_DIRS': True,
         'OPTIONS': {
+            # Templates are compiled once per process; runserver reloads
+            # them when they change
+            'loaders': [
+                ('django.template.loaders.cached.Loader', [
+                    'django.template.loaders.filesystem.Loader',
+                    'django.template.loaders.app_directories.Loader',
+                ]),
+            ],
             'context_processors': [
                 'django.template.context_processors.debug',
                 'django.template.context_processors.request',
@@ -80,7 +92,14 @@ WSGI_APPLICATION = 'lynx.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/4.1/ref/settings/#databases
 
-if os.environ.get('DB_HOST') is not None:
+if os.environ.get('DB_ENGINE') == 'sqlite3':
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': os.environ.get('DB_NAME', BASE_DIR / 'db.sqlite3'),
+        }
+    }
+elif os.environ.get('DB_HOST') is not None:
     DATABASES = {
         'default': {
             'ENGINE': 'django.db.backends.postgresql_psycopg2',
@@ -88,7 +107,9 @@ if os.environ.get('DB_HOST') is not None:
             'HOST': os.environ.get('DB_HOST'),
             'NAME': os.environ.get('DB_NAME'),
             'PASSWORD': os.environ.get('DB_PASSWORD'),
-            'USER': os.environ.get('DB_USER')
+            'USER': os.environ.get('DB_USER'),
+            'CONN_MAX_AGE': int(os.environ.get('DB_CONN_MAX_AGE', 0)),
+            'CONN_HEALTH_CHECKS': os.environ.get('DB_CONN_HEALTH_CHECKS', '1') == '1',
         }
     }
 else:
@@ -107,8 +128,62 @@ else:
     }
 
 
-print(
-    f"################## DATABASE: {DATABASES['default']['NAME']} ##################")
+# Connection pooling (lynx/db/pool.py). Connections go back to the pool at
+# the end of every request, so CONN_MAX_AGE stays 0 when it is enabled.
+if os.environ.get('DB_POOL', '0') == '1' and 'postgresql' in DATABASES['default']['ENGINE']:
+    DATABASES['default'].update({
+        'ENGINE': 'lynx.db.postgresql',
+        'CONN_MAX_AGE': 0,
+        'POOL': {
+            'SIZE': int(os.environ.get('DB_POOL_SIZE', 10)),
+            'MAX_OVERFLOW': int(os.environ.get('DB_POOL_MAX_OVERFLOW', 10)),
+            'TIMEOUT': float(os.environ.get('DB_POOL_TIMEOUT', 30)),
+            'RECYCLE': float(os.environ.get('DB_POOL_RECYCLE', 300)),
+            'PRE_PING': os.environ.get('DB_POOL_PRE_PING', '1') == '1',
+        },
+    })
+
+# Cache
+# https://docs.djangoproject.com/en/4.1/topics/cache/
+# LocMemCache is per process: use 'file' or 'redis' when running several
+# workers with TODO_PAGE_CACHE enabled.
+
+CACHE_BACKENDS = {
+    'locmem': 'django.core.cache.backends.locmem.LocMemCache',
+    'file': 'django.core.cache.backends.filebased.FileBasedCache',
+    'redis': 'django.core.cache.backends.redis.RedisCache',
+}
+
+CACHES = {
+    'default': {
+        'BACKEND': CACHE_BACKENDS[os.environ.get('CACHE_BACKEND', 'locmem')],
+        'LOCATION': os.environ.get('CACHE_LOCATION', ''),
+    }
+}
+
+# locmem and file caches hold 300 entries by default, fewer than the rows of
+# a few long task lists in the fragment cache
+if os.environ.get('CACHE_BACKEND', 'locmem') in ('locmem', 'file'):
+    CACHES['default']['OPTIONS'] = {
+        'MAX_ENTRIES': int(os.environ.get('CACHE_MAX_ENTRIES', 10000)),
+    }
+
+# Sessions
+# https://docs.djangoproject.com/en/4.1/topics/http/sessions/
+# 'db' reads django_session on every authenticated request; 'cached_db'
+# serves reads from the cache and writes through to the database; 'cache'
+# keeps sessions in the cache only; 'signed_cookies' keeps them in the
+# client's cookie. The session is only written when it changed.
+
+SESSION_ENGINES = {
+    'db': 'django.contrib.sessions.backends.db',
+    'cached_db': 'django.contrib.sessions.backends.cached_db',
+    'cache': 'django.contrib.sessions.backends.cache',
+    'signed_cookies': 'django.contrib.sessions.backends.signed_cookies',
+}
+
+SESSION_ENGINE = SESSION_ENGINES[os.environ.get('SESSION_BACKEND', 'db')]
+SESSION_SAVE_EVERY_REQUEST = os.environ.get('SESSION_SAVE_EVERY_REQUEST', '0') == '1'
 
 # Password validation
 # https://docs.djangoproject.com/en/4.1/ref/settings/#auth-password-validators
@@ -128,6 +203,39 @@ AUTH_PASSWORD_VALIDATORS = [
     },
 ]
 
+# Password hashing
+# https://docs.djangoproject.com/en/4.1/topics/auth/passwords/
+# New passwords are hashed with PASSWORD_HASHER; the others still verify the
+# hashes made before, which are rehashed on the user's next login, as are
+# hashes made with another cost. On one core PBKDF2 with Django's 390,000
+# iterations takes about 110 ms per check, argon2 with 100 MiB about 175 ms,
+# and scrypt about 40 ms, which is why it is the default.
+
+PASSWORD_HASHER_CHOICES = {
+    'pbkdf2': 'todo.hashers.PBKDF2PasswordHasher',
+    'scrypt': 'todo.hashers.ScryptPasswordHasher',
+    'argon2': 'todo.hashers.Argon2PasswordHasher',
+}
+
+PASSWORD_HASHER = os.environ.get('PASSWORD_HASHER', 'scrypt')
+PASSWORD_HASHERS = [
+    PASSWORD_HASHER_CHOICES[PASSWORD_HASHER],
+    *(hasher for name, hasher in PASSWORD_HASHER_CHOICES.items() if name != PASSWORD_HASHER),
+    'django.contrib.auth.hashers.PBKDF2SHA1PasswordHasher',
+]
+PASSWORD_PBKDF2_ITERATIONS = int(os.environ.get('PASSWORD_PBKDF2_ITERATIONS', 390000))
+PASSWORD_SCRYPT_WORK_FACTOR = int(os.environ.get('PASSWORD_SCRYPT_WORK_FACTOR', 2 ** 14))
+PASSWORD_ARGON2_MEMORY_COST = int(os.environ.get('PASSWORD_ARGON2_MEMORY_COST', 102400))
+
+# Posts of the login and registration forms allowed per client IP and per
+# username in each window (todo/throttle.py); 0 lifts a limit
+TODO_LOGIN_RATE_WINDOW = int(os.environ.get('TODO_LOGIN_RATE_WINDOW', 60))
+TODO_LOGIN_RATE_IP = int(os.environ.get('TODO_LOGIN_RATE_IP', 30))
+TODO_LOGIN_RATE_USERNAME = int(os.environ.get('TODO_LOGIN_RATE_USERNAME', 10))
+# request.META key of the header in which a trusted reverse proxy passes on
+# the client's address, e.g. HTTP_X_FORWARDED_FOR; empty uses REMOTE_ADDR
+TODO_TRUSTED_PROXY_HEADER = os.environ.get('TODO_TRUSTED_PROXY_HEADER', '')
+
 
 # Internationalization
 # https://docs.djangoproject.com/en/4.1/topics/i18n/
@@ -145,6 +253,26 @@ USE_TZ = True
 # https://docs.djangoproject.com/en/4.1/howto/static-files/
 
 STATIC_URL = 'static/'
+STATIC_ROOT = os.environ.get('STATIC_ROOT', BASE_DIR / 'staticfiles')
+
+# Production serving (lynx/gunicorn.conf.py), on by default when DEBUG is off:
+# static files are served by WhiteNoise from STATIC_ROOT, with hashed names
+# cached for a year and gzip and brotli copies made by collectstatic; pages
+# are compressed and get an ETag, so unchanged ones are answered with 304.
+SERVE_STATIC = os.environ.get('SERVE_STATIC', '0' if DEBUG else '1') == '1'
+if SERVE_STATIC:
+    MIDDLEWARE.insert(1, 'whitenoise.middleware.WhiteNoiseMiddleware')
+    STATICFILES_STORAGE = 'whitenoise.storage.CompressedManifestStaticFilesStorage'
+
+COMPRESS_RESPONSES = os.environ.get('COMPRESS_RESPONSES', '0' if DEBUG else '1') == '1'
+if COMPRESS_RESPONSES:
+    # After the security headers and static files, before anything that
+    # reads or changes the body
+    index = MIDDLEWARE.index('django.contrib.sessions.middleware.SessionMiddleware')
+    MIDDLEWARE[index:index] = [
+        'django.middleware.gzip.GZipMiddleware',
+        'django.middleware.http.ConditionalGetMiddleware',
+    ]
 
 # Default primary key field type
 # https://docs.djangoproject.com/en/4.1/ref/settings/#default-auto-field
@@ -156,3 +284,62 @@ LOGIN_URL = 'auth:login'
 LOGOUT_REDIRECT_URL = 'auth:login'
 LOGOUT_URL = 'auth:logout'
 
+# Pagination mode of the task list: 'offset' (numbered pages) or 'cursor'
+TODO_LIST_PAGINATION = os.environ.get('TODO_LIST_PAGINATION', 'offset')
+
+# Per-user rendered page cache of the task list and detail pages
+TODO_PAGE_CACHE = os.environ.get('TODO_PAGE_CACHE', '0') == '1'
+TODO_PAGE_CACHE_TIMEOUT = int(os.environ.get('TODO_PAGE_CACHE_TIMEOUT', 60 * 60 * 24))
+TODO_CACHE_ALIAS = 'default'
+
+# Route the task pages to the async views of todo/async_views.py (on by
+# default under lynx/asgi.py)
+TODO_ASYNC_VIEWS = os.environ.get('TODO_ASYNC_VIEWS', '0') == '1'
+
+
+# Delta-sync feed: how far back a caught-up client's next sync starts, and
+# how long tombstones of deleted tasks are kept
+TODO_SYNC_OVERLAP_SECONDS = int(os.environ.get('TODO_SYNC_OVERLAP_SECONDS', 5))
+TODO_TOMBSTONE_RETENTION_DAYS = int(os.environ.get('TODO_TOMBSTONE_RETENTION_DAYS', 30))
+
+# Live updates: the /events/ stream served by lynx/asgi.py (on by default
+# there), the broker fanning events out to it, and its per-process limits
+TODO_LIVE_UPDATES = os.environ.get('TODO_LIVE_UPDATES', '0') == '1'
+TODO_EVENT_BROKER = os.environ.get('TODO_EVENT_BROKER', 'todo.broker.LocalBroker')
+TODO_EVENTS_QUEUE_SIZE = int(os.environ.get('TODO_EVENTS_QUEUE_SIZE', 100))
+TODO_EVENTS_HEARTBEAT_SECONDS = int(os.environ.get('TODO_EVENTS_HEARTBEAT_SECONDS', 15))
+TODO_EVENTS_MAX_CONNECTIONS = int(os.environ.get('TODO_EVENTS_MAX_CONNECTIONS', 10000))
+
+# Per-request profiling (todo/profiling.py): a Server-Timing header and a log
+# line per request, and rolling latency figures per route at /api/profile/
+TODO_PROFILING = os.environ.get('TODO_PROFILING', '0') == '1'
+TODO_PROFILING_WINDOW_SECONDS = int(os.environ.get('TODO_PROFILING_WINDOW_SECONDS', 300))
+TODO_PROFILING_SAMPLES = int(os.environ.get('TODO_PROFILING_SAMPLES', 1000))
+if TODO_PROFILING:
+    MIDDLEWARE.insert(0, 'todo.profiling.ProfilingMiddleware')
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {'class': 'logging.StreamHandler'},
+    },
+    'loggers': {},
+}
+if TODO_PROFILING:
+    # Only with the middleware, so tests and unprofiled runs stay quiet
+    LOGGING['loggers']['todo.profiling'] = {
+        'handlers': ['console'], 'level': 'INFO', 'propagate': False}
+
+# Fragment cache of the task list rows (todo/templatetags/task_rows.py), on
+# by default when DEBUG is off
+TODO_FRAGMENT_CACHE = os.environ.get('TODO_FRAGMENT_CACHE', '0' if DEBUG else '1') == '1'
+TODO_FRAGMENT_CACHE_TIMEOUT = int(os.environ.get('TODO_FRAGMENT_CACHE_TIMEOUT', 60 * 60 * 24))
+
+# Offset pagination of the task list takes PostgreSQL's row estimate instead
+# of COUNT(*) once it reaches this many tasks; 0 always counts
+TODO_COUNT_ESTIMATE_THRESHOLD = int(os.environ.get('TODO_COUNT_ESTIMATE_THRESHOLD', 0))
+
+# How long the per-user category list of the task forms is cached; it is
+# dropped whenever one of the user's categories changes
+TODO_CATEGORY_CACHE_TIMEOUT = int(os.environ.get('TODO_CATEGORY_CACHE_TIMEOUT', 60 * 60 * 24))
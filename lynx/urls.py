@@ -16,14 +16,17 @@ Including another URLconf
 from django.contrib import admin
 from django.urls import path
 from django.urls import include
-from todo.views import RegisterView
-from django.contrib.auth import views as auth_views
+from todo.views import LoginView, RegisterView
+from django.contrib.auth import urls as auth_urls
 
 
 
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('', include(('todo.urls', 'todo'), namespace='todo')),
-    path('accounts/', include(('django.contrib.auth.urls', 'auth'), namespace='auth')),
+    path('accounts/', include(([
+        path('login/', LoginView.as_view(), name='login'),
+        *auth_urls.urlpatterns,
+    ], 'auth'), namespace='auth')),
     path('accounts/register/', RegisterView.as_view(), name='register'),
 ]
@@ -1,7 +1,34 @@
 from django.contrib import admin
 from .models import Task, Category
 
-admin.site.register(Task)
-admin.site.register(Category)
 
+@admin.register(Task)
+class TaskAdmin(admin.ModelAdmin):
+    """
+    Admin of the tasks of every user.
 
+    The owner and category of each row are joined into the page query, the
+    paginator does not count the whole table, and owners and categories are
+    picked by autocomplete rather than rendered as a select of every row.
+    """
+    list_display = ('title', 'user', 'category', 'priority', 'complete', 'due_date')
+    list_filter = ('complete', 'priority')
+    list_select_related = ('user', 'category')
+    list_per_page = 50
+    show_full_result_count = False
+    search_fields = ('title',)
+    autocomplete_fields = ('user', 'category')
+    readonly_fields = ('uuid', 'created_at', 'updated_at')
+
+
+@admin.register(Category)
+class CategoryAdmin(admin.ModelAdmin):
+    """
+    Admin of the task categories of every user.
+    """
+    list_display = ('name', 'user', 'updated_at')
+    list_select_related = ('user',)
+    list_per_page = 50
+    show_full_result_count = False
+    search_fields = ('name',)
+    autocomplete_fields = ('user',)
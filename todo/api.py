@@ -0,0 +1,526 @@
+"""
+A JSON API over tasks and categories.
+
+Every response of a task or category carries a strong ``ETag`` and a
+``Last-Modified`` header derived from ``updated_at``. Conditional requests are
+answered before any row is serialized:
+
+- the list views compute their validators from one aggregate query (row count,
+  latest ``updated_at`` and, for tasks, latest deletion) and answer
+  ``If-None-Match`` or ``If-Modified-Since`` with 304 without fetching the
+  rows;
+- ``If-Match`` on PUT, PATCH and DELETE answers 412 when the resource changed
+  since the client read it.
+
+``?fields=title,complete`` selects the fields of each task; ``uuid`` is always
+included. Only the selected columns are read from the database. The ETag
+depends on the selection, so use the same ``?fields=`` for a conditional
+request as for the response it revalidates.
+
+The API uses the session of the HTML pages: anonymous requests get 401 and
+unsafe methods need the CSRF token in the ``X-CSRFToken`` header.
+"""
+import hashlib
+import json
+from calendar import timegm
+
+from django.db import transaction
+from django.db.models import Count, Max, Subquery
+from django.http import Http404, HttpRequest, HttpResponse, JsonResponse
+from django.core.exceptions import ValidationError
+from django.urls import reverse
+from django.utils import timezone
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date
+from django.views.generic import View
+
+from lynx.db import pool as db_pool
+
+from . import cache as page_cache, profiling
+from .broker import publish_task_event
+from .cache import bump_generation
+from .stats import apply_completion, get_summary, summary_data
+from .forms import TaskApiForm, CategoryForm
+from .models import Task, Category, TaskTombstone
+from .pagination import CursorPaginator, InvalidCursor
+from .sync import StaleToken, changes
+
+TASK_FIELDS = (
+    'uuid', 'title', 'description', 'complete', 'due_date',
+    'priority', 'category', 'created_at', 'updated_at',
+)
+CATEGORY_FIELDS = ('uuid', 'name', 'created_at', 'updated_at')
+
+
+class ApiError(Exception):
+    """
+    An error answered with a JSON body and the given status code.
+    """
+
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.message = message
+        self.status = status
+
+
+def serialize_task(task: Task, fields: tuple) -> dict:
+    """
+    Return the selected fields of a task as a JSON-serialisable dict.
+
+    Args:
+        task (Task): The task, loaded with at least the selected fields.
+        fields (tuple): A subset of TASK_FIELDS.
+
+    Returns:
+        dict: The field values; the category is given by its uuid.
+    """
+    data = {}
+    for name in fields:
+        if name == 'category':
+            data[name] = task.category.uuid if task.category_id else None
+        else:
+            data[name] = getattr(task, name)
+    return data
+
+
+def serialize_category(category: Category) -> dict:
+    return {name: getattr(category, name) for name in CATEGORY_FIELDS}
+
+
+def make_etag(*parts) -> str:
+    """
+    Build a quoted strong ETag from the version and representation of a resource.
+    """
+    raw = ':'.join(str(part) for part in parts).encode()
+    return '"%s"' % hashlib.md5(raw).hexdigest()
+
+
+def timestamp(value) -> int:
+    return timegm(value.utctimetuple()) if value else None
+
+
+class ApiView(View):
+    """
+    Base view of the JSON API.
+
+    Handles authentication, JSON request bodies, ``?fields=`` and the
+    validators of conditional requests.
+
+    Attributes:
+        paginate_by (int): The default page size of list views.
+        max_paginate_by (int): The largest page size a client may ask for.
+
+    Methods:
+        read_json: Parse the request body.
+        get_fields: Parse the ``?fields=`` parameter.
+        get_limit: Parse the ``?limit=`` page size.
+        conditional: Answer a conditional request from its validators.
+        respond: Build a JSON response carrying the validators.
+    """
+    paginate_by = 100
+    max_paginate_by = 10000
+
+    def dispatch(self, request, *args, **kwargs):
+        if not request.user.is_authenticated:
+            return JsonResponse({'error': 'Authentication required'}, status=401)
+        try:
+            return super().dispatch(request, *args, **kwargs)
+        except Http404:
+            return JsonResponse({'error': 'Not found'}, status=404)
+        except ApiError as exc:
+            return JsonResponse({'error': exc.message}, status=exc.status)
+
+    def http_method_not_allowed(self, request, *args, **kwargs):
+        response = super().http_method_not_allowed(request, *args, **kwargs)
+        return JsonResponse({'error': 'Method not allowed'}, status=405,
+                            headers={'Allow': response['Allow']})
+
+    def read_json(self) -> dict:
+        """
+        Parse the request body.
+
+        Raises:
+            ApiError: If the body is not a JSON object.
+        """
+        try:
+            data = json.loads(self.request.body or b'{}')
+        except ValueError:
+            raise ApiError('Invalid JSON body')
+        if not isinstance(data, dict):
+            raise ApiError('The JSON body must be an object')
+        return data
+
+    def get_fields(self) -> tuple:
+        """
+        Parse the ``?fields=`` parameter into a subset of TASK_FIELDS.
+
+        Raises:
+            ApiError: If an unknown field is requested.
+        """
+        value = self.request.GET.get('fields')
+        if not value:
+            return TASK_FIELDS
+        requested = {name.strip() for name in value.split(',') if name.strip()}
+        unknown = requested.difference(TASK_FIELDS)
+        if unknown:
+            raise ApiError(f'Unknown fields: {", ".join(sorted(unknown))}')
+        return tuple(name for name in TASK_FIELDS if name in requested or name == 'uuid')
+
+    def get_limit(self) -> int:
+        """
+        Parse the ``?limit=`` page size, bounded by ``max_paginate_by``.
+        """
+        try:
+            limit = int(self.request.GET.get('limit', self.paginate_by))
+        except ValueError:
+            raise ApiError('limit must be a number')
+        return max(1, min(limit, self.max_paginate_by))
+
+    def conditional(self, etag: str, last_modified) -> HttpResponse:
+        """
+        Answer a conditional request from its validators.
+
+        Returns:
+            HttpResponse: A 304 or 412 response, or None to go on with the request.
+        """
+        response = get_conditional_response(
+            self.request, etag=etag, last_modified=timestamp(last_modified))
+        if response is not None and response.status_code == 304:
+            self.add_validators(response, etag, last_modified)
+        return response
+
+    def respond(self, data, etag: str = None, last_modified=None, status=200) -> JsonResponse:
+        """
+        Build a JSON response carrying the validators.
+        """
+        response = JsonResponse(data, status=status, safe=False)
+        self.add_validators(response, etag, last_modified)
+        return response
+
+    def add_validators(self, response, etag, last_modified) -> None:
+        if etag:
+            response['ETag'] = etag
+        if last_modified:
+            response['Last-Modified'] = http_date(timestamp(last_modified))
+        # Clients may store the response but must revalidate it before reuse
+        patch_cache_control(response, private=True, no_cache=True)
+
+
+class TaskApiMixin:
+    """
+    The task queryset and validators shared by the task API views.
+    """
+
+    def get_queryset(self, fields: tuple):
+        """
+        Return the user's tasks, reading only the selected columns.
+        """
+        queryset = Task.objects.filter(user=self.request.user)
+        columns = ['id', 'user', 'due_date', 'updated_at']
+        columns += [name for name in fields if name != 'category']
+        if 'category' in fields:
+            queryset = queryset.select_related('category')
+            columns += ['category__uuid']
+        return queryset.only(*columns)
+
+    def task_etag(self, task: Task, fields: tuple) -> str:
+        return make_etag(task.uuid, task.updated_at.isoformat(), ','.join(fields))
+
+    def get_task(self, fields: tuple) -> Task:
+        try:
+            return self.get_queryset(fields).get(uuid=self.kwargs['pk'])
+        except (Task.DoesNotExist, ValidationError):
+            raise Http404('No task found')
+
+
+class TaskListApiView(TaskApiMixin, ApiView):
+    """
+    List the user's tasks or create one.
+
+    The list is paginated with the same keyset as the task list page:
+    ``?cursor=`` takes the ``next_cursor`` or ``previous_cursor`` of a previous
+    response and ``?limit=`` sets the page size.
+    """
+
+    def get(self, request: HttpRequest) -> HttpResponse:
+        """
+        Return a page of tasks, or 304 if nothing changed since the client's copy.
+        """
+        fields = self.get_fields()
+        limit = self.get_limit()
+        cursor = request.GET.get('cursor', '')
+        # A deleted task leaves no updated_at behind, so the list was also
+        # modified by the latest deletion
+        deleted = TaskTombstone.objects.filter(user=request.user).order_by(
+            '-deleted_at').values('deleted_at')[:1]
+        version = Task.objects.filter(user=request.user).aggregate(
+            count=Count('id'), last_modified=Max('updated_at'),
+            last_deleted=Max(Subquery(deleted)))
+        last_modified = max(filter(None, (version['last_modified'], version['last_deleted'])),
+                            default=None)
+        etag = make_etag(version['count'], last_modified and last_modified.isoformat(),
+                         ','.join(fields), limit, cursor)
+        response = self.conditional(etag, last_modified)
+        if response is not None:
+            return response
+
+        paginator = CursorPaginator(self.get_queryset(fields), limit)
+        try:
+            page = paginator.page(cursor)
+        except InvalidCursor:
+            raise ApiError('Invalid cursor')
+        return self.respond({
+            'results': [serialize_task(task, fields) for task in page],
+            'next_cursor': page.next_cursor,
+            'previous_cursor': page.previous_cursor,
+        }, etag, last_modified)
+
+    def post(self, request: HttpRequest) -> HttpResponse:
+        """
+        Create a task from the JSON body.
+
+        Returns:
+            HttpResponse: 201 with the new task and its Location, or 400.
+        """
+        fields = self.get_fields()
+        form = TaskApiForm(self.read_json(), user=request.user)
+        if not form.is_valid():
+            return JsonResponse({'errors': form.errors}, status=400)
+        form.instance.user = request.user
+        task = form.save()
+        response = self.respond(serialize_task(task, fields),
+                                self.task_etag(task, fields), task.updated_at, status=201)
+        response['Location'] = reverse('todo:api-task', kwargs={'pk': task.uuid})
+        return response
+
+
+class TaskDetailApiView(TaskApiMixin, ApiView):
+    """
+    Read, update or delete one of the user's tasks.
+
+    PUT replaces every writable field, PATCH only the fields in the body.
+    """
+
+    def get(self, request: HttpRequest, pk: str) -> HttpResponse:
+        fields = self.get_fields()
+        task = self.get_task(fields)
+        etag = self.task_etag(task, fields)
+        response = self.conditional(etag, task.updated_at)
+        if response is not None:
+            return response
+        return self.respond(serialize_task(task, fields), etag, task.updated_at)
+
+    def put(self, request: HttpRequest, pk: str) -> HttpResponse:
+        return self.update(partial=False)
+
+    def patch(self, request: HttpRequest, pk: str) -> HttpResponse:
+        return self.update(partial=True)
+
+    def update(self, partial: bool) -> HttpResponse:
+        """
+        Validate the JSON body against the task and save it.
+
+        Returns:
+            HttpResponse: The updated task, 400 or 412.
+        """
+        fields = self.get_fields()
+        data = self.read_json()
+        with transaction.atomic():
+            task = self.get_task(TASK_FIELDS)
+            response = self.conditional(self.task_etag(task, fields), task.updated_at)
+            if response is not None:
+                return response
+            if partial:
+                current = serialize_task(task, TaskApiForm.base_fields)
+                data = dict(current, **data)
+            form = TaskApiForm(data, instance=task, user=self.request.user)
+            if not form.is_valid():
+                return JsonResponse({'errors': form.errors}, status=400)
+            task = form.save()
+        return self.respond(serialize_task(task, fields),
+                            self.task_etag(task, fields), task.updated_at)
+
+    def delete(self, request: HttpRequest, pk: str) -> HttpResponse:
+        fields = self.get_fields()
+        with transaction.atomic():
+            # Every field is loaded so the delete signals can update the summary
+            task = self.get_task(TASK_FIELDS)
+            response = self.conditional(self.task_etag(task, fields), task.updated_at)
+            if response is not None:
+                return response
+            task.delete()
+        return HttpResponse(status=204)
+
+
+class TaskCompleteApiView(ApiView):
+    """
+    Mark one of the user's tasks complete, or not complete with
+    ``{"complete": false}``, in a single UPDATE.
+    """
+
+    def post(self, request: HttpRequest, pk: str) -> HttpResponse:
+        complete = self.read_json().get('complete', True)
+        if not isinstance(complete, bool):
+            raise ApiError('complete must be true or false')
+        try:
+            tasks = Task.objects.filter(uuid=pk, user=request.user)
+            updated = tasks.exclude(complete=complete).update(
+                complete=complete, updated_at=timezone.now())
+            if not updated and not tasks.exists():
+                raise Http404('No task found')
+        except ValidationError:
+            raise Http404('No task found')
+        if not updated:
+            return HttpResponse(status=204)
+        # QuerySet.update() sends no post_save signal
+        bump_generation(request.user.pk)
+        apply_completion(request.user.pk, complete, tasks)
+        publish_task_event(request.user.pk, 'completed', [pk], complete=complete)
+        return HttpResponse(status=204)
+
+
+class TaskChangesApiView(TaskApiMixin, ApiView):
+    """
+    The delta-sync feed: the tasks changed and deleted since ``?since=``.
+
+    Without ``since`` every task is sent. Each response has a ``next`` token
+    to pass as ``since`` on the next call; while ``has_more`` is true the
+    client should call again right away. Apply ``deleted`` before ``changes``.
+    A token older than the tombstone retention gets 410 and the client must
+    start over without ``since``.
+
+    Attributes:
+        paginate_by (int): The default number of tasks and tombstones per page.
+        max_paginate_by (int): The largest page a client may ask for.
+    """
+    paginate_by = 500
+    max_paginate_by = 5000
+
+    def get(self, request: HttpRequest) -> HttpResponse:
+        fields = self.get_fields()
+        try:
+            page = changes(request.user, request.GET.get('since'), self.get_limit(),
+                           self.get_queryset(fields))
+        except InvalidCursor:
+            raise ApiError('Invalid since token')
+        except StaleToken:
+            raise ApiError('since token expired, sync again from scratch', status=410)
+        return self.respond({
+            'changes': [serialize_task(task, fields) for task in page['tasks']],
+            'deleted': page['deleted'],
+            'next': page['next'],
+            'has_more': page['has_more'],
+        })
+
+
+class TaskStatsApiView(ApiView):
+    """
+    The counts of the stats panel: total, open, complete, overdue, per
+    priority and per category, read from the user's TaskSummary.
+    """
+
+    def get(self, request: HttpRequest) -> HttpResponse:
+        return self.respond(summary_data(get_summary(request.user)))
+
+
+class ProfileApiView(ApiView):
+    """
+    Staff-only figures of this process: the request profiles per route (see
+    todo/profiling.py), the page cache counters and the database pools.
+    """
+
+    def get(self, request: HttpRequest) -> HttpResponse:
+        if not request.user.is_staff:
+            raise ApiError('Only staff may read the profile', status=403)
+        return self.respond({
+            'routes': profiling.route_stats(),
+            'page_cache': page_cache.stats(),
+            'db_pools': db_pool.stats(),
+        })
+
+
+class CategoryApiMixin:
+    """
+    Every user reads and writes their own categories only.
+    """
+
+    def get_category(self) -> Category:
+        try:
+            return Category.objects.get(uuid=self.kwargs['pk'], user=self.request.user)
+        except (Category.DoesNotExist, ValidationError):
+            raise Http404('No category found')
+
+    def category_etag(self, category: Category) -> str:
+        return make_etag(category.uuid, category.updated_at.isoformat())
+
+
+class CategoryListApiView(CategoryApiMixin, ApiView):
+    """
+    List the user's categories or create one.
+    """
+
+    def get(self, request: HttpRequest) -> HttpResponse:
+        categories = Category.objects.filter(user=request.user)
+        version = categories.aggregate(
+            count=Count('id'), last_modified=Max('updated_at'))
+        last_modified = version['last_modified']
+        etag = make_etag(version['count'], last_modified and last_modified.isoformat())
+        response = self.conditional(etag, last_modified)
+        if response is not None:
+            return response
+        categories = categories.order_by('name', 'id')
+        return self.respond({'results': [serialize_category(c) for c in categories]},
+                            etag, last_modified)
+
+    def post(self, request: HttpRequest) -> HttpResponse:
+        form = CategoryForm(self.read_json(), instance=Category(user=request.user))
+        if not form.is_valid():
+            return JsonResponse({'errors': form.errors}, status=400)
+        category = form.save()
+        response = self.respond(serialize_category(category),
+                                self.category_etag(category), category.updated_at, status=201)
+        response['Location'] = reverse('todo:api-category', kwargs={'pk': category.uuid})
+        return response
+
+
+class CategoryDetailApiView(CategoryApiMixin, ApiView):
+    """
+    Read, rename or delete a category. Deleting a category deletes its tasks.
+    """
+
+    def get(self, request: HttpRequest, pk: str) -> HttpResponse:
+        category = self.get_category()
+        etag = self.category_etag(category)
+        response = self.conditional(etag, category.updated_at)
+        if response is not None:
+            return response
+        return self.respond(serialize_category(category), etag, category.updated_at)
+
+    def put(self, request: HttpRequest, pk: str) -> HttpResponse:
+        return self.update()
+
+    def patch(self, request: HttpRequest, pk: str) -> HttpResponse:
+        return self.update()
+
+    def update(self) -> HttpResponse:
+        data = self.read_json()
+        with transaction.atomic():
+            category = self.get_category()
+            response = self.conditional(self.category_etag(category), category.updated_at)
+            if response is not None:
+                return response
+            form = CategoryForm(dict(serialize_category(category), **data), instance=category)
+            if not form.is_valid():
+                return JsonResponse({'errors': form.errors}, status=400)
+            category = form.save()
+        return self.respond(serialize_category(category),
+                            self.category_etag(category), category.updated_at)
+
+    def delete(self, request: HttpRequest, pk: str) -> HttpResponse:
+        with transaction.atomic():
+            category = self.get_category()
+            response = self.conditional(self.category_etag(category), category.updated_at)
+            if response is not None:
+                return response
+            category.delete()
+        return HttpResponse(status=204)
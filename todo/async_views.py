@@ -0,0 +1,214 @@
+"""
+Async versions of the task views for ASGI deployments.
+
+Each view subclasses its sync counterpart in ``todo.views`` to reuse its
+attributes, querysets, templates and success URLs, and replaces the request
+handling with async handlers built on the async ORM (``aget``, ``acount``,
+``async for``, ``aupdate``, ``adelete``). Under uvicorn or daphne they run on
+the event loop instead of being pushed through a thread per request. The
+template is still rendered by Django's handler in a worker thread.
+
+Django 4.1 has no ``Model.asave()``/``adelete()`` (added in 4.2): saving a
+form goes through ``sync_to_async(form.save)`` and deleting through
+``QuerySet.adelete()``.
+
+They are routed instead of the sync views when TODO_ASYNC_VIEWS is enabled,
+which ``lynx/asgi.py`` does by default. The per-user page cache is only used
+by the sync views.
+"""
+from asgiref.sync import sync_to_async
+from django.contrib import messages
+from django.contrib.auth import get_user
+from django.contrib.auth.views import redirect_to_login
+from django.core.exceptions import ValidationError
+from django.http import Http404, HttpRequest, HttpResponse
+from django.shortcuts import redirect, render
+from django.utils import timezone
+
+from .broker import publish_task_event
+from .cache import bump_generation
+from .stats import apply_completion
+from .models import Task
+from .pagination import (
+    CursorPaginator, SearchCursorPaginator,
+    apaginate_by_cursor, apaginate_by_offset)
+from .views import (
+    TaskListView, TaskDetailView, TaskCreateView,
+    TaskUpdateView, TaskDeleteView)
+
+
+async def aresolve_user(request: HttpRequest):
+    """
+    Load the user of the request once, in a worker thread.
+
+    ``request.user`` is lazy and would otherwise hit the session and user
+    tables from the event loop the first time it is read.
+    """
+    request.user = await sync_to_async(get_user)(request)
+    return request.user
+
+
+class AsyncViewMixin:
+    """
+    Async request handling shared by the async task views.
+
+    Replaces the sync ``dispatch`` of LoginRequiredMixin and BaseView: the user
+    is resolved up front, anonymous users are sent to the login page and a
+    missing task renders the custom 404 page.
+
+    Attributes:
+        login_required (bool): Whether anonymous users are redirected to login.
+        http_method_names (list): The methods the view answers.
+
+    Methods:
+        aget_object: Async version of BaseView.get_object.
+    """
+    login_required = True
+    http_method_names = ['get', 'post', 'head', 'options']
+
+    async def dispatch(self, request, *args, **kwargs):
+        user = await aresolve_user(request)
+        if self.login_required and not user.is_authenticated:
+            return redirect_to_login(request.get_full_path())
+        handler = getattr(self, request.method.lower(), None)
+        if request.method.lower() not in self.http_method_names or handler is None:
+            return await self.http_method_not_allowed(request, *args, **kwargs)
+        try:
+            return await handler(request, *args, **kwargs)
+        except Http404:
+            return render(request, 'todo/404.html', {'message': 'Page not found'}, status=404)
+
+    async def aget_object(self)->Task:
+        """
+        Retrieve the user's task named by the 'pk' URL parameter with ``aget``,
+        scoped and narrowed like BaseView.get_object.
+
+        Raises:
+            Http404: If the user has no Task object with the specified UUID.
+        """
+        try:
+            return await self.get_owned_queryset().aget(uuid=self.kwargs['pk'])
+        except (Task.DoesNotExist, ValidationError):
+            raise Http404('No task found')
+
+
+class AsyncTaskListView(AsyncViewMixin, TaskListView):
+    """
+    Async version of TaskListView, with the same pagination and search modes.
+    """
+    http_method_names = ['get', 'head', 'options']
+
+    async def get(self, request, *args, **kwargs):
+        self.object_list = self.get_queryset()
+        mode = self.get_pagination_mode()
+        if mode == 'offset':
+            paginator, page = await apaginate_by_offset(
+                self.object_list, self.paginate_by, request.GET.get('page'))
+        else:
+            paginator, page = await apaginate_by_cursor(
+                self.object_list, self.paginate_by, request.GET.get('cursor'),
+                SearchCursorPaginator if mode == 'search' else CursorPaginator)
+        return self.render_to_response({
+            'view': self,
+            'paginator': paginator,
+            'page_obj': page,
+            'is_paginated': page.has_other_pages(),
+            'object_list': page.object_list,
+            'task_list': page.object_list,
+            'stats': await sync_to_async(self.get_stats)(),
+            'page_window': self.get_page_window(page),
+        })
+
+
+class AsyncTaskDetailView(AsyncViewMixin, TaskDetailView):
+    """
+    Async version of TaskDetailView.
+    """
+    http_method_names = ['get', 'head', 'options']
+
+    async def get(self, request, *args, **kwargs):
+        self.object = await self.aget_object()
+        return self.render_to_response(self.get_context_data(object=self.object))
+
+
+class AsyncTaskCreateView(AsyncViewMixin, TaskCreateView):
+    """
+    Async version of TaskCreateView.
+
+    Form validation may query categories and saving sends post_save, so both
+    run in a worker thread.
+    """
+
+    async def get(self, request, *args, **kwargs):
+        self.object = None
+        return self.render_to_response(self.get_context_data())
+
+    async def post(self, request, *args, **kwargs):
+        self.object = None
+        form = self.get_form()
+        if not await sync_to_async(form.is_valid)():
+            return self.render_to_response(self.get_context_data(form=form))
+        form.instance.user = request.user
+        self.object = await sync_to_async(form.save)()
+        messages.success(request, self.get_success_message(form.cleaned_data))
+        return redirect(self.get_success_url())
+
+
+class AsyncTaskUpdateView(AsyncViewMixin, TaskUpdateView):
+    """
+    Async version of TaskUpdateView.
+    """
+
+    async def get(self, request, *args, **kwargs):
+        self.object = await self.aget_object()
+        return self.render_to_response(self.get_context_data())
+
+    async def post(self, request, *args, **kwargs):
+        self.object = await self.aget_object()
+        form = self.get_form()
+        if not await sync_to_async(form.is_valid)():
+            return self.render_to_response(self.get_context_data(form=form))
+        self.object = await sync_to_async(form.save)()
+        return redirect(self.get_success_url())
+
+
+class AsyncTaskDeleteView(AsyncViewMixin, TaskDeleteView):
+    """
+    Async version of TaskDeleteView.
+    """
+
+    async def get(self, request, *args, **kwargs):
+        self.object = await self.aget_object()
+        return self.render_to_response(self.get_context_data())
+
+    async def post(self, request, *args, **kwargs):
+        self.object = await self.aget_object()
+        await Task.objects.filter(pk=self.object.pk).adelete()
+        return redirect(self.get_success_url())
+
+
+async def acomplete_task(request: HttpRequest, pk: str) -> HttpResponse:
+    """
+    Async version of complete_task: one scoped UPDATE through ``aupdate``.
+
+    Returns:
+        - HttpResponse: An empty 204 response, or 404 if the user has no such task.
+    """
+    user = await aresolve_user(request)
+    if not user.is_authenticated:
+        return redirect_to_login(request.get_full_path())
+
+    complete = request.GET.get('complete') == 'True'
+    try:
+        tasks = Task.objects.filter(uuid=pk, user=user)
+        updated = await tasks.exclude(complete=complete).aupdate(
+            complete=complete, updated_at=timezone.now())
+        if not updated:
+            return HttpResponse(status=204 if await tasks.aexists() else 404)
+    except ValidationError:
+        return HttpResponse(status=404)
+
+    await sync_to_async(bump_generation)(user.pk)
+    await sync_to_async(apply_completion)(user.pk, complete, tasks)
+    await sync_to_async(publish_task_event)(user.pk, 'completed', [pk], complete=complete)
+    return HttpResponse(status=204)
@@ -0,0 +1,900 @@
+"""
+Benchmark scenarios for the todo app.
+
+Every scenario seeds its own data inside a transaction that is rolled back
+when it finishes, so a benchmark never leaves rows behind. Scenarios are
+registered with the ``scenario`` decorator and run with
+``python manage.py benchmark <name>``.
+
+Scenarios that drive several threads at once cannot share a transaction, so
+they use ``seeded_user`` instead, which commits its rows and deletes the
+user (and, by cascade, its tasks) afterwards. They need a database that
+supports concurrent connections, such as PostgreSQL.
+
+``report`` wraps the results of a run with what is needed to compare it with
+a run of another commit (the commit, the database and the options), and
+``compare`` lines two such reports up.
+"""
+import asyncio
+import csv
+import http.client
+import importlib.util
+import itertools
+import json
+import logging
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from datetime import timedelta
+from uuid import uuid4
+
+from asgiref.sync import async_to_sync
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.cache import caches
+from django.core.management import call_command
+from django.db import connection, transaction
+from django.shortcuts import get_object_or_404
+from django.template import engines
+from django.template.loader import render_to_string
+from django.test import AsyncClient, Client, RequestFactory, override_settings
+from django.urls import include, path, reverse
+from django.utils import timezone
+
+from .models import Task, Category
+from .pagination import CursorPaginator
+from .throttle import hit, throttle_key
+from .urls import task_urlpatterns
+from .views import RegisterView, TaskListView, complete_task
+
+SCENARIOS = {}
+
+WORDS = (
+    'report', 'invoice', 'meeting', 'groceries', 'dentist', 'garden', 'budget',
+    'review', 'deploy', 'backup', 'birthday', 'flight', 'insurance', 'laundry',
+    'taxes', 'presentation', 'plumber', 'library', 'workout', 'newsletter',
+)
+
+# The password of the users made by seed_users
+BENCH_PASSWORD = 'bench-Passw0rd'
+
+# Result keys that are measurements rather than labels of a row
+METRICS = ('_ms', '_per_s', '_pct', 'queries', 'bytes')
+
+
+def scenario(name: str):
+    """
+    Register the decorated function as the benchmark ``name``.
+    """
+    def register(func):
+        SCENARIOS[name] = func
+        return func
+    return register
+
+
+def percentile(samples: list, pct: float) -> float:
+    """
+    Return the ``pct`` percentile of ``samples`` using nearest-rank.
+    """
+    ordered = sorted(samples)
+    rank = max(0, min(len(ordered) - 1, round(pct / 100 * len(ordered)) - 1))
+    return ordered[rank]
+
+
+def measure(func, repeat: int) -> dict:
+    """
+    Call ``func`` ``repeat`` times and summarise the latency in milliseconds.
+
+    Returns:
+        dict: p50, p95, p99 and mean latency in milliseconds.
+    """
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        samples.append((time.perf_counter() - start) * 1000)
+    return {
+        'p50_ms': round(percentile(samples, 50), 3),
+        'p95_ms': round(percentile(samples, 95), 3),
+        'p99_ms': round(percentile(samples, 99), 3),
+        'mean_ms': round(statistics.mean(samples), 3),
+    }
+
+
+def count_queries(func) -> tuple:
+    """
+    Call ``func`` and return its result and the SQL of the queries it ran.
+    """
+    queries = []
+
+    def counter(execute, sql, *args):
+        queries.append(sql)
+        return execute(sql, *args)
+
+    with connection.execute_wrapper(counter):
+        return func(), queries
+
+
+@contextmanager
+def rollback():
+    """
+    Run the block in a transaction that is always rolled back.
+    """
+    with transaction.atomic():
+        yield
+        transaction.set_rollback(True)
+
+
+@contextmanager
+def seeded_user(size: int):
+    """
+    Create a committed user with ``size`` tasks and delete it afterwards.
+    """
+    user = create_user()
+    seed_tasks(user, size)
+    try:
+        yield user
+    finally:
+        user.delete()
+
+
+def throughput(func, args: list, concurrency: int) -> dict:
+    """
+    Call ``func`` once per item of ``args`` from ``concurrency`` threads.
+
+    Returns:
+        dict: Calls per second and the p50/p99 latency of a single call.
+    """
+    def timed(arg):
+        start = time.perf_counter()
+        try:
+            func(arg)
+        finally:
+            connection.close()
+        return (time.perf_counter() - start) * 1000
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        samples = list(pool.map(timed, args))
+    elapsed = time.perf_counter() - start
+    return {
+        'ops_per_s': round(len(samples) / elapsed, 1),
+        'p50_ms': round(percentile(samples, 50), 3),
+        'p99_ms': round(percentile(samples, 99), 3),
+    }
+
+
+def create_user(prefix: str = 'bench'):
+    """
+    Create a throwaway user for a benchmark run.
+    """
+    return get_user_model().objects.create_user(
+        username=f'{prefix}-{uuid4().hex[:12]}', password=None)
+
+
+def seed_tasks(user, count: int, batch_size: int = 5000, categories=()) -> None:
+    """
+    Insert ``count`` tasks for ``user`` with spread out due dates, spread over
+    ``categories`` when given.
+    """
+    now = timezone.now()
+    for start in range(0, count, batch_size):
+        Task.objects.bulk_create([
+            Task(
+                title=f'{WORDS[i % len(WORDS)]} {WORDS[i * 7 % len(WORDS)]} {i}',
+                description=f'benchmark task about {WORDS[i * 3 % len(WORDS)]}',
+                due_date=now - timedelta(minutes=i % 50000) if i % 7 else None,
+                priority=('low', 'medium', 'high')[i % 3],
+                category=categories[i % len(categories)] if categories and i % 5 else None,
+                user=user)
+            for i in range(start, min(start + batch_size, count))
+        ], batch_size=batch_size)
+
+
+def seed_users(users: int, tasks: int, categories: int = 20) -> list:
+    """
+    Insert ``users`` users with ``tasks`` tasks each, spread over
+    ``categories`` categories of their own, with bulk inserts only.
+
+    The users share one password hash of BENCH_PASSWORD, computed once, so
+    seeding does not spend its time hashing.
+
+    Returns:
+        list: The users, in creation order.
+    """
+    User = get_user_model()
+    prefix = f'bench-{uuid4().hex[:8]}'
+    password = make_password(BENCH_PASSWORD)
+    User.objects.bulk_create(
+        [User(username=f'{prefix}-{i}', password=password) for i in range(users)],
+        batch_size=1000)
+    people = list(User.objects.filter(username__startswith=f'{prefix}-').order_by('pk'))
+    Category.objects.bulk_create(
+        [Category(name=f'{WORDS[i % len(WORDS)]} {i}', user=user)
+         for user in people for i in range(categories)],
+        batch_size=1000)
+    groups = defaultdict(list)
+    for category in Category.objects.filter(user__in=people):
+        groups[category.user_id].append(category)
+    for user in people:
+        seed_tasks(user, tasks, categories=groups[user.pk])
+    return people
+
+
+def git_commit() -> str:
+    """
+    Return the commit checked out in the working directory, or None.
+    """
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def report(name: str, options: dict, results: list) -> dict:
+    """
+    Return the results of a run with the commit, database and options it ran
+    with, as saved by ``benchmark --output``.
+    """
+    return {
+        'scenario': name,
+        'commit': git_commit(),
+        'database': connection.vendor,
+        'created_at': timezone.now().isoformat(),
+        'options': {key: options.get(key) for key in ('size', 'repeat', 'users', 'concurrency')},
+        'results': results,
+    }
+
+
+def row_key(row: dict) -> tuple:
+    return tuple((key, value) for key, value in row.items() if not key.endswith(METRICS))
+
+
+def compare(results: list, baseline: dict) -> list:
+    """
+    Line ``results`` up with the rows of the ``baseline`` report.
+
+    Returns:
+        list: The rows of ``results`` with the relative change of each
+        measurement against the same row of the baseline, in percent, under
+        ``<key>_change``.
+    """
+    before = {row_key(row): row for row in baseline['results']}
+    compared = []
+    for row in results:
+        old = before.get(row_key(row), {})
+        changes = {f'{key}_change': round((value / old[key] - 1) * 100, 1)
+                   for key, value in row.items()
+                   if key.endswith(METRICS) and isinstance(old.get(key), (int, float)) and old[key]}
+        compared.append({**row, **changes})
+    return compared
+
+
+@scenario('pagination')
+def bench_pagination(size: int, repeat: int, pages=(1, 100, 1000), **options) -> list:
+    """
+    Compare offset and cursor pagination of the task list at several depths.
+
+    The cursor for page N is computed once outside the timed loop, the way a
+    client holding the ``next`` link would request it.
+    """
+    results = []
+    with rollback():
+        user = create_user()
+        seed_tasks(user, size)
+        client = Client()
+        client.force_login(user)
+        url = reverse('todo:tasks-list')
+        per_page = 10
+        queryset = Task.objects.filter(user=user)
+        for page in pages:
+            if (page - 1) * per_page >= size:
+                continue
+            stats = measure(lambda: client.get(url, {'page': page}), repeat)
+            results.append({'mode': 'offset', 'page': page, **stats})
+
+            cursor = None
+            if page > 1:
+                paginator = CursorPaginator(queryset, per_page)
+                ordered = queryset.order_by(*paginator.ordering)
+                cursor = paginator.encode_cursor(ordered[(page - 1) * per_page - 1])
+            params = {'cursor': cursor} if cursor else {}
+            with override_settings(TODO_LIST_PAGINATION='cursor'):
+                stats = measure(lambda: client.get(url, params), repeat)
+            results.append({'mode': 'cursor', 'page': page, **stats})
+    return results
+
+
+def legacy_complete_task(request, pk):
+    """
+    The fetch-then-save toggle that complete_task replaced, followed by the
+    list page render the browser fetched because of its redirect.
+    """
+    task = get_object_or_404(Task, uuid=pk)
+    task.complete = request.GET.get('complete') == 'True'
+    task.save()
+    return TaskListView.as_view()(request)
+
+
+@scenario('complete')
+def bench_complete(size: int, repeat: int, concurrency: int = 8, **options) -> list:
+    """
+    Compare toggle throughput of the old and the new complete_task under
+    ``concurrency`` clients clicking checkboxes at the same time.
+    """
+    factory = RequestFactory()
+    results = []
+    with seeded_user(size) as user:
+        uuids = list(Task.objects.filter(user=user).values_list('uuid', flat=True)[:repeat])
+        clicks = [(uuids[n % len(uuids)], str(n % 2 == 0)) for n in range(repeat * concurrency)]
+        for label, view in (('fetch-save-redirect', legacy_complete_task),
+                            ('single-update', complete_task)):
+            def click(arg, view=view):
+                uuid, complete = arg
+                request = factory.get('/', {'complete': complete})
+                request.user = user
+                response = view(request, pk=str(uuid))
+                if hasattr(response, 'render'):
+                    response.render()
+            results.append({'path': label, 'clicks': len(clicks),
+                            **throughput(click, clicks, concurrency)})
+    return results
+
+
+def write_import_files(directory: str, size: int, user) -> tuple:
+    """
+    Write ``size`` generated tasks both as an import_tasks CSV file and as an
+    equivalent loaddata fixture.
+
+    Returns:
+        tuple: The paths of the CSV file and of the fixture.
+    """
+    csv_path = os.path.join(directory, 'tasks.csv')
+    fixture_path = os.path.join(directory, 'tasks.json')
+    now = timezone.now().isoformat()
+    with open(csv_path, 'w', newline='') as csv_file, open(fixture_path, 'w') as fixture:
+        writer = csv.writer(csv_file)
+        writer.writerow(['uuid', 'title', 'description', 'complete', 'due_date', 'priority'])
+        fixture.write('[')
+        for i in range(size):
+            uuid = str(uuid4())
+            writer.writerow([uuid, f'Task {i}', 'imported task', i % 2 == 0, now, 'medium'])
+            fixture.write(',' if i else '')
+            json.dump({'model': 'todo.task', 'fields': {
+                'uuid': uuid, 'title': f'Task {i}', 'description': 'imported task',
+                'complete': i % 2 == 0, 'due_date': now, 'priority': 'medium',
+                'user': user.pk, 'created_at': now, 'updated_at': now,
+            }}, fixture)
+        fixture.write(']')
+    return csv_path, fixture_path
+
+
+@scenario('import')
+def bench_import(size: int, **options) -> list:
+    """
+    Compare import_tasks with loaddata on the same generated ``size`` tasks.
+    """
+    results = []
+    with tempfile.TemporaryDirectory() as directory:
+        with rollback():
+            user = create_user()
+            csv_path, fixture_path = write_import_files(directory, size, user)
+            for label, command, args in (
+                    ('loaddata', 'loaddata', [fixture_path]),
+                    ('import_tasks', 'import_tasks', [csv_path, '--user', user.username])):
+                start = time.perf_counter()
+                call_command(command, *args, verbosity=0)
+                elapsed = time.perf_counter() - start
+                results.append({'command': label, 'rows': size,
+                                'seconds': round(elapsed, 2),
+                                'rows_per_s': round(size / elapsed)})
+                Task.objects.filter(user=user).delete()
+    return results
+
+
+@scenario('search')
+def bench_search(size: int, repeat: int, target_ms: float = 50, **options) -> list:
+    """
+    Measure ``?q=`` search latency on a user with ``size`` tasks, one query word
+    at a time, and compare the p99 with ``target_ms``.
+    """
+    results = []
+    with rollback():
+        user = create_user()
+        seed_tasks(user, size)
+        client = Client()
+        client.force_login(user)
+        url = reverse('todo:tasks-list')
+        for words in ('invoice', 'budget review', 'plumb'):
+            stats = measure(lambda: client.get(url, {'q': words}), repeat)
+            results.append({'q': words, **stats, 'target_met': stats['p99_ms'] < target_ms})
+    return results
+
+
+class TaskURLConf:
+    """
+    The project URLconf with the task routes built from the sync or async views.
+    """
+
+    def __init__(self, use_async: bool):
+        self.urlpatterns = [
+            path('', include((task_urlpatterns(use_async), 'todo'), namespace='todo')),
+            path('accounts/', include(('django.contrib.auth.urls', 'auth'), namespace='auth')),
+            path('accounts/register/', RegisterView.as_view(), name='register'),
+        ]
+
+
+@scenario('asgi')
+def bench_asgi(size: int, repeat: int, concurrency: int = 8, **options) -> list:
+    """
+    Compare WSGI with the sync views against ASGI with the async views.
+
+    ``concurrency`` clients each load the task list and then a task detail
+    page ``repeat`` times. The WSGI side gives every client its own thread, as
+    a threaded server would; the ASGI side runs every client as a coroutine
+    on one event loop. Run with ``--concurrency 1000`` for the high-concurrency
+    case.
+    """
+    results = []
+    with seeded_user(size) as user:
+        login = Client()
+        login.force_login(user)
+        cookies = login.cookies
+        uuids = list(Task.objects.filter(user=user).values_list('uuid', flat=True)[:repeat])
+        list_url = '/'
+        detail_urls = [f'/task/{uuid}' for uuid in uuids]
+
+        with override_settings(ROOT_URLCONF=TaskURLConf(use_async=False)):
+            def visit(n):
+                client = Client()
+                client.cookies = cookies
+                for i in range(repeat):
+                    client.get(list_url)
+                    client.get(detail_urls[(n + i) % len(detail_urls)])
+
+            start = time.perf_counter()
+            stats = throughput(visit, range(concurrency), concurrency)
+            elapsed = time.perf_counter() - start
+            results.append({'server': 'wsgi', 'views': 'sync', 'clients': concurrency,
+                            'requests_per_s': round(2 * repeat * concurrency / elapsed, 1),
+                            'client_p50_ms': stats['p50_ms'], 'client_p99_ms': stats['p99_ms']})
+
+        with override_settings(ROOT_URLCONF=TaskURLConf(use_async=True)):
+            async def avisit(n):
+                client = AsyncClient()
+                client.cookies = cookies
+                start = time.perf_counter()
+                for i in range(repeat):
+                    await client.get(list_url)
+                    await client.get(detail_urls[(n + i) % len(detail_urls)])
+                return (time.perf_counter() - start) * 1000
+
+            async def run():
+                return await asyncio.gather(*(avisit(n) for n in range(concurrency)))
+
+            start = time.perf_counter()
+            samples = async_to_sync(run)()
+            elapsed = time.perf_counter() - start
+            results.append({'server': 'asgi', 'views': 'async', 'clients': concurrency,
+                            'requests_per_s': round(2 * repeat * concurrency / elapsed, 1),
+                            'client_p50_ms': round(percentile(samples, 50), 3),
+                            'client_p99_ms': round(percentile(samples, 99), 3)})
+    return results
+
+
+@scenario('api')
+def bench_api(size: int, repeat: int, **options) -> list:
+    """
+    Measure bytes sent and latency when a client re-syncs an unchanged list of
+    ``size`` tasks: a full download, the same without descriptions, and
+    revalidation with ``If-None-Match`` and ``If-Modified-Since``.
+    """
+    results = []
+    with rollback():
+        user = create_user()
+        seed_tasks(user, size)
+        client = Client()
+        client.force_login(user)
+        url = reverse('todo:api-tasks')
+        full = {'limit': size}
+        sparse = {'limit': size, 'fields': 'title,complete,due_date,priority,updated_at'}
+        first = client.get(url, full)
+        cases = (
+            ('full', full, {}),
+            ('fields', sparse, {}),
+            ('if-none-match', full, {'HTTP_IF_NONE_MATCH': first['ETag']}),
+            ('if-modified-since', full, {'HTTP_IF_MODIFIED_SINCE': first['Last-Modified']}),
+        )
+        for label, params, headers in cases:
+            response = client.get(url, params, **headers)
+            stats = measure(lambda: client.get(url, params, **headers), repeat)
+            results.append({'request': label, 'status': response.status_code,
+                            'bytes': len(response.content), **stats})
+    return results
+
+
+@scenario('sync')
+def bench_sync(size: int, repeat: int, changed=(0, 10, 100), **options) -> list:
+    """
+    Measure a delta sync of a user with ``size`` tasks after a few of them
+    changed, against downloading the whole list again.
+    """
+    results = []
+    with rollback():
+        user = create_user()
+        seed_tasks(user, size)
+        Task.objects.filter(user=user).update(updated_at=timezone.now() - timedelta(hours=1))
+        client = Client()
+        client.force_login(user)
+        url = reverse('todo:task-changes')
+        stats = measure(lambda: client.get(reverse('todo:api-tasks'), {'limit': size}), repeat)
+        results.append({'sync': 'full list', 'changed': size, **stats})
+        with override_settings(TODO_SYNC_OVERLAP_SECONDS=0):
+            since = None
+            while True:
+                page = client.get(url, {'since': since, 'limit': 5000} if since else {'limit': 5000}).json()
+                since = page['next']
+                if not page['has_more']:
+                    break
+            for count in changed:
+                ids = Task.objects.filter(user=user).values_list('id', flat=True)[:count]
+                Task.objects.filter(id__in=list(ids)).update(updated_at=timezone.now())
+                response = client.get(url, {'since': since})
+                stats = measure(lambda: client.get(url, {'since': since}), repeat)
+                results.append({'sync': 'delta', 'changed': count,
+                                'bytes': len(response.content), **stats})
+                since = response.json()['next']
+    return results
+
+
+@scenario('profiling')
+def bench_profiling(size: int, repeat: int, budget_pct: float = 3, **options) -> list:
+    """
+    Measure the overhead of ProfilingMiddleware on the task list page.
+
+    The same page is requested alternately by a client without and a client
+    with the middleware, so drift affects both equally. The log line is
+    still built but sent to a NullHandler rather than the console.
+    """
+    results = []
+    profiled_middleware = ['todo.profiling.ProfilingMiddleware', *settings.MIDDLEWARE]
+    logger = logging.getLogger('todo.profiling')
+    handlers, propagate = logger.handlers, logger.propagate
+    logger.handlers, logger.propagate = [logging.NullHandler()], False
+    try:
+        with rollback():
+            user = create_user()
+            seed_tasks(user, size)
+            url = reverse('todo:tasks-list')
+            plain, profiled = Client(), Client()
+            for client, middleware in ((plain, settings.MIDDLEWARE), (profiled, profiled_middleware)):
+                client.force_login(user)
+                # The test client builds its middleware chain on first use
+                with override_settings(MIDDLEWARE=middleware):
+                    client.get(url)
+            samples = {'off': [], 'on': []}
+            for _ in range(repeat):
+                for label, client in (('off', plain), ('on', profiled)):
+                    start = time.perf_counter()
+                    client.get(url)
+                    samples[label].append((time.perf_counter() - start) * 1000)
+    finally:
+        logger.handlers, logger.propagate = handlers, propagate
+    for label in ('off', 'on'):
+        results.append({'profiling': label,
+                        'p50_ms': round(percentile(samples[label], 50), 3),
+                        'mean_ms': round(statistics.mean(samples[label]), 3)})
+    overhead = (statistics.median(samples['on']) / statistics.median(samples['off']) - 1) * 100
+    results.append({'profiling': 'overhead', 'median_pct': round(overhead, 2),
+                    'within_budget': overhead < budget_pct})
+    return results
+
+
+@scenario('routes')
+def bench_routes(size: int, repeat: int, users: int = 1, **options) -> list:
+    """
+    Drive the routes of lynx/urls.py one after the other and report the
+    throughput, latency percentiles and queries per request of each.
+
+    ``users`` users with ``size`` tasks each are seeded; the first one makes
+    the requests. Each route is warmed up with one untimed request and its
+    queries are counted on a second one. Login and register hash a password
+    on every call; their throttle is lifted for the run.
+    """
+    results = []
+    with rollback(), override_settings(TODO_LOGIN_RATE_IP=0, TODO_LOGIN_RATE_USERNAME=0):
+        user = seed_users(users, size)[0]
+        uuids = list(Task.objects.filter(user=user).values_list('uuid', flat=True)[:100])
+        client = Client()
+        client.force_login(user)
+        counter = itertools.count()
+        deep = max(1, min(100, size // 10))
+
+        def page(url, **kwargs):
+            return lambda: client.get(url, kwargs)
+
+        def task_url(name):
+            return lambda: reverse(name, args=[uuids[next(counter) % len(uuids)]])
+
+        detail, update, complete = (task_url(name) for name in (
+            'todo:task-detail', 'todo:task-update', 'todo:task-complete'))
+        cases = [('list', 'page 1', page(reverse('todo:tasks-list')))]
+        if deep > 1:
+            cases.append(('list', f'page {deep}', page(reverse('todo:tasks-list'), page=deep)))
+        cases += [
+            ('detail', 'GET', lambda: client.get(detail())),
+            ('create', 'POST', lambda: client.post(reverse('todo:task-create'), {
+                'title': f'Created {next(counter)}', 'priority': 'medium'})),
+            ('update', 'POST', lambda: client.post(update(), {
+                'title': f'Updated {next(counter)}', 'priority': 'high'})),
+            ('complete', 'GET', lambda: client.get(complete(), {
+                'complete': 'True' if next(counter) % 2 else 'False'})),
+            ('login', 'POST', lambda: Client().post(reverse('auth:login'), {
+                'username': user.username, 'password': BENCH_PASSWORD})),
+            ('register', 'POST', lambda: Client().post(reverse('register'), {
+                'username': f'{user.username}-{next(counter)}',
+                'password1': BENCH_PASSWORD, 'password2': BENCH_PASSWORD})),
+        ]
+        for route, request, func in cases:
+            func()
+            response, queries = count_queries(func)
+            start = time.perf_counter()
+            stats = measure(func, repeat)
+            elapsed = time.perf_counter() - start
+            results.append({'route': route, 'request': request,
+                            'status': response.status_code,
+                            'ops_per_s': round(repeat / elapsed, 1),
+                            'queries': len(queries), **stats})
+    return results
+
+
+# The rows of task_list.html before they moved to the task_rows tag
+LEGACY_ROWS = """{% for task in object_list %}
+<tr>
+    <td><input type="checkbox" name="uuids" value="{{ task.uuid }}" form="bulk-form"></td>
+    <td><a href="{% url 'todo:task-detail' task.uuid %}">{{ task.title }}</a></td>
+    <td><input type="checkbox" class="complete-toggle" {% if task.complete %}checked{% endif %} id="{{ task.uuid }}"></td>
+    <td>{{ task.priority }}</td>
+    <td>{{ task.category.name|default:"" }}</td>
+    <td>{{ task.due_date }}</td>
+    <td>
+        <a href="{% url 'todo:task-detail' task.uuid %}">Detail</a> |
+        <a href="{% url 'todo:task-update' task.uuid %}">Update</a> |
+        <a href="{% url 'todo:task-delete' task.uuid %}">Delete</a>
+    </td>
+</tr>
+{% endfor %}"""
+
+
+@scenario('render')
+def bench_render(size: int, repeat: int, rows=(10, 100, 1000), **options) -> list:
+    """
+    Measure rendering task_list.html with 10, 100 and 1,000 rows, without
+    and with the fragment cache, and the rows alone the way the template
+    used to build them, with three ``{% url %}`` per row.
+
+    The tasks are loaded once; only the template work is timed.
+    """
+    results = []
+    with rollback():
+        user = create_user()
+        seed_tasks(user, max(rows), categories=[Category.objects.create(name='bench', user=user)])
+        request = RequestFactory().get(reverse('todo:tasks-list'))
+        request.user = user
+        view = TaskListView()
+        view.setup(request)
+        legacy = engines['django'].from_string(LEGACY_ROWS)
+        for count in rows:
+            tasks = list(view.get_queryset()[:count])
+            context = {'view': view, 'object_list': tasks, 'is_paginated': False}
+            stats = measure(lambda: legacy.render({'object_list': tasks}), repeat)
+            results.append({'rows': count, 'render': 'rows with url tags', **stats})
+            for label, enabled in (('page', False), ('page, cached rows', True)):
+                with override_settings(TODO_FRAGMENT_CACHE=enabled):
+                    render_to_string('todo/task_list.html', context, request)
+                    stats = measure(
+                        lambda: render_to_string('todo/task_list.html', context, request), repeat)
+                results.append({'rows': count, 'render': label, **stats})
+    return results
+
+
+@scenario('sessions')
+def bench_sessions(size: int, repeat: int, **options) -> list:
+    """
+    Count the queries of an authenticated request to the task list, and those
+    of them reading or writing django_session, with each session engine.
+    """
+    results = []
+    with rollback():
+        user = create_user()
+        seed_tasks(user, size)
+        url = reverse('todo:tasks-list')
+        for name, engine in settings.SESSION_ENGINES.items():
+            with override_settings(SESSION_ENGINE=engine):
+                client = Client()
+                client.force_login(user)
+                client.get(url)
+                response, queries = count_queries(lambda: client.get(url))
+                stats = measure(lambda: client.get(url), repeat)
+            results.append({'engine': name, 'status': response.status_code,
+                            'queries': len(queries),
+                            'session_queries': sum('django_session' in sql for sql in queries),
+                            **stats})
+    return results
+
+
+def hashers_first(name: str) -> list:
+    """
+    Return PASSWORD_HASHERS with the hasher ``name`` of
+    PASSWORD_HASHER_CHOICES moved first.
+    """
+    preferred = settings.PASSWORD_HASHER_CHOICES[name]
+    return [preferred, *(hasher for hasher in settings.PASSWORD_HASHERS if hasher != preferred)]
+
+
+@scenario('logins')
+def bench_logins(size: int, repeat: int, **options) -> list:
+    """
+    Measure logins per second on one core with each password hasher, and the
+    time of checking one password alone.
+
+    Two more rows show the first login of a user whose PBKDF2 hash is
+    rehashed with scrypt, and the rate at which the throttle turns a flood
+    of logins away. The other rows run with the throttle lifted. Argon2 is
+    left out when argon2-cffi is not installed.
+    """
+    results = []
+    url = reverse('auth:login')
+    unthrottled = override_settings(TODO_LOGIN_RATE_IP=0, TODO_LOGIN_RATE_USERNAME=0)
+
+    def login(user):
+        return lambda: Client().post(url, {'username': user.username, 'password': BENCH_PASSWORD})
+
+    with rollback(), unthrottled:
+        for name in settings.PASSWORD_HASHER_CHOICES:
+            if name == 'argon2' and importlib.util.find_spec('argon2') is None:
+                continue
+            with override_settings(PASSWORD_HASHERS=hashers_first(name)):
+                user = create_user()
+                user.set_password(BENCH_PASSWORD)
+                user.save(update_fields=['password'])
+                check = measure(lambda: user.check_password(BENCH_PASSWORD), repeat)
+                response, queries = count_queries(login(user))
+                start = time.perf_counter()
+                stats = measure(login(user), repeat)
+                elapsed = time.perf_counter() - start
+            results.append({'hasher': name, 'login': 'valid', 'status': response.status_code,
+                            'logins_per_s': round(repeat / elapsed, 1),
+                            'check_p50_ms': check['p50_ms'], 'queries': len(queries), **stats})
+
+        user = create_user()
+        with override_settings(PASSWORD_HASHERS=hashers_first('pbkdf2')):
+            user.set_password(BENCH_PASSWORD)
+            user.save(update_fields=['password'])
+        with override_settings(PASSWORD_HASHERS=hashers_first('scrypt')):
+            stats = measure(login(user), 1)
+            user.refresh_from_db(fields=['password'])
+        results.append({'hasher': 'pbkdf2 to scrypt', 'login': 'first',
+                        'rehashed': user.password.startswith('scrypt$'), **stats})
+
+    # Every 429 would log a warning to the console
+    logger = logging.getLogger('django.request')
+    level = logger.level
+    logger.setLevel(logging.ERROR)
+    try:
+        with rollback():
+            user = create_user()
+            cache_key = throttle_key('login', 'username', user.username)
+            for _ in range(settings.TODO_LOGIN_RATE_USERNAME):
+                hit(cache_key, settings.TODO_LOGIN_RATE_WINDOW)
+            response = login(user)()
+            start = time.perf_counter()
+            stats = measure(login(user), repeat)
+            elapsed = time.perf_counter() - start
+            caches[settings.TODO_CACHE_ALIAS].delete_many(
+                [cache_key, throttle_key('login', 'ip', '127.0.0.1')])
+    finally:
+        logger.setLevel(level)
+        results.append({'hasher': 'any', 'login': 'throttled', 'status': response.status_code,
+                        'logins_per_s': round(repeat / elapsed, 1), **stats})
+    return results
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def http_get(port: int, path: str) -> tuple:
+    """
+    GET ``path`` from a local server on a new connection, accepting
+    compressed responses.
+
+    Returns:
+        tuple: The status and the size of the body as sent.
+    """
+    conn = http.client.HTTPConnection('127.0.0.1', port, timeout=10)
+    try:
+        conn.request('GET', path, headers={'Accept-Encoding': 'br, gzip'})
+        response = conn.getresponse()
+        return response.status, len(response.read())
+    finally:
+        conn.close()
+
+
+@contextmanager
+def running_server(command: list, env: dict, port: int, path: str):
+    """
+    Start a web server process, wait until it answers ``path``, and stop it
+    when the block ends.
+    """
+    process = subprocess.Popen(command, cwd=settings.BASE_DIR, env=env,
+                               stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        deadline = time.monotonic() + 30
+        while True:
+            try:
+                http_get(port, path)
+                break
+            except OSError:
+                if process.poll() is not None or time.monotonic() > deadline:
+                    raise RuntimeError(f'{" ".join(command)} did not start')
+                time.sleep(0.2)
+        yield
+    finally:
+        process.terminate()
+        process.wait(timeout=30)
+
+
+@scenario('serving')
+def bench_serving(size: int, repeat: int, concurrency: int = 8, **options) -> list:
+    """
+    Compare the requests per second of runserver, as docker-compose runs it
+    for development, with the production profile: gunicorn serving
+    lynx.wsgi with sync workers and lynx.asgi with uvicorn workers, with
+    DEBUG off, WhiteNoise and compressed pages.
+
+    Every server runs on this machine, one at a time. ``concurrency`` clients
+    request the login page, which needs no database, and a static file,
+    ``repeat`` times each, on a new connection per request.
+    """
+    manage = [sys.executable, str(settings.BASE_DIR / 'manage.py')]
+    development = dict(os.environ, DJANGO_SETTINGS_MODULE=settings.SETTINGS_MODULE, DEBUG='1')
+    production = dict(development, DEBUG='0', SECRET_KEY=os.environ.get('SECRET_KEY') or BENCH_PASSWORD)
+    routes = [('page', reverse(settings.LOGIN_URL)),
+              ('static', '/' + settings.STATIC_URL.lstrip('/') + 'admin/css/base.css')]
+    results = []
+    with tempfile.TemporaryDirectory() as static_root:
+        production['STATIC_ROOT'] = static_root
+        subprocess.run(manage + ['collectstatic', '--noinput', '-v0'], env=production, check=True)
+        port = free_port()
+        servers = [('runserver', manage + ['runserver', '--noreload', f'127.0.0.1:{port}'], development)]
+        if importlib.util.find_spec('gunicorn') is not None:
+            gunicorn = [sys.executable, '-m', 'gunicorn', '-c',
+                        str(settings.BASE_DIR / 'lynx' / 'gunicorn.conf.py')]
+            servers += [
+                ('gunicorn wsgi', gunicorn, dict(production, BIND=f'127.0.0.1:{port}')),
+                ('gunicorn asgi', gunicorn,
+                 dict(production, BIND=f'127.0.0.1:{port}', SERVER_MODE='asgi')),
+            ]
+        for server, command, env in servers:
+            with running_server(command, env, port, routes[0][1]):
+                for route, path in routes:
+                    status, size = http_get(port, path)
+                    # Let every worker serve the route once before timing it
+                    throughput(lambda _: http_get(port, path), range(4 * concurrency), concurrency)
+                    stats = throughput(lambda _: http_get(port, path),
+                                       range(repeat * concurrency), concurrency)
+                    results.append({'server': server, 'route': route, 'status': status,
+                                    'bytes': size, **stats})
+    return results
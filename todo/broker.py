@@ -0,0 +1,170 @@
+"""
+Fan-out of task change events to the live update streams of each user.
+
+Writers call ``publish_task_event`` from any thread; the event is handed to
+the broker once the surrounding transaction commits, so a listener that
+reloads on an event sees the change. The broker is chosen by
+TODO_EVENT_BROKER and only needs ``subscribe``, ``unsubscribe`` and
+``publish``, so LocalBroker, which reaches the streams of its own process,
+can be replaced by one backed by a shared pub/sub service.
+
+Events are JSON objects with a ``type`` ('created', 'updated', 'completed',
+'deleted', or 'changed' when the affected tasks are not listed) and the
+``uuids`` of the tasks; 'completed' events also carry ``complete``. Each
+event is encoded once and the same bytes are queued for every subscriber.
+"""
+import asyncio
+import json
+import threading
+from collections import deque
+
+from django.conf import settings
+from django.db import transaction
+from django.utils.module_loading import import_string
+
+
+class Subscription:
+    """
+    The pending events of one stream.
+
+    At most ``maxlen`` events are kept; when a slow or stalled client lets
+    more pile up, the oldest are dropped and ``overflowed`` is set so the
+    stream can tell the client to reload instead.
+
+    Attributes:
+        user_id (int): The user whose events are received.
+        loop (AbstractEventLoop): The event loop serving the stream.
+        events (deque): The encoded events not sent yet.
+        overflowed (bool): Whether events were dropped.
+        closed (bool): Whether the stream is done.
+    """
+    __slots__ = ('user_id', 'loop', 'events', 'overflowed', 'closed', '_waiter')
+
+    def __init__(self, user_id: int, loop, maxlen: int):
+        self.user_id = user_id
+        self.loop = loop
+        self.events = deque(maxlen=maxlen)
+        self.overflowed = False
+        self.closed = False
+        self._waiter = None
+
+    def deliver(self, data: bytes) -> None:
+        """
+        Queue an event. Must run in the subscription's event loop.
+        """
+        if len(self.events) == self.events.maxlen:
+            self.overflowed = True
+        self.events.append(data)
+        self._wake()
+
+    def close(self) -> None:
+        self.closed = True
+        self._wake()
+
+    def _wake(self) -> None:
+        if self._waiter is not None and not self._waiter.done():
+            self._waiter.set_result(None)
+
+    async def wait(self, timeout: float) -> list:
+        """
+        Wait up to ``timeout`` seconds for events and take them all.
+
+        Returns:
+            list: The encoded events, empty on timeout or when closed.
+        """
+        if not self.events and not self.closed:
+            self._waiter = self.loop.create_future()
+            timer = self.loop.call_later(timeout, self._wake)
+            try:
+                await self._waiter
+            finally:
+                timer.cancel()
+                self._waiter = None
+        events = list(self.events)
+        self.events.clear()
+        return events
+
+
+class LocalBroker:
+    """
+    An in-process broker: events published in this process reach the
+    streams served by this process.
+
+    Attributes:
+        queue_size (int): The most events kept per subscription.
+    """
+
+    def __init__(self, queue_size: int = None):
+        self.queue_size = queue_size or settings.TODO_EVENTS_QUEUE_SIZE
+        self._subscriptions = {}
+        self._lock = threading.Lock()
+
+    def subscribe(self, user_id: int) -> Subscription:
+        """
+        Start receiving the events of a user. Must run in an event loop.
+        """
+        subscription = Subscription(user_id, asyncio.get_running_loop(), self.queue_size)
+        with self._lock:
+            self._subscriptions.setdefault(user_id, set()).add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription) -> None:
+        with self._lock:
+            subscriptions = self._subscriptions.get(subscription.user_id, set())
+            subscriptions.discard(subscription)
+            if not subscriptions:
+                self._subscriptions.pop(subscription.user_id, None)
+
+    def publish(self, user_id: int, event: dict) -> None:
+        """
+        Send an event to every subscription of a user, from any thread.
+        """
+        with self._lock:
+            subscriptions = list(self._subscriptions.get(user_id, ()))
+        if not subscriptions:
+            return
+        data = json.dumps(event, default=str).encode()
+        try:
+            running = asyncio.get_running_loop()
+        except RuntimeError:
+            running = None
+        for subscription in subscriptions:
+            if subscription.loop is running:
+                subscription.deliver(data)
+            elif not subscription.loop.is_closed():
+                subscription.loop.call_soon_threadsafe(subscription.deliver, data)
+
+    def connections(self) -> int:
+        with self._lock:
+            return sum(len(subscriptions) for subscriptions in self._subscriptions.values())
+
+
+_broker = None
+_broker_lock = threading.Lock()
+
+
+def get_broker():
+    """
+    Return the broker of this process, built from TODO_EVENT_BROKER.
+    """
+    global _broker
+    with _broker_lock:
+        if _broker is None:
+            _broker = import_string(settings.TODO_EVENT_BROKER)()
+        return _broker
+
+
+def publish_task_event(user_id: int, event_type: str, uuids=(), **data) -> None:
+    """
+    Publish a task change event once the surrounding transaction commits.
+
+    Args:
+        user_id (int): The owner of the tasks.
+        event_type (str): 'created', 'updated', 'completed', 'deleted' or 'changed'.
+        uuids (iterable): The uuids of the tasks, if known.
+        **data: Further fields of the event, such as ``complete``.
+    """
+    if user_id is None:
+        return
+    event = {'type': event_type, 'uuids': [str(uuid) for uuid in uuids], **data}
+    transaction.on_commit(lambda: get_broker().publish(user_id, event))
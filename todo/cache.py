@@ -0,0 +1,177 @@
+import hashlib
+import threading
+import time
+
+from django.conf import settings
+from django.contrib.messages import get_messages
+from django.core.cache import caches
+from django.db import transaction
+from django.http import HttpResponse
+from django.middleware.csrf import get_token
+
+from . import profiling
+
+# Rendered in place of the CSRF token of a cached page, and replaced with the
+# token of the session the page is served to
+CSRF_PLACEHOLDER = 'todo-page-cache-csrf-token'
+
+_stats = {'hits': 0, 'misses': 0}
+_stats_lock = threading.Lock()
+
+
+def get_cache():
+    """
+    Return the cache backend configured for per-user pages (TODO_CACHE_ALIAS).
+    """
+    return caches[settings.TODO_CACHE_ALIAS]
+
+
+def generation_key(user_id: int) -> str:
+    return f'todo:gen:{user_id}'
+
+
+def get_generation(user_id: int) -> int:
+    """
+    Return the current generation counter of a user's tasks.
+
+    A missing counter (first use, or evicted by the backend) is seeded from the
+    clock rather than from 1, so it can never fall back to a generation that
+    older cached pages were stored under.
+
+    Args:
+        user_id (int): The owner of the tasks.
+
+    Returns:
+        int: The generation number.
+    """
+    cache = get_cache()
+    key = generation_key(user_id)
+    generation = cache.get(key)
+    if generation is None:
+        cache.add(key, time.time_ns(), timeout=None)
+        generation = cache.get(key)
+    return generation
+
+
+def bump_generation(user_id: int) -> None:
+    """
+    Invalidate every cached page of a user by moving to the next generation.
+
+    The counter is bumped right away and again once the surrounding transaction
+    commits, so a page rendered from not-yet-committed data is never served
+    under the new generation.
+
+    Args:
+        user_id (int): The owner of the tasks that changed.
+    """
+    if user_id is None:
+        return
+
+    def bump():
+        cache = get_cache()
+        try:
+            cache.incr(generation_key(user_id))
+        except ValueError:
+            cache.set(generation_key(user_id), time.time_ns(), timeout=None)
+
+    bump()
+    transaction.on_commit(bump)
+
+
+def record(hit: bool) -> None:
+    with _stats_lock:
+        _stats['hits' if hit else 'misses'] += 1
+
+
+def stats() -> dict:
+    """
+    Return the page cache hit and miss counters of this process.
+    """
+    with _stats_lock:
+        return dict(_stats)
+
+
+def reset_stats() -> None:
+    with _stats_lock:
+        _stats.update(hits=0, misses=0)
+
+
+class UserPageCacheMixin:
+    """
+    Cache rendered GET responses per user, keyed on the user's generation.
+
+    Any write to one of the user's tasks bumps the generation (see
+    ``todo.signals``), so cached pages go stale immediately and no TTL is
+    needed. Responses are only cached for authenticated users, with no pending
+    flash messages, when TODO_PAGE_CACHE is enabled.
+
+    A page is stored with a placeholder for its CSRF token, which each
+    response replaces with the token of its own session, so a page rendered
+    for one session (or before a new login) is not served with its token.
+
+    Attributes:
+        cache_response_header (str): Header reporting HIT or MISS.
+
+    Methods:
+        get_page_cache_key: Build the cache key for the current request.
+        is_cacheable_response: Decide whether a rendered response is stored.
+    """
+    cache_response_header = 'X-Cache'
+
+    def get_page_cache_key(self) -> str:
+        """
+        Build the cache key for the current request.
+
+        Returns:
+            str: A key unique to the user, their generation and the full path.
+        """
+        user_id = self.request.user.pk
+        path = hashlib.md5(self.request.get_full_path().encode()).hexdigest()
+        return f'todo:page:{user_id}:{get_generation(user_id)}:{path}'
+
+    def is_cacheable_response(self, response) -> bool:
+        """
+        Decide whether a rendered response is stored.
+
+        Returns:
+            bool: True for successful responses.
+        """
+        return response.status_code == 200
+
+    def dispatch(self, request, *args, **kwargs):
+        if (not settings.TODO_PAGE_CACHE or request.method != 'GET'
+                or not request.user.is_authenticated or len(get_messages(request))):
+            return super().dispatch(request, *args, **kwargs)
+
+        cache = get_cache()
+        key = self.get_page_cache_key()
+        cached = cache.get(key)
+        if cached is not None:
+            record(hit=True)
+            content, content_type = cached
+            response = HttpResponse(self.insert_csrf_token(content), content_type=content_type)
+            response[self.cache_response_header] = 'HIT'
+            return response
+
+        record(hit=False)
+        response = super().dispatch(request, *args, **kwargs)
+        if hasattr(response, 'render'):
+            if response.context_data is not None:
+                response.context_data['csrf_token'] = CSRF_PLACEHOLDER
+            profiling.render(response)
+        if self.is_cacheable_response(response):
+            cache.set(key, (response.content, response['Content-Type']),
+                      timeout=settings.TODO_PAGE_CACHE_TIMEOUT)
+        if not response.streaming:
+            response.content = self.insert_csrf_token(response.content)
+        response[self.cache_response_header] = 'MISS'
+        return response
+
+    def insert_csrf_token(self, content: bytes) -> bytes:
+        """
+        Replace the CSRF placeholder of a stored page with the token of the
+        current session, which also makes sure its CSRF cookie is set.
+        """
+        if CSRF_PLACEHOLDER.encode() not in content:
+            return content
+        return content.replace(CSRF_PLACEHOLDER.encode(), get_token(self.request).encode())
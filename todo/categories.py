@@ -0,0 +1,61 @@
+"""
+The per-user list of categories, cached for task forms.
+
+The create and update pages offer the user's categories as choices and
+validate the submitted one against the same list. ``get_categories`` reads
+it from the cache, and from the database in one query when the cache does
+not hold it. The Category signals drop it whenever one of the user's
+categories is saved or deleted.
+"""
+from django.conf import settings
+from django.db import transaction
+
+from .cache import get_cache
+from .models import Category
+
+# The fields of a category kept in the cached list
+FIELDS = ('id', 'uuid', 'name', 'user_id')
+
+
+def categories_key(user_id: int) -> str:
+    return f'todo:categories:{user_id}'
+
+
+def get_categories(user_id: int) -> list:
+    """
+    Return the categories of a user, ordered by name.
+
+    The categories are built from the cached rows without a query and carry
+    only FIELDS; reading any other field loads it from the database.
+
+    Args:
+        user_id (int): The owner of the categories, or None for no user.
+
+    Returns:
+        list: Category instances.
+    """
+    if user_id is None:
+        return []
+    cache = get_cache()
+    key = categories_key(user_id)
+    rows = cache.get(key)
+    if rows is None:
+        rows = list(Category.objects.filter(user_id=user_id)
+                    .order_by('name', 'id').values_list(*FIELDS))
+        cache.set(key, rows, timeout=settings.TODO_CATEGORY_CACHE_TIMEOUT)
+    return [Category.from_db(Category.objects.db, FIELDS, row) for row in rows]
+
+
+def invalidate_categories(user_id: int) -> None:
+    """
+    Drop the cached categories of a user, now and once the surrounding
+    transaction commits, so a list read before the commit is not kept.
+    """
+    if user_id is None:
+        return
+
+    def delete():
+        get_cache().delete(categories_key(user_id))
+
+    delete()
+    transaction.on_commit(delete)
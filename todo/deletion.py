@@ -0,0 +1,60 @@
+"""
+Deletes that skip Django's deletion collector.
+
+QuerySet.delete() loads the rows it deletes, to follow cascades and to send
+pre_delete and post_delete for each of them. Where a table has no dependent
+rows and the caller does the work of those signals itself, once for the
+whole batch (tombstones, summaries, cache invalidation), a plain DELETE of
+the primary keys is all that is needed.
+
+``delete_in_batches`` does the same for housekeeping of large backlogs
+(expired sessions, old tombstones): one short DELETE per batch of primary
+keys instead of one statement holding its locks over all of them.
+"""
+from django.db import connections
+
+
+def delete_rows(model, pks, using: str = 'default') -> int:
+    """
+    Delete the rows of ``model`` with the primary keys ``pks`` in one
+    ``DELETE ... WHERE pk IN (...)``, without loading them or sending signals.
+
+    Args:
+        model (Model): The model of the rows.
+        pks (iterable): Their primary keys.
+        using (str): The database alias.
+
+    Returns:
+        int: The number of rows deleted.
+    """
+    connection = connections[using]
+    values = [model._meta.pk.get_db_prep_value(pk, connection) for pk in pks]
+    if not values:
+        return 0
+    table = connection.ops.quote_name(model._meta.db_table)
+    column = connection.ops.quote_name(model._meta.pk.column)
+    placeholders = ', '.join(['%s'] * len(values))
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {table} WHERE {column} IN ({placeholders})', values)
+        return cursor.rowcount
+
+
+def delete_in_batches(queryset, batch_size: int = 1000) -> int:
+    """
+    Delete the rows of ``queryset`` with ``delete_rows``, ``batch_size``
+    primary keys per statement, each in its own transaction.
+
+    Args:
+        queryset (QuerySet): The rows to delete.
+        batch_size (int): The most rows deleted per statement.
+
+    Returns:
+        int: The number of rows deleted.
+    """
+    keys = queryset.order_by().values_list('pk', flat=True)
+    deleted = 0
+    while True:
+        batch = list(keys[:batch_size])
+        if not batch:
+            return deleted
+        deleted += delete_rows(queryset.model, batch, using=queryset.db)
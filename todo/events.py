@@ -0,0 +1,147 @@
+"""
+Live updates of task changes as a Server-Sent Events stream.
+
+``lynx/asgi.py`` routes ``/events/`` to EventStream, a plain ASGI app: Django
+4.1 iterates streaming responses synchronously, which would hold the event
+loop for the lifetime of each connection. The stream sends every event the
+broker receives for the signed-in user as an SSE ``data:`` line, a comment
+line every TODO_EVENTS_HEARTBEAT_SECONDS so proxies keep idle connections
+open, and a 'resync' event when its queue overflowed and the client should
+reload.
+
+An idle connection costs its coroutine, one task waiting for the client to
+disconnect and a Subscription with an empty bounded queue. Connections
+beyond TODO_EVENTS_MAX_CONNECTIONS per process get 503.
+
+Being no Django view, the stream gets none of the request_started and
+request_finished signals that close a request's database connections, so
+the session lookup closes them itself.
+"""
+import asyncio
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth import get_user
+from django.contrib.sessions.backends.base import SessionBase
+from django.db import close_old_connections
+from django.utils.module_loading import import_string
+
+from .broker import get_broker
+
+RESYNC = b'{"type": "resync", "uuids": []}'
+
+
+class SessionScope:
+    """
+    The part of a request that ``django.contrib.auth.get_user`` reads.
+    """
+
+    def __init__(self, session: SessionBase):
+        self.session = session
+
+
+def session_key(scope: dict) -> str:
+    """
+    Return the session cookie of an ASGI scope, or None.
+    """
+    for name, value in scope.get('headers', ()):
+        if name == b'cookie':
+            for cookie in value.decode('latin-1').split(';'):
+                key, _, morsel = cookie.strip().partition('=')
+                if key == settings.SESSION_COOKIE_NAME:
+                    return morsel
+    return None
+
+
+def session_user_id(key: str):
+    """
+    Return the id of the signed-in user of the session ``key``, or None.
+
+    Connections that are broken or past CONN_MAX_AGE are closed before the
+    lookup and after it, as Django does around each request, so the worker
+    thread neither reuses a dead connection nor keeps a pooled one checked out.
+    """
+    close_old_connections()
+    try:
+        session = import_string(settings.SESSION_ENGINE + '.SessionStore')(key)
+        user = get_user(SessionScope(session))
+        return user.pk if user.is_authenticated else None
+    finally:
+        close_old_connections()
+
+
+async def respond(send, status: int, body: bytes) -> None:
+    await send({'type': 'http.response.start', 'status': status,
+                'headers': [(b'content-type', b'text/plain; charset=utf-8')]})
+    await send({'type': 'http.response.body', 'body': body})
+
+
+class EventStream:
+    """
+    The ASGI app serving the live update stream of the signed-in user.
+
+    Attributes:
+        broker: The broker the stream subscribes to. Defaults to get_broker().
+        heartbeat (float): Seconds between keep-alive comments.
+        max_connections (int): The most streams open at once.
+
+    Methods:
+        authenticate: Return the id of the user of the request, or None.
+    """
+
+    def __init__(self, broker=None, heartbeat: float = None, max_connections: int = None):
+        self.broker = broker
+        self.heartbeat = heartbeat or settings.TODO_EVENTS_HEARTBEAT_SECONDS
+        self.max_connections = max_connections or settings.TODO_EVENTS_MAX_CONNECTIONS
+        self.connections = 0
+
+    async def authenticate(self, scope: dict):
+        """
+        Return the id of the user of the request, or None.
+        """
+        key = session_key(scope)
+        if not key:
+            return None
+        return await sync_to_async(session_user_id)(key)
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http':
+            raise ValueError(f"EventStream cannot handle '{scope['type']}' connections")
+        if scope['method'] != 'GET':
+            return await respond(send, 405, b'Method not allowed')
+        user_id = await self.authenticate(scope)
+        if user_id is None:
+            return await respond(send, 401, b'Authentication required')
+        if self.connections >= self.max_connections:
+            return await respond(send, 503, b'Too many connections')
+
+        broker = self.broker or get_broker()
+        self.connections += 1
+        subscription = broker.subscribe(user_id)
+        disconnected = asyncio.ensure_future(self.wait_disconnect(receive, subscription))
+        try:
+            await send({'type': 'http.response.start', 'status': 200, 'headers': [
+                (b'content-type', b'text/event-stream'),
+                (b'cache-control', b'no-cache'),
+                (b'x-accel-buffering', b'no'),
+            ]})
+            await send({'type': 'http.response.body', 'body': b'retry: 5000\n\n',
+                        'more_body': True})
+            while not subscription.closed:
+                events = await subscription.wait(self.heartbeat)
+                if subscription.closed:
+                    break
+                if subscription.overflowed:
+                    subscription.overflowed = False
+                    events = [RESYNC]
+                body = b''.join(b'data: %s\n\n' % data for data in events) or b': ping\n\n'
+                await send({'type': 'http.response.body', 'body': body, 'more_body': True})
+        finally:
+            disconnected.cancel()
+            broker.unsubscribe(subscription)
+            self.connections -= 1
+
+    async def wait_disconnect(self, receive, subscription) -> None:
+        while (await receive())['type'] != 'http.disconnect':
+            pass
+        subscription.close()
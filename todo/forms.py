@@ -1,10 +1,100 @@
-from datetime import datetime
-from django.forms import ModelForm, DateTimeInput
+from uuid import UUID
+from django.forms import (
+    Form, ModelForm, DateTimeInput,
+    Field, ChoiceField, ValidationError)
 from django.contrib.auth.models import User
 from django.contrib.auth.forms import UserCreationForm
-from .models import Task
+from django.utils import timezone
+from .categories import get_categories
+from .models import Task, Category, PRIORITY_CHOICES
 
-class TaskForm(ModelForm):
+
+class UserCategoryField(ChoiceField):
+    """
+    A choice among the categories of one user, read from their cached list.
+
+    The list is read once per form, the first time the choices are rendered
+    or a value is cleaned, so neither runs a query while it is cached. A
+    category of another user is an invalid choice. The cleaned value is a
+    Category carrying the cached fields.
+
+    Attributes:
+        to_field_name (str): The field a category is submitted by, 'id' or 'uuid'.
+        empty_label (str): The label of the empty choice.
+    """
+    empty_label = '---------'
+
+    def __init__(self, *, to_field_name='id', **kwargs):
+        kwargs.setdefault('required', False)
+        super().__init__(**kwargs)
+        self.to_field_name = to_field_name
+        self.set_user(None)
+
+    def set_user(self, user_id)->None:
+        """
+        Offer the categories of ``user_id``; None offers none.
+        """
+        self.user_id = user_id
+        self._categories = None
+        self.choices = self.category_choices
+
+    @property
+    def categories(self)->dict:
+        """
+        The user's categories by the string value they are submitted as.
+        """
+        if self._categories is None:
+            self._categories = {str(getattr(category, self.to_field_name)): category
+                                for category in get_categories(self.user_id)}
+        return self._categories
+
+    def category_choices(self)->list:
+        return [('', self.empty_label)] + [
+            (key, category.name) for key, category in self.categories.items()]
+
+    def prepare_value(self, value):
+        if isinstance(value, Category):
+            return getattr(value, self.to_field_name)
+        return value
+
+    def to_python(self, value):
+        if value in self.empty_values:
+            return None
+        category = self.categories.get(str(self.prepare_value(value)))
+        if category is None:
+            raise ValidationError(
+                self.error_messages['invalid_choice'],
+                code='invalid_choice',
+                params={'value': value})
+        return category
+
+    def validate(self, value)->None:
+        # to_python has already checked the choice
+        Field.validate(self, value)
+
+    def has_changed(self, initial, data)->bool:
+        initial_value = initial if initial is not None else ''
+        data_value = data if data is not None else ''
+        return str(self.prepare_value(initial_value)) != str(data_value)
+
+
+class UserCategoryFormMixin:
+    """
+    Limits the ``category`` field of a form to the categories of its ``user``.
+
+    On model forms 'category' is left out of Meta.fields, so the model's own
+    validation does not query the category again; ``save`` sets it.
+    """
+
+    def __init__(self, *args, user=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.fields['category'].set_user(user.pk if user is not None else None)
+
+    def save(self, commit=True):
+        self.instance.category = self.cleaned_data['category']
+        return super().save(commit)
+
+class TaskForm(UserCategoryFormMixin, ModelForm):
     """
     A ModelForm for creating or updating a Task instance.
 
@@ -13,6 +103,8 @@ class TaskForm(ModelForm):
     date-time picker in the browser.
 
     Attributes:
+        category (UserCategoryField): One of the categories of the user the
+            form is built for, from their cached list.
         Meta: A class containing metadata about the form, such as the model it
             relates to, the fields it includes, and any additional options.
 
@@ -21,14 +113,21 @@ class TaskForm(ModelForm):
         `description`, `due_date`, `priority`, and `category`. It also assumes
         that the `due_date` field is a DateTimeField.
     """
+    category = UserCategoryField()
+
+    def __init__(self, *args, **kwargs)->None:
+        super().__init__(*args, **kwargs)
+        if self.instance.category_id is not None:
+            self.initial.setdefault('category', self.instance.category_id)
+        # The earliest due date the picker offers is now, as of this form
+        self.fields['due_date'].widget.attrs['min'] = (
+            timezone.localtime().strftime('%Y-%m-%dT%H:%M'))
+
     class Meta:
         model = Task
-        fields = ['title', 'description', 'due_date', 'priority', 'category']
+        fields = ['title', 'description', 'due_date', 'priority']
         widgets = {
-            'due_date': DateTimeInput(attrs={
-                'type': 'datetime-local',
-                'min': datetime.now().strftime('%Y-%m-%dT%H:%M')
-            })
+            'due_date': DateTimeInput(attrs={'type': 'datetime-local'})
         }
 
 
@@ -69,3 +168,92 @@ class CustomUserCreationForm(UserCreationForm):
         super().__init__(*args, **kwargs)
         for fieldname in ['username', 'password1', 'password2']:
             self.fields[fieldname].help_text = None
+
+
+BULK_ACTIONS = (
+    ('complete', 'Mark complete'),
+    ('uncomplete', 'Mark not complete'),
+    ('delete', 'Delete'),
+    ('priority', 'Set priority'),
+    ('category', 'Set category'),
+)
+
+
+class BulkTaskForm(UserCategoryFormMixin, Form):
+    """
+    A form describing one action applied to many tasks at once.
+
+    The task UUIDs are read from the repeated 'uuids' field of the submitted
+    data. UUIDs that cannot be parsed are not an error: they are collected in
+    `invalid_uuids` so the view can report them per ID.
+
+    Attributes:
+        action (ChoiceField): One of BULK_ACTIONS.
+        priority (ChoiceField): The new priority, required for 'priority'.
+        category (UserCategoryField): The uuid of one of the user's categories,
+            required for 'category'.
+    """
+    action = ChoiceField(choices=BULK_ACTIONS)
+    priority = ChoiceField(choices=PRIORITY_CHOICES, required=False)
+    category = UserCategoryField(to_field_name='uuid')
+
+    def clean(self)->dict:
+        """
+        Parse the submitted UUIDs and check the action has the value it needs.
+
+        Returns:
+            dict: The cleaned data, with 'uuids' holding the parsed UUIDs.
+
+        Raises:
+            ValidationError: If no UUID was submitted or the action lacks its value.
+        """
+        cleaned_data = super().clean()
+        self.invalid_uuids = []
+        uuids = []
+        for value in self.data.getlist('uuids'):
+            try:
+                uuids.append(UUID(value))
+            except ValueError:
+                self.invalid_uuids.append(value)
+        if not uuids and not self.invalid_uuids:
+            raise ValidationError('Select at least one task.')
+        action = cleaned_data.get('action')
+        if action == 'priority' and not cleaned_data.get('priority'):
+            self.add_error('priority', 'Choose a priority.')
+        if action == 'category' and not cleaned_data.get('category'):
+            self.add_error('category', 'Choose a category.')
+        cleaned_data['uuids'] = uuids
+        return cleaned_data
+
+
+class TaskApiForm(UserCategoryFormMixin, ModelForm):
+    """
+    A ModelForm validating the JSON body of the task API.
+
+    Unlike TaskForm it includes `complete` and refers to the category by its
+    uuid, the way the API represents it.
+    """
+    category = UserCategoryField(to_field_name='uuid')
+
+    class Meta:
+        model = Task
+        fields = ['title', 'description', 'complete', 'due_date', 'priority']
+
+
+class CategoryForm(ModelForm):
+    """
+    A ModelForm validating the JSON body of the category API.
+
+    The instance must already have its owner, whose other categories the
+    name is checked against.
+    """
+    class Meta:
+        model = Category
+        fields = ['name']
+
+    def clean_name(self)->str:
+        name = self.cleaned_data['name']
+        others = Category.objects.filter(user_id=self.instance.user_id, name=name)
+        if others.exclude(pk=self.instance.pk).exists():
+            raise ValidationError('You already have a category with this name.')
+        return name
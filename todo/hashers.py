@@ -0,0 +1,43 @@
+"""
+Password hashers with their cost taken from the settings.
+
+Django's hashers fix their cost in class attributes. The ones here read it
+from PASSWORD_PBKDF2_ITERATIONS, PASSWORD_SCRYPT_WORK_FACTOR and
+PASSWORD_ARGON2_MEMORY_COST instead, under the same algorithm names, so the
+hashes already stored keep verifying. A hash made with another cost, or with
+a hasher that is no longer first in PASSWORD_HASHERS, is rehashed by Django
+the next time its user logs in.
+"""
+from django.conf import settings
+from django.contrib.auth import hashers
+from django.contrib.auth.password_validation import get_default_password_validators
+
+
+class PBKDF2PasswordHasher(hashers.PBKDF2PasswordHasher):
+    @property
+    def iterations(self) -> int:
+        return settings.PASSWORD_PBKDF2_ITERATIONS
+
+
+class ScryptPasswordHasher(hashers.ScryptPasswordHasher):
+    @property
+    def work_factor(self) -> int:
+        return settings.PASSWORD_SCRYPT_WORK_FACTOR
+
+
+class Argon2PasswordHasher(hashers.Argon2PasswordHasher):
+    @property
+    def memory_cost(self) -> int:
+        return settings.PASSWORD_ARGON2_MEMORY_COST
+
+
+def preload() -> None:
+    """
+    Load the password hashers and validators of the settings.
+
+    Both are kept for the life of the process; loading them before the first
+    request spares it reading the common password list. Called in the
+    gunicorn master, the workers inherit them already loaded.
+    """
+    hashers.get_hashers()
+    get_default_password_validators()
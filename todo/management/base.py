@@ -0,0 +1,37 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+
+class BatchDeleteCommand(BaseCommand):
+    """
+    A housekeeping command deleting old rows in batches, once or repeatedly.
+
+    Subclasses set ``noun`` and implement ``delete()``, which returns the
+    number of rows deleted. Run them from cron, or keep them running in the
+    background with --every.
+
+    Attributes:
+        noun (str): What is deleted, in the plural, for the summary line.
+    """
+    noun = 'rows'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000,
+                            help=f'{self.noun.capitalize()} deleted per statement. Defaults to 1000.')
+        parser.add_argument('--every', type=int,
+                            help='Repeat every this many seconds instead of running once.')
+
+    def delete(self, **options) -> int:
+        raise NotImplementedError
+
+    def handle(self, *args, **options):
+        while True:
+            close_old_connections()
+            deleted = self.delete(**options)
+            if options['verbosity'] >= 1:
+                self.stdout.write(f'{deleted} {self.noun} deleted')
+            if not options['every']:
+                return
+            time.sleep(options['every'])
@@ -0,0 +1,55 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from todo.benchmarks import SCENARIOS, compare, report
+
+
+class Command(BaseCommand):
+    """
+    Run one of the benchmark scenarios defined in ``todo.benchmarks``.
+
+    Example:
+        python manage.py benchmark pagination --size 20000 --repeat 50
+        python manage.py benchmark routes --users 1000 --size 10000 --output before.json
+        python manage.py benchmark routes --users 1000 --size 10000 --compare before.json
+    """
+    help = 'Run a todo benchmark scenario and print its latency figures.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('scenario', help=f'One of: {", ".join(sorted(SCENARIOS))}')
+        parser.add_argument('--size', type=int, default=20000,
+                            help='Number of rows to seed. Defaults to 20000.')
+        parser.add_argument('--repeat', type=int, default=50,
+                            help='Number of timed iterations. Defaults to 50.')
+        parser.add_argument('--concurrency', type=int, default=8,
+                            help='Number of concurrent clients. Defaults to 8.')
+        parser.add_argument('--users', type=int, default=1,
+                            help='Number of users to seed, for scenarios that seed several. '
+                                 'Defaults to 1.')
+        parser.add_argument('--output', help='Save the results with the commit, database '
+                                             'and options to this JSON file.')
+        parser.add_argument('--compare', help='A file saved with --output to compare against.')
+        parser.add_argument('--json', action='store_true',
+                            help='Print the results as JSON.')
+
+    def handle(self, *args, **options):
+        try:
+            run = SCENARIOS[options['scenario']]
+        except KeyError:
+            raise CommandError(f"Unknown scenario '{options['scenario']}'")
+        baseline = None
+        if options['compare']:
+            with open(options['compare']) as file:
+                baseline = json.load(file)
+        results = run(**options)
+        if options['output']:
+            with open(options['output'], 'w') as file:
+                json.dump(report(options['scenario'], options, results), file, indent=2)
+        if baseline is not None:
+            results = compare(results, baseline)
+        if options['json']:
+            self.stdout.write(json.dumps(results, indent=2))
+            return
+        for row in results:
+            self.stdout.write('  '.join(f'{key}={value}' for key, value in row.items()))
@@ -0,0 +1,61 @@
+import json
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.urls import reverse
+
+from todo.startup import APPLICATIONS, probe
+
+
+class Command(BaseCommand):
+    """
+    Report how long a new worker takes to import lynx.wsgi and lynx.asgi and
+    to answer its first request, and the modules that took longest to import.
+
+    Fails when the boot of either application takes longer than --max-boot-ms,
+    so a slow import is caught before it reaches the autoscaler.
+
+    Example:
+        python manage.py check_startup --top 10 --max-boot-ms 1500
+    """
+    help = 'Time the import and first request of the WSGI and ASGI applications.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--path', help='The path of the first request. '
+                                           'Defaults to the login page.')
+        parser.add_argument('--top', type=int, default=15,
+                            help='Number of slowest modules listed. Defaults to 15.')
+        parser.add_argument('--max-boot-ms', type=float, default=3000,
+                            help='Fail when import and first request take longer. '
+                                 'Defaults to 3000.')
+        parser.add_argument('--json', action='store_true',
+                            help='Print the results as JSON.')
+
+    def handle(self, *args, **options):
+        path = options['path'] or reverse(settings.LOGIN_URL)
+        results = {}
+        for module in APPLICATIONS:
+            timings = probe(module, path)
+            slowest = sorted(timings.pop('modules'), key=lambda row: row[1], reverse=True)
+            timings['slowest'] = [
+                {'module': name, 'self_ms': own, 'cumulative_ms': cumulative}
+                for name, own, cumulative in slowest[:options['top']]]
+            results[module] = timings
+
+        if options['json']:
+            self.stdout.write(json.dumps(results, indent=2))
+        else:
+            for module, timings in results.items():
+                self.stdout.write(
+                    f"app={module}  status={timings['status']}  "
+                    f"import_ms={timings['import_ms']:.1f}  "
+                    f"first_request_ms={timings['first_request_ms']:.1f}  "
+                    f"boot_ms={timings['boot_ms']:.1f}")
+                for row in timings['slowest']:
+                    self.stdout.write(f"  module={row['module']}  self_ms={row['self_ms']:.1f}  "
+                                      f"cumulative_ms={row['cumulative_ms']:.1f}")
+
+        slow = [module for module, timings in results.items()
+                if timings['boot_ms'] > options['max_boot_ms']]
+        if slow:
+            raise CommandError(f"Boot slower than {options['max_boot_ms']:g} ms: {', '.join(slow)}")
@@ -0,0 +1,21 @@
+from todo.management.base import BatchDeleteCommand
+from todo.sync import compact_tombstones
+
+
+class Command(BatchDeleteCommand):
+    """
+    Delete the tombstones of deleted tasks older than the retention.
+
+    Example:
+        python manage.py compact_tombstones --every 3600
+    """
+    help = 'Delete task tombstones older than TODO_TOMBSTONE_RETENTION_DAYS in batches.'
+    noun = 'tombstones'
+
+    def add_arguments(self, parser):
+        super().add_arguments(parser)
+        parser.add_argument('--days', type=int,
+                            help='Retention in days. Defaults to TODO_TOMBSTONE_RETENTION_DAYS.')
+
+    def delete(self, **options) -> int:
+        return compact_tombstones(options['days'], options['batch_size'])
@@ -0,0 +1,239 @@
+import csv
+import io
+import json
+import os
+import time
+from collections import defaultdict
+from uuid import uuid4
+
+from django.contrib.auth import get_user_model
+from django.core.exceptions import ObjectDoesNotExist
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from todo.broker import publish_task_event
+from todo.cache import bump_generation
+from todo.models import Task, Category, PRIORITY_CHOICES, SUMMARY_KEY
+from todo.stats import apply_changes
+
+PRIORITIES = tuple(value for value, _ in PRIORITY_CHOICES)
+
+COPY_COLUMNS = (
+    'uuid', 'created_at', 'updated_at', 'title', 'description',
+    'complete', 'due_date', 'priority', 'user_id', 'category_id',
+)
+
+
+# Readers yield each row with the number of the line it ends on
+
+
+def read_csv(stream):
+    reader = csv.DictReader(stream)
+    for row in reader:
+        yield reader.line_num, row
+
+
+def read_ndjson(stream):
+    for line_number, line in enumerate(stream, 1):
+        if line.strip():
+            yield line_number, json.loads(line)
+
+
+READERS = {'csv': read_csv, 'ndjson': read_ndjson}
+
+
+class Lookup:
+    """
+    In-memory lookup tables from usernames, and from each user's category
+    names, to ids.
+
+    Users are loaded as they are first seen, since the import usually covers a
+    small share of them, along with all of their categories. Unknown
+    categories are created for the user, unknown users are an error.
+    """
+
+    def __init__(self):
+        self.users = {}
+        self.categories = {}
+
+    def user_id(self, username: str) -> int:
+        if username not in self.users:
+            users = get_user_model().objects.values_list('id', flat=True)
+            try:
+                user_id = self.users[username] = users.get(username=username)
+            except ObjectDoesNotExist:
+                raise CommandError(f"Unknown user '{username}'")
+            self.categories.update(
+                ((user_id, name), pk) for name, pk in
+                Category.objects.filter(user_id=user_id).values_list('name', 'id'))
+        return self.users[username]
+
+    def category_id(self, user_id: int, name: str):
+        if not name:
+            return None
+        if (user_id, name) not in self.categories:
+            self.categories[user_id, name] = Category.objects.create(name=name, user_id=user_id).id
+        return self.categories[user_id, name]
+
+
+class Command(BaseCommand):
+    """
+    Stream tasks from a CSV or NDJSON file into the database.
+
+    The input uses the columns of the task export (uuid, title, description,
+    complete, due_date, priority, category) plus an optional 'user' column
+    holding a username. Rows are written in batches, each in its own
+    transaction, with PostgreSQL COPY when psycopg2 is in use and bulk_create
+    otherwise. With --checkpoint the number of committed rows is recorded after
+    every batch, and a rerun with the same checkpoint resumes after them. A row
+    without a title, or with an unknown priority or a due date that does not
+    parse, stops the import with its line number.
+
+    Example:
+        python manage.py import_tasks tasks.csv --user alice --checkpoint tasks.ckpt
+    """
+    help = 'Import tasks from a CSV or NDJSON file.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='The file to import.')
+        parser.add_argument('--format', choices=sorted(READERS),
+                            help='Input format. Defaults to the file extension.')
+        parser.add_argument('--user', help='Owner of rows without a user column.')
+        parser.add_argument('--batch-size', type=int, default=10000,
+                            help='Rows per transaction. Defaults to 10000.')
+        parser.add_argument('--checkpoint',
+                            help='File recording progress, used to resume an import.')
+
+    def handle(self, *args, **options):
+        self.verbosity = options['verbosity']
+        path = options['path']
+        file_format = options['format'] or os.path.splitext(path)[1].lstrip('.')
+        if file_format not in READERS:
+            raise CommandError(f"Unknown format '{file_format}', use --format")
+
+        self.lookup = Lookup()
+        self.default_user = options['user']
+        use_copy = connection.vendor == 'postgresql' and self.can_copy()
+        write = self.copy_batch if use_copy else self.bulk_create_batch
+        checkpoint = options['checkpoint']
+        skip = self.read_checkpoint(checkpoint)
+
+        start = time.perf_counter()
+        imported = 0
+        batch = []
+        with open(path, newline='') as stream:
+            for number, (line, row) in enumerate(READERS[file_format](stream), 1):
+                if number <= skip:
+                    continue
+                batch.append(self.convert(row, line))
+                if len(batch) == options['batch_size']:
+                    imported += self.commit(write, batch, checkpoint, skip + imported)
+                    batch = []
+                    self.report(imported, start, verbosity=2)
+            if batch:
+                imported += self.commit(write, batch, checkpoint, skip + imported)
+        self.report(imported, start, verbosity=1, method='COPY' if use_copy else 'bulk_create')
+
+    def can_copy(self) -> bool:
+        with connection.cursor() as cursor:
+            return hasattr(cursor.cursor, 'copy_expert')
+
+    def convert(self, row: dict, line: int) -> tuple:
+        """
+        Turn the input row ending on ``line`` into a tuple of COPY_COLUMNS values.
+        """
+        username = row.get('user') or self.default_user
+        if not username:
+            raise CommandError('Rows without a user column need --user')
+        title = row.get('title')
+        if not title:
+            raise CommandError(f'Line {line}: a title is required')
+        now = timezone.now()
+        complete = row.get('complete')
+        if isinstance(complete, str):
+            complete = complete.lower() in ('true', '1', 't', 'yes')
+        priority = row.get('priority') or 'low'
+        if priority not in PRIORITIES:
+            raise CommandError(
+                f"Line {line}: unknown priority '{priority}', use one of {', '.join(PRIORITIES)}")
+        due_date = row.get('due_date') or None
+        if isinstance(due_date, str):
+            try:
+                parsed = parse_datetime(due_date)
+            except ValueError:
+                parsed = None
+            if parsed is None:
+                raise CommandError(
+                    f"Line {line}: invalid due date '{due_date}', use ISO 8601 such as 2024-05-01T09:00")
+            due_date = parsed
+        user_id = self.lookup.user_id(username)
+        return (
+            row.get('uuid') or uuid4(), now, now, title,
+            row.get('description') or None, bool(complete), due_date,
+            priority, user_id,
+            self.lookup.category_id(user_id, row.get('category')),
+        )
+
+    def commit(self, write, batch: list, checkpoint: str, done: int) -> int:
+        """
+        Write a batch in one transaction and, once it has committed, record
+        the rows done so far in the checkpoint.
+        """
+        with transaction.atomic():
+            write(batch)
+            # COPY and bulk_create send no post_save signals
+            by_user = defaultdict(list)
+            for row in batch:
+                values = dict(zip(COPY_COLUMNS, row))
+                by_user[values['user_id']].append(tuple(values[name] for name in SUMMARY_KEY))
+            for user_id, keys in by_user.items():
+                bump_generation(user_id)
+                apply_changes(user_id, added=keys)
+                publish_task_event(user_id, 'changed')
+            transaction.on_commit(lambda: self.write_checkpoint(checkpoint, done + len(batch)))
+        return len(batch)
+
+    def copy_batch(self, batch: list) -> None:
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        for row in batch:
+            writer.writerow('' if value is None else value for value in row)
+        buffer.seek(0)
+        with connection.cursor() as cursor:
+            cursor.cursor.copy_expert(
+                f'COPY todo_task ({", ".join(COPY_COLUMNS)}) FROM STDIN WITH (FORMAT csv)',
+                buffer)
+
+    def bulk_create_batch(self, batch: list) -> None:
+        Task.objects.bulk_create(
+            [Task(**dict(zip(COPY_COLUMNS, row))) for row in batch],
+            batch_size=len(batch))
+
+    def read_checkpoint(self, checkpoint: str) -> int:
+        if not checkpoint or not os.path.exists(checkpoint):
+            return 0
+        with open(checkpoint) as stream:
+            return json.load(stream)['rows']
+
+    def write_checkpoint(self, checkpoint: str, rows: int) -> None:
+        """
+        Replace the checkpoint in one step, so a crash leaves the previous
+        one whole rather than a partly written file.
+        """
+        if not checkpoint:
+            return
+        with open(checkpoint + '.tmp', 'w') as stream:
+            json.dump({'rows': rows}, stream)
+            stream.flush()
+            os.fsync(stream.fileno())
+        os.replace(checkpoint + '.tmp', checkpoint)
+
+    def report(self, imported: int, start: float, verbosity: int, method: str = None) -> None:
+        if self.verbosity < verbosity:
+            return
+        elapsed = time.perf_counter() - start
+        rate = imported / elapsed if elapsed else 0
+        via = f' via {method}' if method else ''
+        self.stdout.write(f'{imported} rows in {elapsed:.1f}s ({rate:.0f} rows/s){via}')
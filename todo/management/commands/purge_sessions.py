@@ -0,0 +1,16 @@
+from todo.management.base import BatchDeleteCommand
+from todo.sessions import purge_expired_sessions
+
+
+class Command(BatchDeleteCommand):
+    """
+    Delete expired sessions from the database in batches.
+
+    Example:
+        python manage.py purge_sessions --batch-size 1000 --every 3600
+    """
+    help = 'Delete expired rows of django_session in batches.'
+    noun = 'sessions'
+
+    def delete(self, **options) -> int:
+        return purge_expired_sessions(options['batch_size'])
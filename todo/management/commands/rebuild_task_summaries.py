@@ -0,0 +1,33 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+
+from todo.stats import rebuild_summaries
+
+
+class Command(BaseCommand):
+    """
+    Recompute the stats summary of every user from their tasks.
+
+    Summaries are kept up to date as tasks change, so this is only needed
+    after writes that bypass the app, such as raw SQL or a restored backup.
+
+    Example:
+        python manage.py rebuild_task_summaries --batch-size 500
+    """
+    help = 'Recompute the task stats summary of every user.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000,
+                            help='Users rebuilt per query.')
+
+    def handle(self, *args, **options):
+        user_ids = get_user_model().objects.order_by('pk').values_list('pk', flat=True)
+        batch_size, last, rebuilt = options['batch_size'], 0, 0
+        while True:
+            batch = list(user_ids.filter(pk__gt=last)[:batch_size])
+            if not batch:
+                break
+            rebuilt += rebuild_summaries(batch)
+            last = batch[-1]
+        if options['verbosity'] >= 1:
+            self.stdout.write(f'{rebuilt} summaries rebuilt')
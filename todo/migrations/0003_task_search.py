@@ -0,0 +1,79 @@
+from django.db import migrations
+
+POSTGRESQL_FORWARD = [
+    """
+    ALTER TABLE todo_task ADD COLUMN search_vector tsvector GENERATED ALWAYS AS (
+        setweight(to_tsvector('english', coalesce(title, '')), 'A') ||
+        setweight(to_tsvector('english', coalesce(description, '')), 'B')
+    ) STORED
+    """,
+    'CREATE INDEX todo_task_search_vector ON todo_task USING gin (search_vector)',
+]
+POSTGRESQL_BACKWARD = [
+    'DROP INDEX IF EXISTS todo_task_search_vector',
+    'ALTER TABLE todo_task DROP COLUMN IF EXISTS search_vector',
+]
+
+SQLITE_FORWARD = [
+    """
+    CREATE VIRTUAL TABLE todo_task_fts USING fts5(
+        title, description, content='todo_task', content_rowid='id'
+    )
+    """,
+    """
+    CREATE TRIGGER todo_task_fts_insert AFTER INSERT ON todo_task BEGIN
+        INSERT INTO todo_task_fts (rowid, title, description)
+        VALUES (new.id, new.title, new.description);
+    END
+    """,
+    """
+    CREATE TRIGGER todo_task_fts_delete AFTER DELETE ON todo_task BEGIN
+        INSERT INTO todo_task_fts (todo_task_fts, rowid, title, description)
+        VALUES ('delete', old.id, old.title, old.description);
+    END
+    """,
+    """
+    CREATE TRIGGER todo_task_fts_update AFTER UPDATE OF title, description ON todo_task BEGIN
+        INSERT INTO todo_task_fts (todo_task_fts, rowid, title, description)
+        VALUES ('delete', old.id, old.title, old.description);
+        INSERT INTO todo_task_fts (rowid, title, description)
+        VALUES (new.id, new.title, new.description);
+    END
+    """,
+    "INSERT INTO todo_task_fts (todo_task_fts) VALUES ('rebuild')",
+]
+SQLITE_BACKWARD = [
+    'DROP TRIGGER IF EXISTS todo_task_fts_update',
+    'DROP TRIGGER IF EXISTS todo_task_fts_delete',
+    'DROP TRIGGER IF EXISTS todo_task_fts_insert',
+    'DROP TABLE IF EXISTS todo_task_fts',
+]
+
+
+def run(statements):
+    def operation(apps, schema_editor):
+        for statement in statements.get(schema_editor.connection.vendor, []):
+            schema_editor.execute(statement)
+    return operation
+
+
+class Migration(migrations.Migration):
+    """
+    Full-text search over task titles and descriptions.
+
+    PostgreSQL gets a generated, stored tsvector column with a GIN index.
+    SQLite gets an external-content FTS5 table kept in sync by triggers. A later
+    migration that makes SQLite rebuild todo_task (e.g. AlterField) drops the
+    triggers, so it has to run SQLITE_FORWARD again.
+    """
+
+    dependencies = [
+        ('todo', '0002_task_access_path_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            run({'postgresql': POSTGRESQL_FORWARD, 'sqlite': SQLITE_FORWARD}),
+            run({'postgresql': POSTGRESQL_BACKWARD, 'sqlite': SQLITE_BACKWARD}),
+        ),
+    ]
@@ -0,0 +1,48 @@
+from django.db import migrations
+
+
+def assign_owners(apps, schema_editor):
+    """
+    Give every category used by tasks an owner.
+
+    A category used by the tasks of several users is copied for each of them
+    after the first, and their tasks and summary counts are moved to the copy.
+    Tasks already in a category of the same name owned by their user are
+    moved to that one. Categories used by no task keep no owner.
+    """
+    Category = apps.get_model('todo', 'Category')
+    Task = apps.get_model('todo', 'Task')
+    TaskSummary = apps.get_model('todo', 'TaskSummary')
+    owned = {}
+    for category in Category.objects.order_by('id').iterator():
+        user_ids = (Task.objects.filter(category=category).exclude(user=None)
+                    .order_by('user_id').values_list('user_id', flat=True).distinct())
+        for user_id in list(user_ids):
+            key = (user_id, category.name)
+            if key not in owned:
+                if category.user_id is None:
+                    category.user_id = user_id
+                    category.save(update_fields=['user', 'updated_at'])
+                    owned[key] = category.id
+                    continue
+                owned[key] = Category.objects.create(name=category.name, user_id=user_id).id
+            target = owned[key]
+            if target == category.id:
+                continue
+            Task.objects.filter(category=category, user_id=user_id).update(category_id=target)
+            summary = TaskSummary.objects.filter(user_id=user_id).first()
+            count = summary.by_category.pop(str(category.id), 0) if summary else 0
+            if count:
+                summary.by_category[str(target)] = summary.by_category.get(str(target), 0) + count
+                summary.save(update_fields=['by_category'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('todo', '0006_category_user'),
+    ]
+
+    operations = [
+        migrations.RunPython(assign_owners, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 4.1 on 2026-10-18 16:09
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('todo', '0008_category_user_name'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='task',
+            index=models.Index(fields=['user', 'uuid'], name='todo_task_user_uuid'),
+        ),
+    ]
@@ -0,0 +1,26 @@
+# Generated by Django 4.1 on 2026-10-18 16:34
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('todo', '0009_task_user_uuid'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TaskSearchIndex',
+            fields=[
+                ('task', models.OneToOneField(db_column='rowid', on_delete=django.db.models.deletion.DO_NOTHING, primary_key=True, related_name='search_index', serialize=False, to='todo.task')),
+                ('title', models.TextField()),
+                ('description', models.TextField()),
+            ],
+            options={
+                'db_table': 'todo_task_fts',
+                'managed': False,
+            },
+        ),
+    ]
@@ -1,6 +1,9 @@
 
 from django.db.models import (
     Model,
+    OneToOneField,
+    IntegerField,
+    JSONField,
     UUIDField,
     CharField,
     DateTimeField,
@@ -8,16 +11,24 @@ from django.db.models import (
     BooleanField,
     ForeignKey,
     CASCADE,
-    Index
+    DO_NOTHING,
+    Index,
+    Q,
+    UniqueConstraint
 )
 
 from uuid import uuid4
 
+from django.utils import timezone
+
 # import user model
 from django.contrib.auth import get_user_model
 
 
 
+# The fields of a task that decide what it counts for in TaskSummary
+SUMMARY_KEY = ('complete', 'priority', 'category_id', 'due_date')
+
 PRIORITY_CHOICES = (
     ('low', 'Low'),
     ('medium', 'Medium'),
@@ -41,11 +52,31 @@ class BaseModel(Model):
         abstract = True
 
 class Category(BaseModel):
+    """
+    A category of tasks, owned by one user.
+
+    Categories created before they had owners and used by no task are left
+    without one; no user sees them.
+    """
     name = CharField(max_length=200)
-    
+    user = ForeignKey(
+        get_user_model(),
+        on_delete=CASCADE,
+        related_name='categories',
+        null=True, blank=True)
+
     def __str__(self):
         return self.name
 
+    class Meta:
+        verbose_name_plural = 'categories'
+        constraints = [
+            # One category of a name per user; also serves the per-user list.
+            UniqueConstraint(
+                fields=['user', 'name'],
+                name='todo_category_user_name'),
+        ]
+
 class Task(BaseModel):
     title = CharField(max_length=200)
     description = TextField(null=True, blank=True)
@@ -70,7 +101,125 @@ class Task(BaseModel):
     def __str__(self):
         return self.title
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Remember what the task counted for in its owner's TaskSummary, so a
+        # later save or delete can move it to its new buckets.
+        if set(SUMMARY_KEY).issubset(field_names):
+            instance._summary_key = instance.summary_key()
+        return instance
+
+    def summary_key(self)->tuple:
+        """
+        The buckets of TaskSummary this task counts for.
+        """
+        return tuple(getattr(self, name) for name in SUMMARY_KEY)
+
+    class Meta:
+        ordering = ['complete']
+        indexes = [
+            # Per-user list filtered or grouped by status, newest due date first.
+            Index(
+                fields=['user', 'complete', '-due_date'],
+                name='todo_task_user_complete_due'),
+            # Open tasks only; completed rows never bloat this index.
+            Index(
+                fields=['user', '-due_date'],
+                condition=Q(complete=False),
+                name='todo_task_user_open_due'),
+            # Keyset order of TaskListView's cursor pagination.
+            Index(
+                fields=['user', '-due_date', '-id'],
+                name='todo_task_user_due_id'),
+            # Keyset order of the /tasks/changes delta-sync feed.
+            Index(
+                fields=['user', 'updated_at', 'id'],
+                name='todo_task_user_updated'),
+            # Owner-scoped lookup of one task by the task pages.
+            Index(
+                fields=['user', 'uuid'],
+                name='todo_task_user_uuid'),
+        ]
+
+
+class TaskSearchIndex(Model):
+    """
+    A row of the SQLite FTS5 table over the task titles and descriptions.
+
+    The table and the triggers keeping it up to date are created by
+    migration 0003, so the model is unmanaged and only there to be joined to
+    by ``todo.search``.
+    """
+    task = OneToOneField(
+        Task,
+        on_delete=DO_NOTHING,
+        primary_key=True,
+        db_column='rowid',
+        related_name='search_index')
+    title = TextField()
+    description = TextField()
+
     class Meta:
-        ordering = ['complete'] 
-        indexes = [Index(fields=['title'])]
-        
\ No newline at end of file
+        managed = False
+        db_table = 'todo_task_fts'
+
+
+class TaskTombstone(Model):
+    """
+    A record of a deleted task, so sync clients learn about the deletion.
+
+    Tombstones older than TODO_TOMBSTONE_RETENTION_DAYS are removed by the
+    compact_tombstones command.
+    """
+    uuid = UUIDField()
+    user = ForeignKey(
+        get_user_model(),
+        on_delete=CASCADE,
+        related_name='task_tombstones')
+    deleted_at = DateTimeField(default=timezone.now)
+
+    def __str__(self):
+        return str(self.uuid)
+
+    class Meta:
+        indexes = [
+            # Keyset order of the /tasks/changes delta-sync feed.
+            Index(
+                fields=['user', 'deleted_at', 'id'],
+                name='todo_tombstone_user_deleted'),
+            # Compaction deletes by age across all users.
+            Index(
+                fields=['deleted_at'],
+                name='todo_tombstone_deleted'),
+        ]
+
+
+class TaskSummary(Model):
+    """
+    Materialized task counts of one user, read by the stats panel.
+
+    The counters are kept up to date by ``todo.stats`` as tasks are written,
+    so reading them does not depend on the number of tasks. ``overdue``
+    counts the open tasks due before ``overdue_at``; it is recounted when
+    ``next_due_at``, the earliest due date still ahead at that time, has
+    passed, or when ``overdue_at`` was cleared by a write that could not
+    tell.
+    """
+    user = OneToOneField(
+        get_user_model(),
+        on_delete=CASCADE,
+        primary_key=True,
+        related_name='task_summary')
+    total = IntegerField(default=0)
+    complete = IntegerField(default=0)
+    low = IntegerField(default=0)
+    medium = IntegerField(default=0)
+    high = IntegerField(default=0)
+    overdue = IntegerField(default=0)
+    overdue_at = DateTimeField(null=True)
+    next_due_at = DateTimeField(null=True)
+    by_category = JSONField(default=dict)
+
+    def __str__(self):
+        return f'Task summary of {self.user_id}'
@@ -0,0 +1,410 @@
+import base64
+import binascii
+import json
+from datetime import datetime
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.paginator import EmptyPage, InvalidPage, Page, Paginator
+from django.db import connections
+from django.db.models import F, Q, QuerySet
+from django.http import Http404
+from django.utils.functional import cached_property
+
+
+class InvalidCursor(Exception):
+    """
+    Raised when a ``?cursor=`` token cannot be decoded.
+    """
+
+
+class CursorPage:
+    """
+    A single page of results produced by a CursorPaginator.
+
+    The page mirrors the parts of Django's ``Page`` API that the templates use
+    (``object_list``, ``has_next``, ``has_previous``) but carries opaque cursor
+    tokens instead of page numbers, so no ``COUNT(*)`` is ever needed.
+
+    Attributes:
+        object_list (list): The objects on this page, in display order.
+        next_cursor (str): Token for the following page, or None on the last page.
+        previous_cursor (str): Token for the preceding page, or None on the first page.
+    """
+
+    def __init__(self, object_list, next_cursor=None, previous_cursor=None):
+        self.object_list = object_list
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def has_next(self) -> bool:
+        return self.next_cursor is not None
+
+    def has_previous(self) -> bool:
+        return self.previous_cursor is not None
+
+    def has_other_pages(self) -> bool:
+        return self.has_next() or self.has_previous()
+
+
+class CursorPaginator:
+    """
+    Keyset paginator over tasks ordered by ``(-due_date, -id)``.
+
+    Instead of ``OFFSET n`` every page is fetched with a ``WHERE`` clause that
+    starts right after the last row of the previous page, so the cost of a page
+    does not depend on how deep the user has scrolled. ``due_date`` is nullable;
+    tasks without a due date come first, as with PostgreSQL's ``DESC`` order,
+    so the ``todo_task_user_due_id`` index serves the keyset as is.
+
+    Attributes:
+        queryset (QuerySet): The filtered queryset to paginate.
+        per_page (int): The number of objects on each page.
+        ordering (tuple): The display order of the keyset.
+    """
+    ordering = (F('due_date').desc(nulls_first=True), F('id').desc())
+    reverse_ordering = (F('due_date').asc(nulls_last=True), F('id').asc())
+
+    def __init__(self, queryset: QuerySet, per_page: int):
+        self.queryset = queryset
+        self.per_page = per_page
+
+    def key_value(self, obj):
+        """
+        Return the JSON-serialisable sort key of ``obj``.
+        """
+        return obj.due_date.isoformat() if obj.due_date else None
+
+    def parse_key(self, value):
+        """
+        Turn a value produced by ``key_value`` back into a sort key.
+        """
+        return datetime.fromisoformat(value) if value is not None else None
+
+    def encode_cursor(self, obj, reverse: bool = False) -> str:
+        """
+        Build an opaque token pointing at ``obj``.
+
+        Args:
+            obj (Task): The row the next (or previous) page starts after.
+            reverse (bool): Whether the token walks backwards. Defaults to False.
+
+        Returns:
+            str: A URL-safe token.
+        """
+        position = {'k': self.key_value(obj), 'i': obj.pk, 'r': reverse}
+        raw = json.dumps(position, separators=(',', ':')).encode()
+        return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+    def decode_cursor(self, token: str):
+        """
+        Decode a token created by ``encode_cursor``.
+
+        Args:
+            token (str): The token taken from the ``?cursor=`` parameter.
+
+        Returns:
+            tuple: ``(key, id, reverse)``.
+
+        Raises:
+            InvalidCursor: If the token is malformed.
+        """
+        try:
+            raw = base64.urlsafe_b64decode(token + '=' * (-len(token) % 4))
+            position = json.loads(raw)
+            return self.parse_key(position['k']), int(position['i']), bool(position['r'])
+        except (binascii.Error, ValueError, KeyError, TypeError) as exc:
+            raise InvalidCursor(token) from exc
+
+    def _after(self, due_date, pk) -> Q:
+        """
+        Rows that come strictly after ``(due_date, pk)`` in display order.
+        """
+        if due_date is None:
+            return Q(due_date__isnull=True, id__lt=pk) | Q(due_date__isnull=False)
+        return Q(due_date__lt=due_date) | Q(due_date=due_date, id__lt=pk)
+
+    def _before(self, due_date, pk) -> Q:
+        """
+        Rows that come strictly before ``(due_date, pk)`` in display order.
+        """
+        if due_date is None:
+            return Q(due_date__isnull=True, id__gt=pk)
+        return (
+            Q(due_date__gt=due_date)
+            | Q(due_date=due_date, id__gt=pk)
+            | Q(due_date__isnull=True))
+
+    def page(self, token: str = None) -> CursorPage:
+        """
+        Return the page that starts at ``token``.
+
+        Args:
+            token (str, optional): A cursor token, or None for the first page.
+
+        Returns:
+            CursorPage: The requested page.
+
+        Raises:
+            InvalidCursor: If the token is malformed.
+        """
+        direction, queryset = self.page_query(token)
+        return self.make_page(direction, list(queryset))
+
+    async def apage(self, token: str = None) -> CursorPage:
+        """
+        Return the page that starts at ``token``, fetched with the async ORM.
+        """
+        direction, queryset = self.page_query(token)
+        return self.make_page(direction, [obj async for obj in queryset])
+
+    def page_query(self, token: str = None):
+        """
+        Build the query of the page that starts at ``token``.
+
+        One row more than ``per_page`` is fetched to know whether a further
+        page exists without counting.
+
+        Returns:
+            tuple: ``(direction, queryset)`` where direction is 'first',
+            'forward' or 'backward'.
+
+        Raises:
+            InvalidCursor: If the token is malformed.
+        """
+        if not token:
+            return 'first', self.queryset.order_by(*self.ordering)[:self.per_page + 1]
+        key, pk, reverse = self.decode_cursor(token)
+        if not reverse:
+            queryset = self.queryset.filter(self._after(key, pk)).order_by(*self.ordering)
+            return 'forward', queryset[:self.per_page + 1]
+        queryset = self.queryset.filter(self._before(key, pk)).order_by(*self.reverse_ordering)
+        return 'backward', queryset[:self.per_page + 1]
+
+    def make_page(self, direction: str, rows: list) -> CursorPage:
+        """
+        Turn the rows fetched by ``page_query`` into a CursorPage.
+        """
+        has_more = len(rows) > self.per_page
+        rows = rows[:self.per_page]
+        if direction == 'backward':
+            rows = rows[::-1]
+            return CursorPage(
+                rows,
+                next_cursor=self.encode_cursor(rows[-1]) if rows else None,
+                previous_cursor=self.encode_cursor(rows[0], reverse=True) if has_more else None)
+        return CursorPage(
+            rows,
+            next_cursor=self.encode_cursor(rows[-1]) if has_more else None,
+            previous_cursor=(self.encode_cursor(rows[0], reverse=True)
+                             if rows and direction == 'forward' else None))
+
+
+class SearchCursorPaginator(CursorPaginator):
+    """
+    Keyset paginator over search results ordered by ``(-rank, -id)``.
+
+    The queryset must be annotated with a non-null ``rank``, as returned by
+    ``todo.search.search_tasks``.
+    """
+    ordering = (F('rank').desc(), F('id').desc())
+    reverse_ordering = (F('rank').asc(), F('id').asc())
+
+    def key_value(self, obj):
+        return obj.rank
+
+    def parse_key(self, value):
+        return float(value)
+
+    def _after(self, rank, pk) -> Q:
+        return Q(rank__lt=rank) | Q(rank=rank, id__lt=pk)
+
+    def _before(self, rank, pk) -> Q:
+        return Q(rank__gt=rank) | Q(rank=rank, id__gt=pk)
+
+
+def estimate_count(queryset: QuerySet):
+    """
+    Return the planner's estimate of the number of rows of ``queryset``.
+
+    On PostgreSQL this is the row estimate of ``EXPLAIN``, derived from the
+    table statistics kept by ANALYZE; it costs a plan, not a scan. Other
+    databases keep no such statistics.
+
+    Returns:
+        int: The estimated row count, or None if the database cannot tell.
+    """
+    connection = connections[queryset.db]
+    if connection.vendor != 'postgresql':
+        return None
+    sql, params = queryset.order_by().query.sql_with_params()
+    with connection.cursor() as cursor:
+        cursor.execute(f'EXPLAIN (FORMAT JSON) {sql}', params)
+        plan = cursor.fetchone()[0]
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return int(plan[0]['Plan']['Plan Rows'])
+
+
+class EstimatedPage(Page):
+    """
+    A page of an EstimatedCountPaginator.
+
+    When the count is estimated, whether a next page exists is known from one
+    extra row fetched with the page rather than from the count.
+    """
+    more = None
+
+    def has_next(self) -> bool:
+        if self.more is None:
+            return super().has_next()
+        return self.more
+
+
+class EstimatedCountPaginator(Paginator):
+    """
+    Paginator that takes the planner's row estimate instead of ``COUNT(*)``
+    once the estimate reaches ``threshold``.
+
+    An exact count of a large result walks every matching row of the index on
+    each page view. Above the threshold the count, and so the number of
+    pages, is only approximate: page numbers beyond the estimate are still
+    served while they have rows, and ``has_next`` comes from the page itself.
+
+    Attributes:
+        threshold (int): The estimate from which it is trusted. 0 always
+            counts. Defaults to TODO_COUNT_ESTIMATE_THRESHOLD.
+        estimated (bool): Whether ``count`` is an estimate.
+    """
+
+    def __init__(self, object_list, per_page, threshold: int = None, **kwargs):
+        super().__init__(object_list, per_page, **kwargs)
+        self.threshold = settings.TODO_COUNT_ESTIMATE_THRESHOLD if threshold is None else threshold
+        self.estimated = False
+
+    def estimate(self):
+        """
+        Return the estimated count if it reaches the threshold, or None.
+        """
+        if not self.threshold:
+            return None
+        estimate = estimate_count(self.object_list)
+        if estimate is None or estimate < self.threshold:
+            return None
+        return estimate
+
+    @cached_property
+    def count(self) -> int:
+        estimate = self.estimate()
+        if estimate is None:
+            return super().count
+        self.estimated = True
+        return estimate
+
+    def validate_number(self, number) -> int:
+        if not self.count or not self.estimated:
+            return super().validate_number(number)
+        try:
+            number = int(number)
+        except (TypeError, ValueError):
+            raise InvalidPage('That page number is not an integer')
+        if number < 1:
+            raise EmptyPage('That page number is less than 1')
+        return number
+
+    def page(self, number) -> Page:
+        number = self.validate_number(number)
+        if not self.estimated:
+            return super().page(number)
+        bottom = (number - 1) * self.per_page
+        rows = list(self.object_list[bottom:bottom + self.per_page + 1])
+        if not rows and number > 1:
+            raise EmptyPage('That page contains no results')
+        page = self._get_page(rows[:self.per_page], number, self)
+        page.more = len(rows) > self.per_page
+        return page
+
+    def _get_page(self, *args, **kwargs) -> Page:
+        return EstimatedPage(*args, **kwargs)
+
+
+def page_window(page, on_each_side: int = 2) -> range:
+    """
+    Return the page numbers to link around the current page.
+
+    Only the window is built, so the cost does not grow with the number of
+    pages as walking ``paginator.page_range`` does.
+    """
+    last = page.paginator.num_pages
+    if page.has_next():
+        last = max(last, page.number + 1)
+    return range(max(1, page.number - on_each_side), min(last, page.number + on_each_side) + 1)
+
+
+def paginate_by_cursor(queryset: QuerySet, per_page: int, token: str = None,
+                       paginator_class=CursorPaginator):
+    """
+    Paginate ``queryset`` by cursor, turning bad tokens into a 404.
+
+    Returns:
+        tuple: ``(paginator, page)``.
+
+    Raises:
+        Http404: If the token is malformed.
+    """
+    paginator = paginator_class(queryset, per_page)
+    try:
+        return paginator, paginator.page(token)
+    except InvalidCursor:
+        raise Http404('Invalid cursor')
+
+
+async def apaginate_by_cursor(queryset: QuerySet, per_page: int, token: str = None,
+                              paginator_class=CursorPaginator):
+    """
+    Async version of ``paginate_by_cursor``.
+    """
+    paginator = paginator_class(queryset, per_page)
+    try:
+        return paginator, await paginator.apage(token)
+    except InvalidCursor:
+        raise Http404('Invalid cursor')
+
+
+async def apaginate_by_offset(queryset: QuerySet, per_page: int, number=None):
+    """
+    Paginate ``queryset`` by page number with the async ORM.
+
+    The count and the page rows are fetched with ``acount()`` and ``async for``
+    and handed to an EstimatedCountPaginator, so the page behaves exactly like
+    the one built by ListView. When the count is estimated the paginator
+    builds the page itself, in a worker thread.
+
+    Returns:
+        tuple: ``(paginator, page)``.
+
+    Raises:
+        Http404: If the page number is invalid.
+    """
+    paginator = EstimatedCountPaginator(queryset, per_page)
+    estimate = await sync_to_async(paginator.estimate)() if paginator.threshold else None
+    if estimate is None:
+        paginator.count = await queryset.acount()
+    else:
+        paginator.count, paginator.estimated = estimate, True
+    if number == 'last':
+        number = paginator.num_pages
+    try:
+        if paginator.estimated:
+            return paginator, await sync_to_async(paginator.page)(number or 1)
+        page = paginator.page(number or 1)
+    except InvalidPage:
+        raise Http404('Invalid page')
+    page.object_list = [obj async for obj in page.object_list]
+    return paginator, page
@@ -0,0 +1,276 @@
+"""
+Per-request profiling: wall time, SQL queries and template rendering.
+
+ProfilingMiddleware is installed when TODO_PROFILING is set. For every request
+it measures the wall time, the number and total time of SQL queries, how many
+queries repeated a statement the same request already ran, and the time spent
+rendering the template of a TemplateResponse. Pages served from the page
+cache (todo/cache.py) render no template: they are counted as cache hits and
+left out of the template time, which would otherwise read about 0. The
+figures are:
+
+- sent back in a ``Server-Timing`` header, shown by browser dev tools next to
+  the request;
+- logged as one line by the ``todo.profiling`` logger, and as fields of the
+  log record for structured handlers;
+- kept in a rolling window of samples per URL name, summarised by
+  ``route_stats`` and served to staff at ``/api/profile/``.
+
+Queries are seen through an execute wrapper added to every database
+connection as it opens, which finds the profile of the current request in a
+context variable. It works without DEBUG, and for async views whose queries
+run in worker threads. The wall time of a
+streaming response stops when its headers are ready.
+"""
+import asyncio
+import logging
+import re
+import threading
+import time
+from collections import Counter, deque
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import connections
+from django.db.backends.signals import connection_created
+
+logger = logging.getLogger(__name__)
+
+# Upper bounds in milliseconds of the latency histogram of each route
+BUCKETS = (5, 10, 25, 50, 100, 250, 500, 1000, 2500)
+
+IN_LIST = re.compile(r'IN \((?:%s, )*%s\)')
+
+_current = ContextVar('todo_request_profile', default=None)
+_samples = {}
+_samples_lock = threading.Lock()
+
+
+class RequestProfile:
+    """
+    The figures of one request, filled in while it runs.
+
+    Attributes:
+        started (float): perf_counter() when the request came in.
+        queries (int): The number of SQL statements run.
+        sql_time (float): Seconds spent in the database.
+        fingerprints (Counter): How often each statement ran, with the
+            values of ``IN`` lists collapsed.
+        template_time (float): Seconds spent rendering the template.
+        cache (str): The X-Cache header of the response, HIT or MISS for
+            pages of the page cache, empty otherwise.
+    """
+    __slots__ = ('started', 'queries', 'sql_time', 'fingerprints', 'template_time',
+                 'cache', '_render_started')
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.queries = 0
+        self.sql_time = 0.0
+        self.fingerprints = Counter()
+        self.template_time = 0.0
+        self.cache = ''
+        self._render_started = None
+
+    def add_query(self, sql: str, seconds: float) -> None:
+        self.queries += 1
+        self.sql_time += seconds
+        if 'IN (' in sql:
+            sql = IN_LIST.sub('IN (...)', sql)
+        self.fingerprints[sql] += 1
+
+    def duplicates(self) -> int:
+        """
+        Return the number of queries that repeated an earlier statement.
+        """
+        return self.queries - len(self.fingerprints)
+
+    def has_rendered(self) -> bool:
+        """
+        Return whether a template was rendered for the request.
+        """
+        return self._render_started is not None
+
+    def render_started(self) -> None:
+        self._render_started = time.perf_counter()
+
+    def rendered(self, response):
+        self.template_time += time.perf_counter() - self._render_started
+        return response
+
+
+def render(response):
+    """
+    Render a TemplateResponse now, in the template time of the current
+    request. For views that render before the middleware sees the response,
+    such as the page cache storing a MISS.
+    """
+    profile = _current.get()
+    if profile is None:
+        return response.render()
+    profile.render_started()
+    return profile.rendered(response.render())
+
+
+def record_query(execute, sql, params, many, context):
+    """
+    Execute wrapper adding each query to the profile of the current request.
+    """
+    profile = _current.get()
+    if profile is None:
+        return execute(sql, params, many, context)
+    start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        profile.add_query(sql, time.perf_counter() - start)
+
+
+def install_wrapper(connection, **kwargs) -> None:
+    """
+    Add ``record_query`` to the execute wrappers of a connection, once.
+    """
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_query)
+
+
+def add_sample(route: str, status: int, profile: RequestProfile, wall_time: float) -> None:
+    """
+    Add a request to the rolling window of its route.
+    """
+    template_time = profile.template_time * 1000 if profile.has_rendered() else None
+    sample = (time.monotonic(), wall_time * 1000, profile.queries,
+              profile.sql_time * 1000, template_time, status >= 500, profile.cache == 'HIT')
+    with _samples_lock:
+        samples = _samples.get(route)
+        if samples is None:
+            samples = _samples[route] = deque(maxlen=settings.TODO_PROFILING_SAMPLES)
+        samples.append(sample)
+
+
+def nearest_rank(ordered: list, pct: float) -> float:
+    return ordered[max(0, min(len(ordered) - 1, round(pct / 100 * len(ordered)) - 1))]
+
+
+def route_stats() -> dict:
+    """
+    Summarise the requests of the last TODO_PROFILING_WINDOW_SECONDS per route.
+
+    Returns:
+        dict: For each URL name, the request, error and page cache hit
+        counts, latency percentiles and histogram in milliseconds, the mean
+        query count and SQL time, and the mean template time of the requests
+        that rendered one.
+    """
+    since = time.monotonic() - settings.TODO_PROFILING_WINDOW_SECONDS
+    with _samples_lock:
+        windows = {route: [s for s in samples if s[0] >= since]
+                   for route, samples in _samples.items()}
+    stats = {}
+    for route, samples in sorted(windows.items()):
+        if not samples:
+            continue
+        count = len(samples)
+        latencies = sorted(sample[1] for sample in samples)
+        rendered = [sample[4] for sample in samples if sample[4] is not None]
+        histogram = Counter(next((f'le_{bound}' for bound in BUCKETS if latency <= bound), 'inf')
+                            for latency in latencies)
+        stats[route] = {
+            'count': count,
+            'errors': sum(sample[5] for sample in samples),
+            'cache_hits': sum(sample[6] for sample in samples),
+            'p50_ms': round(nearest_rank(latencies, 50), 3),
+            'p95_ms': round(nearest_rank(latencies, 95), 3),
+            'p99_ms': round(nearest_rank(latencies, 99), 3),
+            'max_ms': round(latencies[-1], 3),
+            'queries': round(sum(sample[2] for sample in samples) / count, 2),
+            'sql_ms': round(sum(sample[3] for sample in samples) / count, 3),
+            'template_ms': round(sum(rendered) / len(rendered), 3) if rendered else None,
+            'histogram': {label: histogram[label]
+                          for label in [f'le_{bound}' for bound in BUCKETS] + ['inf']},
+        }
+    return stats
+
+
+def reset_stats() -> None:
+    with _samples_lock:
+        _samples.clear()
+
+
+class ProfilingMiddleware:
+    """
+    Profile each request and report it in a header, the log and route_stats.
+
+    Must come first in MIDDLEWARE so its figures cover the other middleware
+    and it is the last to see a TemplateResponse before it is rendered.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        connection_created.connect(install_wrapper)
+        self.is_async = asyncio.iscoroutinefunction(get_response)
+        if self.is_async:
+            # Mark the instance as a coroutine function, as MiddlewareMixin does
+            self._is_coroutine = asyncio.coroutines._is_coroutine
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        profile, token = self.start(request)
+        try:
+            response = self.get_response(request)
+        finally:
+            _current.reset(token)
+        return self.finish(request, response, profile)
+
+    async def __acall__(self, request):
+        profile, token = self.start(request)
+        try:
+            response = await self.get_response(request)
+        finally:
+            _current.reset(token)
+        return self.finish(request, response, profile)
+
+    def start(self, request) -> tuple:
+        for connection in connections.all():
+            install_wrapper(connection)
+        profile = request.profile = RequestProfile()
+        return profile, _current.set(profile)
+
+    def process_template_response(self, request, response):
+        profile = request.profile
+        profile.render_started()
+        response.add_post_render_callback(profile.rendered)
+        return response
+
+    def finish(self, request, response, profile: RequestProfile):
+        wall_time = time.perf_counter() - profile.started
+        match = request.resolver_match
+        route = match.view_name if match else 'unresolved'
+        duplicates = profile.duplicates()
+        profile.cache = response.get('X-Cache', '')
+        template_ms = round(profile.template_time * 1000, 3) if profile.has_rendered() else None
+        timing = (f'app;dur={wall_time * 1000:.2f}, '
+                  f'db;desc="{profile.queries} queries, {duplicates} duplicate";'
+                  f'dur={profile.sql_time * 1000:.2f}')
+        if template_ms is not None:
+            timing += f', tpl;dur={template_ms:.2f}'
+        if profile.cache:
+            timing += f', cache;desc={profile.cache}'
+        response['Server-Timing'] = timing
+        add_sample(route, response.status_code, profile, wall_time)
+        logger.info(
+            'route=%s method=%s status=%s ms=%.2f queries=%d sql_ms=%.2f duplicates=%d '
+            'template_ms=%s cache=%s', route, request.method, response.status_code,
+            wall_time * 1000, profile.queries, profile.sql_time * 1000, duplicates,
+            '-' if template_ms is None else f'{template_ms:.2f}', profile.cache or '-',
+            extra={
+                'route': route, 'status': response.status_code,
+                'duration_ms': round(wall_time * 1000, 3), 'queries': profile.queries,
+                'sql_ms': round(profile.sql_time * 1000, 3), 'duplicates': duplicates,
+                'duplicate_sql': [sql for sql, count in profile.fingerprints.items() if count > 1],
+                'template_ms': template_ms, 'cache': profile.cache,
+            })
+        return response
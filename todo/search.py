@@ -0,0 +1,55 @@
+import re
+
+from django.db import connections
+from django.db.models import BooleanField, FloatField, QuerySet
+from django.db.models.expressions import RawSQL
+
+TOKEN = re.compile(r'\w+')
+
+
+def fts5_query(text: str) -> str:
+    """
+    Turn free text into a safe FTS5 query matching every word as a prefix.
+
+    Quoting each word keeps FTS5 operators typed by the user (AND, NEAR, ``*``,
+    ``:``) from being interpreted.
+    """
+    return ' '.join(f'"{word}"*' for word in TOKEN.findall(text))
+
+
+def search_tasks(queryset: QuerySet, text: str) -> QuerySet:
+    """
+    Filter ``queryset`` to tasks matching ``text`` and annotate their ``rank``.
+
+    On PostgreSQL the match runs against the stored ``search_vector`` column
+    (GIN indexed). On SQLite it runs against the ``todo_task_fts`` FTS5 table,
+    joined through the TaskSearchIndex model.
+    Both are created and kept up to date by migration 0003, so no signal
+    handler is involved. Title matches rank above description matches.
+
+    Args:
+        queryset (QuerySet): The user's tasks.
+        text (str): The search text from ``?q=``.
+
+    Returns:
+        QuerySet: The matching tasks annotated with a ``rank``, higher is better.
+    """
+    connection = connections[queryset.db]
+    if connection.vendor == 'postgresql':
+        query = "websearch_to_tsquery('english', %s)"
+        return queryset.annotate(
+            rank=RawSQL(f'ts_rank_cd(todo_task.search_vector, {query})', [text],
+                        output_field=FloatField()),
+        ).filter(RawSQL(f'todo_task.search_vector @@ {query}', [text],
+                        output_field=BooleanField()))
+
+    match = fts5_query(text)
+    if not match:
+        return queryset.none()
+    # Joined as todo_task_fts; bm25() needs the MATCH operator itself rather
+    # than FTS5's equivalent "todo_task_fts = %s"
+    return queryset.filter(search_index__isnull=False).filter(
+        RawSQL('todo_task_fts MATCH %s', [match], output_field=BooleanField()),
+    ).annotate(
+        rank=RawSQL('-bm25(todo_task_fts, 2.0, 1.0)', [], output_field=FloatField()),
+    )
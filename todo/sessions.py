@@ -0,0 +1,38 @@
+"""
+Housekeeping of the session store.
+
+Expired sessions of the database-backed engines ('db' and 'cached_db') are
+never removed by Django itself; ``clearsessions`` deletes them all in one
+statement, which holds its locks for as long as the backlog is large. The
+purge here deletes them in batches of primary keys, each in its own short
+transaction.
+"""
+from django.conf import settings
+from django.contrib.sessions.models import Session
+from django.utils import timezone
+
+from .deletion import delete_in_batches
+
+DATABASE_ENGINES = (
+    'django.contrib.sessions.backends.db',
+    'django.contrib.sessions.backends.cached_db',
+)
+
+
+def purge_expired_sessions(batch_size: int = 1000) -> int:
+    """
+    Delete the expired rows of ``django_session`` in batches.
+
+    Engines that keep no rows (cache, signed cookies) have nothing to purge:
+    their sessions expire on their own.
+
+    Args:
+        batch_size (int): The most rows deleted per statement.
+
+    Returns:
+        int: The number of sessions deleted.
+    """
+    if settings.SESSION_ENGINE not in DATABASE_ENGINES:
+        return 0
+    expired = Session.objects.filter(expire_date__lt=timezone.now())
+    return delete_in_batches(expired, batch_size)
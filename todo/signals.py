@@ -0,0 +1,104 @@
+from django.contrib.auth import get_user_model
+from django.contrib.auth.signals import user_logged_in
+from django.db.models import QuerySet
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .broker import publish_task_event
+from .cache import bump_generation
+from .categories import invalidate_categories
+from .models import Task, Category, SUMMARY_KEY
+from .stats import apply_changes, rebuild_summaries
+from .sync import record_deletions
+
+
+def deleted_with_user(origin) -> bool:
+    """
+    Whether a delete cascades from deleting the tasks' user.
+    """
+    origin_model = origin.model if isinstance(origin, QuerySet) else type(origin)
+    return origin_model is get_user_model()
+
+
+@receiver(post_save, sender=Task)
+@receiver(post_delete, sender=Task)
+def invalidate_user_pages(sender, instance: Task, **kwargs) -> None:
+    """
+    Bump the owner's cache generation whenever one of their tasks is written.
+    """
+    bump_generation(instance.user_id)
+
+
+@receiver(user_logged_in)
+def invalidate_pages_on_login(sender, request, user, **kwargs) -> None:
+    """
+    Start a new login with freshly rendered pages.
+    """
+    bump_generation(user.pk)
+
+
+@receiver(post_save, sender=Task)
+def publish_save(sender, instance: Task, created: bool, **kwargs) -> None:
+    """
+    Tell the owner's open pages that a task was created or changed.
+    """
+    publish_task_event(instance.user_id, 'created' if created else 'updated', [instance.uuid])
+
+
+@receiver(post_delete, sender=Task)
+def publish_delete(sender, instance: Task, **kwargs) -> None:
+    publish_task_event(instance.user_id, 'deleted', [instance.uuid])
+
+
+@receiver(post_save, sender=Task)
+def update_summary_on_save(sender, instance: Task, created: bool, **kwargs) -> None:
+    """
+    Move a saved task to its new buckets of the owner's TaskSummary.
+
+    A task loaded without the counted fields does not know its old buckets;
+    the summary is then rebuilt from the owner's tasks.
+    """
+    previous = getattr(instance, '_summary_key', None)
+    if created or previous is not None:
+        apply_changes(instance.user_id, [previous] if previous else [], [instance.summary_key()])
+    elif instance.user_id is not None:
+        rebuild_summaries([instance.user_id])
+    instance._summary_key = instance.summary_key()
+
+
+@receiver(post_delete, sender=Task)
+def update_summary_on_delete(sender, instance: Task, origin=None, **kwargs) -> None:
+    """
+    Take a deleted task out of the owner's TaskSummary.
+    """
+    if instance.user_id is None or deleted_with_user(origin):
+        return
+    previous = getattr(instance, '_summary_key', None)
+    if previous is None and instance.get_deferred_fields().intersection(SUMMARY_KEY):
+        rebuild_summaries([instance.user_id])
+    else:
+        apply_changes(instance.user_id, [previous or instance.summary_key()])
+
+
+@receiver(post_delete, sender=Task)
+def record_tombstone(sender, instance: Task, origin=None, **kwargs) -> None:
+    """
+    Leave a tombstone for the sync feed when a task is deleted.
+
+    Tasks deleted along with their user need none; the user's tombstones are
+    being deleted by the same cascade.
+    """
+    if instance.user_id is None or deleted_with_user(origin):
+        return
+    record_deletions(instance.user_id, [instance.uuid])
+
+
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+def invalidate_categories_on_change(sender, instance: Category, **kwargs) -> None:
+    """
+    Drop the owner's cached categories and pages when one of their categories
+    is written, since the pages show its name.
+    """
+    invalidate_categories(instance.user_id)
+    bump_generation(instance.user_id)
@@ -0,0 +1,103 @@
+"""
+Boot time of the WSGI and ASGI applications, as seen by a new worker.
+
+Each probe starts a fresh interpreter with ``-X importtime``, imports the
+application module, sends it one GET request and reports how long the import
+and the first response took. Every import made along the way, including
+those the first request triggers (URLconf, views, templates), is read back
+from the interpreter's import log, so slow modules can be named.
+
+The probes run in a subprocess because a worker that has already imported
+Django would report nothing.
+"""
+import json
+import os
+import re
+import subprocess
+import sys
+
+from django.conf import settings
+
+APPLICATIONS = ('lynx.wsgi', 'lynx.asgi')
+
+# "import time:   self [us] | cumulative | imported package"
+IMPORT_LINE = re.compile(r'^import time:\s+(\d+) \|\s+(\d+) \|\s*(\S+)$')
+
+PROBE = r'''
+import asyncio, json, sys, time
+
+module, path = sys.argv[1], sys.argv[2]
+start = time.perf_counter()
+application = __import__(module, fromlist=['application']).application
+imported = time.perf_counter()
+
+if module.endswith('asgi'):
+    statuses = []
+
+    async def receive():
+        return {'type': 'http.request', 'body': b'', 'more_body': False}
+
+    async def send(message):
+        if message['type'] == 'http.response.start':
+            statuses.append(message['status'])
+
+    asyncio.run(application({
+        'type': 'http', 'asgi': {'version': '3.0'}, 'http_version': '1.1',
+        'method': 'GET', 'scheme': 'http', 'path': path, 'raw_path': path.encode(),
+        'query_string': b'', 'root_path': '', 'headers': [(b'host', b'localhost')],
+        'client': ('127.0.0.1', 0), 'server': ('localhost', 80),
+    }, receive, send))
+    status = statuses[0]
+else:
+    from wsgiref.util import setup_testing_defaults
+    environ = {'PATH_INFO': path, 'REQUEST_METHOD': 'GET'}
+    setup_testing_defaults(environ)
+    statuses = []
+    body = application(environ, lambda status, headers, exc_info=None: statuses.append(status))
+    b''.join(body)
+    body.close()
+    status = int(statuses[0].split()[0])
+
+done = time.perf_counter()
+print(json.dumps({
+    'import_ms': (imported - start) * 1000,
+    'first_request_ms': (done - imported) * 1000,
+    'status': status,
+}))
+'''
+
+
+def parse_import_times(log: str) -> list:
+    """
+    Read the ``-X importtime`` log of an interpreter.
+
+    Returns:
+        list: (module, self_ms, cumulative_ms) for each imported module.
+    """
+    modules = []
+    for line in log.splitlines():
+        match = IMPORT_LINE.match(line)
+        if match:
+            own, cumulative, name = match.groups()
+            modules.append((name, int(own) / 1000, int(cumulative) / 1000))
+    return modules
+
+
+def probe(module: str, path: str) -> dict:
+    """
+    Boot ``module`` in a new interpreter and time its first request to ``path``.
+
+    Returns:
+        dict: import_ms, first_request_ms, boot_ms (their sum), the response
+        status and the imported modules as parsed by parse_import_times.
+    """
+    env = dict(os.environ, DJANGO_SETTINGS_MODULE=settings.SETTINGS_MODULE)
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', PROBE, module, path],
+        capture_output=True, text=True, env=env)
+    if result.returncode:
+        raise RuntimeError(f'{module} failed to boot:\n{result.stderr[-2000:]}')
+    timings = json.loads(result.stdout.strip().splitlines()[-1])
+    timings['boot_ms'] = timings['import_ms'] + timings['first_request_ms']
+    timings['modules'] = parse_import_times(result.stderr)
+    return timings
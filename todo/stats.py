@@ -0,0 +1,191 @@
+"""
+Per-user task counts for the stats panel, kept in TaskSummary.
+
+A summary is built with one grouped conditional-aggregation query over the
+user's tasks (``rebuild_summaries``) and then moved along with every write:
+
+- saves and deletes seen by the Task signals, bulk changes and imports pass
+  the buckets their tasks left and entered to ``apply_changes``, which
+  updates the row under a lock;
+- the complete toggle does not load the task, so ``apply_completion``
+  moves it between open and complete, and in or out of the overdue count,
+  with a single UPDATE that reads its due date in a subquery.
+
+Reading a summary (``get_summary``) is one query, plus one count over the
+user's open tasks when a due date has passed since the last read.
+"""
+from collections import Counter
+
+from django.db import transaction
+from django.db.models import Count, F, Min, OuterRef, Q, QuerySet, Subquery
+from django.db.models.functions import Coalesce, Least
+from django.utils import timezone
+
+from .models import Task, TaskSummary, Category, PRIORITY_CHOICES
+
+PRIORITIES = tuple(value for value, _ in PRIORITY_CHOICES)
+
+
+def aggregate_counts(queryset, now):
+    """
+    Count tasks per user and category in one query.
+
+    Returns:
+        QuerySet: One row per (user_id, category_id) with n_total,
+        n_complete, n_overdue, n_<priority> and next_due_at.
+    """
+    open_tasks = Q(complete=False, due_date__isnull=False)
+    # The counts are prefixed so they do not shadow the complete field.
+    return (queryset.order_by().values('user_id', 'category_id').annotate(
+        n_total=Count('id'),
+        n_complete=Count('id', filter=Q(complete=True)),
+        n_overdue=Count('id', filter=open_tasks & Q(due_date__lt=now)),
+        next_due_at=Min('due_date', filter=open_tasks & Q(due_date__gte=now)),
+        **{'n_' + priority: Count('id', filter=Q(priority=priority)) for priority in PRIORITIES}))
+
+
+def rebuild_summaries(user_ids) -> int:
+    """
+    Compute the summaries of ``user_ids`` from their tasks and store them.
+
+    Returns:
+        int: The number of summaries written.
+    """
+    now = timezone.now()
+    summaries = {user_id: TaskSummary(user_id=user_id, overdue_at=now) for user_id in user_ids}
+    for row in aggregate_counts(Task.objects.filter(user_id__in=summaries), now):
+        summary = summaries[row['user_id']]
+        for name in ('total', 'complete', 'overdue') + PRIORITIES:
+            setattr(summary, name, getattr(summary, name) + row['n_' + name])
+        if row['category_id'] is not None:
+            summary.by_category[str(row['category_id'])] = row['n_total']
+        if row['next_due_at'] and (summary.next_due_at is None
+                                   or row['next_due_at'] < summary.next_due_at):
+            summary.next_due_at = row['next_due_at']
+    TaskSummary.objects.bulk_create(
+        summaries.values(), update_conflicts=True, unique_fields=['user_id'],
+        update_fields=['total', 'complete', 'overdue', 'overdue_at', 'next_due_at',
+                       'by_category', *PRIORITIES])
+    return len(summaries)
+
+
+def refresh_overdue(summary: TaskSummary, now) -> None:
+    """
+    Recount the overdue tasks of a summary as of ``now``.
+    """
+    counts = Task.objects.filter(
+        user_id=summary.user_id, complete=False, due_date__isnull=False,
+    ).aggregate(
+        overdue=Count('id', filter=Q(due_date__lt=now)),
+        next_due_at=Min('due_date', filter=Q(due_date__gte=now)))
+    summary.overdue = counts['overdue']
+    summary.next_due_at = counts['next_due_at']
+    summary.overdue_at = now
+    summary.save(update_fields=['overdue', 'next_due_at', 'overdue_at'])
+
+
+def get_summary(user) -> TaskSummary:
+    """
+    Return the up to date summary of a user, building it on first use.
+    """
+    now = timezone.now()
+    summary = TaskSummary.objects.filter(user=user).first()
+    if summary is None:
+        rebuild_summaries([user.pk])
+        return TaskSummary.objects.get(user=user)
+    if summary.overdue_at is None or (summary.next_due_at and summary.next_due_at <= now):
+        refresh_overdue(summary, now)
+    return summary
+
+
+def summary_data(summary: TaskSummary) -> dict:
+    """
+    Return a summary as a JSON-serialisable dict, naming its categories.
+    """
+    categories = []
+    if summary.by_category:
+        categories = Category.objects.filter(
+            id__in=[int(pk) for pk in summary.by_category]).values_list('id', 'uuid', 'name')
+    return {
+        'total': summary.total,
+        'open': summary.total - summary.complete,
+        'complete': summary.complete,
+        'overdue': summary.overdue,
+        'priority': {priority: getattr(summary, priority) for priority in PRIORITIES},
+        'categories': [
+            {'uuid': uuid, 'name': name, 'count': summary.by_category[str(pk)]}
+            for pk, uuid, name in sorted(categories, key=lambda row: row[2])],
+    }
+
+
+def apply_changes(user_id: int, removed=(), added=()) -> None:
+    """
+    Move tasks between the buckets of their owner's summary.
+
+    Args:
+        user_id (int): The owner of the tasks.
+        removed (iterable): The SUMMARY_KEY values of the tasks as they were,
+            for tasks that changed or were deleted.
+        added (iterable): The SUMMARY_KEY values of the tasks as they are
+            now, for tasks that changed or were created.
+
+    Raises:
+        ValueError: If a priority is not one of PRIORITY_CHOICES.
+    """
+    if user_id is None:
+        return
+    with transaction.atomic(savepoint=False):
+        summary = TaskSummary.objects.select_for_update().filter(user_id=user_id).first()
+        if summary is None:
+            # Built from the tasks themselves on first read.
+            return
+        counts, categories = Counter(), Counter(summary.by_category)
+        for sign, keys in ((-1, removed), (1, added)):
+            for complete, priority, category_id, due_date in keys:
+                if priority not in PRIORITIES:
+                    raise ValueError(f'Unknown priority {priority!r}')
+                counts['total'] += sign
+                counts['complete'] += sign * complete
+                counts[priority] += sign
+                if category_id is not None:
+                    categories[str(category_id)] += sign
+                if complete or due_date is None or summary.overdue_at is None:
+                    continue
+                if due_date < summary.overdue_at:
+                    counts['overdue'] += sign
+                elif sign > 0 and (summary.next_due_at is None or due_date < summary.next_due_at):
+                    summary.next_due_at = due_date
+        for name, delta in counts.items():
+            setattr(summary, name, getattr(summary, name) + delta)
+        summary.by_category = {pk: count for pk, count in categories.items() if count > 0}
+        summary.save()
+
+
+def apply_completion(user_id: int, complete: bool, tasks: QuerySet, count: int = 1) -> None:
+    """
+    Move ``count`` tasks that flipped to ``complete`` between open and
+    complete with one UPDATE.
+
+    The tasks' due dates are read by subqueries of that UPDATE: a task due
+    before the summary's ``overdue_at`` leaves or joins the overdue count,
+    and a task reopened with a later due date may become ``next_due_at``.
+
+    Args:
+        user_id (int): The owner of the tasks.
+        complete (bool): The state the tasks flipped to.
+        tasks (QuerySet): The tasks that flipped.
+        count (int): How many they are.
+    """
+    dated = tasks.order_by().filter(due_date__isnull=False).values('user_id')
+    overdue = dated.filter(due_date__lt=OuterRef('overdue_at')).annotate(n=Count('id')).values('n')
+    sign = 1 if complete else -1
+    changes = {
+        'complete': F('complete') + sign * count,
+        'overdue': F('overdue') - sign * Coalesce(Subquery(overdue), 0),
+    }
+    if not complete:
+        upcoming = Subquery(dated.filter(due_date__gte=OuterRef('overdue_at')).annotate(
+            due=Min('due_date')).values('due'))
+        # Least() of a NULL is NULL on SQLite, but the other one on PostgreSQL
+        changes['next_due_at'] = Coalesce(Least('next_due_at', upcoming), upcoming, 'next_due_at')
+    TaskSummary.objects.filter(user_id=user_id).update(**changes)
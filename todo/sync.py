@@ -0,0 +1,186 @@
+"""
+The delta-sync feed of a user's tasks.
+
+A client keeps a local copy of its tasks and asks for what changed since its
+last sync with an opaque token. The feed returns the tasks created or
+modified since then, in ``(updated_at, id)`` order, and the uuids of the tasks
+deleted since then, from TaskTombstone in ``(deleted_at, id)`` order. Both
+walks use an index that starts with the user, so a sync reads only the rows
+that changed.
+
+``updated_at`` is set when a row is written, not when its transaction
+commits, so a row can become visible with a timestamp just before rows the
+client already saw. When a client has caught up, its next sync therefore
+starts TODO_SYNC_OVERLAP_SECONDS before the last change it saw and sends the
+changes of that window again; clients apply changes idempotently.
+
+Tokens older than the tombstone retention can no longer be answered
+correctly; the feed rejects them with StaleToken and the client must sync
+from scratch. The tombstone mark of a caught-up client moves up to the time
+of its sync even when nothing was deleted, so only a client that stopped
+syncing for that long has to.
+"""
+import base64
+import binascii
+import json
+from datetime import datetime, timedelta
+
+from django.conf import settings
+from django.db.models import Q, QuerySet
+from django.utils import timezone
+
+from .deletion import delete_in_batches
+from .models import Task, TaskTombstone
+from .pagination import InvalidCursor
+
+
+class StaleToken(Exception):
+    """
+    Raised for a token older than the tombstone retention.
+    """
+
+
+def encode_token(position: dict) -> str:
+    """
+    Turn the positions of both walks into an opaque URL-safe token.
+    """
+    raw = json.dumps(position, separators=(',', ':'), default=str).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_token(token: str) -> dict:
+    """
+    Decode a token created by ``encode_token``.
+
+    Returns:
+        dict: ``t``/``i`` (updated_at and id of the last task seen),
+        ``d``/``j`` (deleted_at and id of the last tombstone seen) and ``c``
+        (whether the client had caught up).
+
+    Raises:
+        InvalidCursor: If the token is malformed.
+    """
+    try:
+        raw = base64.urlsafe_b64decode(token + '=' * (-len(token) % 4))
+        position = json.loads(raw)
+        return {
+            't': datetime.fromisoformat(position['t']) if position['t'] else None,
+            'i': int(position['i']),
+            'd': datetime.fromisoformat(position['d']),
+            'j': int(position['j']),
+            'c': bool(position['c']),
+        }
+    except (binascii.Error, ValueError, KeyError, TypeError) as exc:
+        raise InvalidCursor(token) from exc
+
+
+def after(queryset: QuerySet, field: str, value, pk: int) -> QuerySet:
+    """
+    Rows strictly after ``(value, pk)`` in ``(field, id)`` order.
+    """
+    if value is None:
+        return queryset
+    return queryset.filter(Q(**{f'{field}__gt': value}) | Q(**{field: value, 'id__gt': pk}))
+
+
+def tombstone_horizon() -> datetime:
+    """
+    Return the time before which tombstones may have been compacted away.
+    """
+    return timezone.now() - timedelta(days=settings.TODO_TOMBSTONE_RETENTION_DAYS)
+
+
+def changes(user, token: str = None, limit: int = 500, tasks: QuerySet = None) -> dict:
+    """
+    Return one page of the changes of ``user``'s tasks since ``token``.
+
+    Args:
+        user (User): The owner of the tasks.
+        token (str, optional): The ``next`` token of the previous page, or
+            None for a full sync.
+        limit (int): The most tasks and the most tombstones returned.
+        tasks (QuerySet, optional): The user's tasks, to choose the columns
+            loaded. Defaults to all of them.
+
+    Returns:
+        dict: ``tasks`` (Task objects), ``deleted`` (uuids), ``next`` (the
+        token of the next sync) and ``has_more`` (whether to ask again now).
+
+    Raises:
+        InvalidCursor: If the token is malformed.
+        StaleToken: If the token is older than the tombstone retention.
+    """
+    overlap = timedelta(seconds=settings.TODO_SYNC_OVERLAP_SECONDS)
+    now = timezone.now()
+    if token:
+        position = decode_token(token)
+        if position['d'] < tombstone_horizon():
+            raise StaleToken(token)
+    else:
+        # A full sync sends every task; only deletions from now on matter.
+        position = {'t': None, 'i': 0, 'd': now, 'j': 0, 'c': True}
+
+    if tasks is None:
+        tasks = Task.objects.filter(user=user)
+    tasks = tasks.order_by('updated_at', 'id')
+    tombstones = TaskTombstone.objects.filter(user=user).order_by('deleted_at', 'id')
+    if position['c']:
+        # Caught up last time: send the last moments again, see above.
+        position_t = position['t'] and position['t'] - overlap
+        position_d = position['d'] - overlap
+    else:
+        position_t, position_d = position['t'], position['d']
+    tasks = after(tasks, 'updated_at', position_t, position['i'])
+    tombstones = after(tombstones, 'deleted_at', position_d, position['j'])
+    tasks = list(tasks[:limit + 1])
+    tombstones = list(tombstones.values_list('deleted_at', 'id', 'uuid')[:limit + 1])
+
+    has_more = len(tasks) > limit or len(tombstones) > limit
+    tasks, tombstones = tasks[:limit], tombstones[:limit]
+    # A further page goes on right after the last row sent; otherwise the
+    # marks only move forward, even when the overlap was sent again.
+    if tasks and (has_more or position['t'] is None
+                  or (tasks[-1].updated_at, tasks[-1].id) > (position['t'], position['i'])):
+        position['t'], position['i'] = tasks[-1].updated_at, tasks[-1].id
+    if tombstones and (has_more or tombstones[-1][:2] > (position['d'], position['j'])):
+        position['d'], position['j'] = tombstones[-1][:2]
+    # Caught up: every deletion before the overlap window has been sent
+    if not has_more and position['d'] < now - overlap:
+        position['d'], position['j'] = now - overlap, 0
+    return {
+        'tasks': tasks,
+        'deleted': [uuid for _, _, uuid in tombstones],
+        'next': encode_token({
+            't': position['t'] and position['t'].isoformat(), 'i': position['i'],
+            'd': position['d'].isoformat(), 'j': position['j'], 'c': not has_more,
+        }),
+        'has_more': has_more,
+    }
+
+
+def record_deletions(user_id: int, uuids) -> None:
+    """
+    Write a tombstone for each deleted task uuid of a user.
+    """
+    now = timezone.now()
+    TaskTombstone.objects.bulk_create(
+        [TaskTombstone(user_id=user_id, uuid=uuid, deleted_at=now) for uuid in uuids])
+
+
+def compact_tombstones(days: int = None, batch_size: int = 1000) -> int:
+    """
+    Delete the tombstones older than the retention, in batches.
+
+    Args:
+        days (int, optional): The retention in days. Defaults to
+            TODO_TOMBSTONE_RETENTION_DAYS.
+        batch_size (int): The most tombstones deleted per statement.
+
+    Returns:
+        int: The number of tombstones deleted.
+    """
+    if days is None:
+        cutoff = tombstone_horizon()
+    else:
+        cutoff = timezone.now() - timedelta(days=days)
+    return delete_in_batches(TaskTombstone.objects.filter(deleted_at__lt=cutoff), batch_size)
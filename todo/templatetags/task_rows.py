@@ -0,0 +1,65 @@
+"""
+The rows of the task list, rendered with fragment caching.
+
+``{% task_rows object_list %}`` renders ``todo/task_row.html`` for each task.
+With TODO_FRAGMENT_CACHE every rendered row is cached under the task's uuid
+and updated_at, and the version of its category. All rows of a page are read
+with one ``get_many`` and the missing ones stored with one ``set_many``, so a
+row is only rendered again once its task or category changed.
+
+The detail, update and delete links are built from URL patterns reversed once
+per page rather than with three ``{% url %}`` tags per row.
+"""
+from django import template
+from django.conf import settings
+from django.template.loader import get_template
+from django.urls import reverse
+from django.utils.safestring import mark_safe
+
+from ..cache import get_cache
+
+register = template.Library()
+
+ROW_TEMPLATE = 'todo/task_row.html'
+PLACEHOLDER = '00000000-0000-0000-0000-000000000000'
+
+
+def url_pattern(name: str) -> str:
+    """
+    Return the URL of the task route ``name`` as a ``str.format`` pattern
+    taking the task uuid.
+    """
+    return reverse(name, args=[PLACEHOLDER]).replace(PLACEHOLDER, '{}')
+
+
+def row_key(task) -> str:
+    """
+    Return the cache key of the rendered row of a task.
+    """
+    category = f'{task.category_id}.{task.category.updated_at.timestamp()}' \
+        if task.category_id else '-'
+    return f'todo:row:{task.uuid}:{task.updated_at.timestamp()}:{category}'
+
+
+@register.simple_tag
+def task_rows(tasks) -> str:
+    """
+    Render the table rows of ``tasks``, from the fragment cache when enabled.
+    """
+    tasks = list(tasks)
+    row = get_template(ROW_TEMPLATE)
+    urls = {action: url_pattern(f'todo:task-{action}') for action in ('detail', 'update', 'delete')}
+
+    def render(task) -> str:
+        return row.render({'task': task, **{
+            f'{action}_url': pattern.format(task.uuid) for action, pattern in urls.items()}})
+
+    if not settings.TODO_FRAGMENT_CACHE:
+        return mark_safe(''.join(render(task) for task in tasks))
+    cache = get_cache()
+    keys = [row_key(task) for task in tasks]
+    cached = cache.get_many(keys)
+    missing = {key: render(task) for key, task in zip(keys, tasks) if key not in cached}
+    if missing:
+        cache.set_many(missing, settings.TODO_FRAGMENT_CACHE_TIMEOUT)
+    return mark_safe(''.join(cached[key] if key in cached else missing[key] for key in keys))
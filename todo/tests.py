@@ -1,3 +1,1596 @@
-from django.test import TestCase
+import asyncio
+import json
+import os
+import re
+import runpy
+import threading
+import tempfile
+import tracemalloc
+from io import StringIO
+from urllib.parse import urlencode
+from datetime import timedelta
+from unittest import mock, skipUnless
 
-# Create your tests here.
+from asgiref.sync import async_to_sync
+from django.conf import settings
+
+from django.contrib.auth.models import User
+from django.contrib.auth.password_validation import get_default_password_validators
+from django.contrib.sessions.models import Session
+from django.test import SimpleTestCase
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import IntegrityError, connection
+from django.db.models.sql import UpdateQuery
+from django.test.utils import CaptureQueriesContext
+from django.test import Client, RequestFactory, TestCase, override_settings
+from django.urls import include, path, reverse
+from django.utils import timezone
+
+from lynx.db.pool import ConnectionPool, PoolTimeout
+
+from . import broker as broker_module
+from . import cache as page_cache, profiling
+from .benchmarks import compare, report
+from .broker import LocalBroker
+from .events import RESYNC, EventStream
+from .models import Task, Category, TaskSummary, TaskTombstone
+from .pagination import CursorPaginator, EstimatedCountPaginator
+from .forms import TaskForm
+from .hashers import preload
+from .sessions import purge_expired_sessions
+from .sync import StaleToken, changes
+from .startup import parse_import_times
+from .stats import apply_changes, get_summary, rebuild_summaries, summary_data
+from .urls import task_urlpatterns
+from .views import RegisterView, TaskListView
+
+
+@override_settings(TODO_LIST_PAGINATION='cursor')
+class CursorPaginationTests(TestCase):
+    """
+    Tests for the cursor pagination mode of TaskListView.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='cursor', password='pass')
+        now = timezone.now()
+        Task.objects.bulk_create([
+            Task(title=f'Task {i}', user=cls.user,
+                 due_date=None if i % 4 == 0 else now - timedelta(days=i % 5))
+            for i in range(25)
+        ])
+        rebuild_summaries([cls.user.pk])
+
+    def setUp(self):
+        self.client.force_login(self.user)
+        self.url = reverse('todo:tasks-list')
+
+    def test_walks_every_task_once(self):
+        seen, cursor = [], None
+        while True:
+            response = self.client.get(self.url, {'cursor': cursor} if cursor else {})
+            page = response.context['page_obj']
+            seen.extend(task.pk for task in page)
+            if not page.has_next():
+                break
+            cursor = page.next_cursor
+        expected = Task.objects.filter(user=self.user).order_by(*CursorPaginator.ordering)
+        self.assertEqual(seen, [task.pk for task in expected])
+
+    def test_previous_cursor_returns_previous_page(self):
+        first = self.client.get(self.url).context['page_obj']
+        second = self.client.get(self.url, {'cursor': first.next_cursor}).context['page_obj']
+        back = self.client.get(self.url, {'cursor': second.previous_cursor}).context['page_obj']
+        self.assertEqual([t.pk for t in back], [t.pk for t in first])
+        self.assertFalse(back.has_previous())
+
+    def test_does_not_count(self):
+        # session, user, the page and the stats summary
+        with self.assertNumQueries(4):
+            response = self.client.get(self.url)
+        self.assertNotContains(response, '?page=')
+
+    def test_invalid_cursor_is_404(self):
+        response = self.client.get(self.url, {'cursor': 'not-a-cursor'})
+        self.assertEqual(response.status_code, 404)
+
+
+class CompleteTaskTests(TestCase):
+    """
+    Tests for the single-statement complete_task toggle.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='toggler', password='pass')
+        cls.other = User.objects.create_user(username='bystander', password='pass')
+        cls.task = Task.objects.create(title='Toggle me', description='keep', user=cls.user)
+        cls.foreign = Task.objects.create(title='Not mine', user=cls.other)
+
+    def setUp(self):
+        self.client.force_login(self.user)
+
+    def test_toggle_is_one_update(self):
+        url = reverse('todo:task-complete', args=[self.task.uuid])
+        # plus the UPDATE of the stats summary
+        with self.assertNumQueries(4):
+            response = self.client.get(url, {'complete': 'True'})
+        self.assertEqual(response.status_code, 204)
+        self.task.refresh_from_db()
+        self.assertTrue(self.task.complete)
+        self.assertEqual(self.task.description, 'keep')
+
+    def test_foreign_task_is_404(self):
+        url = reverse('todo:task-complete', args=[self.foreign.uuid])
+        self.assertEqual(self.client.get(url, {'complete': 'True'}).status_code, 404)
+        self.foreign.refresh_from_db()
+        self.assertFalse(self.foreign.complete)
+
+    def test_invalid_uuid_is_404(self):
+        url = reverse('todo:task-complete', args=['not-a-uuid'])
+        self.assertEqual(self.client.get(url).status_code, 404)
+
+
+class QueryCountTests(TestCase):
+    """
+    Exact query counts of the task pages and the admin, with a category and
+    an owner on every row, so an N+1 regression fails.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_superuser(username='reader', password='pass')
+        categories = [Category.objects.create(name=f'Category {i}', user=cls.user)
+                      for i in range(5)]
+        cls.tasks = [Task.objects.create(title=f'Task {i}', user=cls.user,
+                                         category=categories[i % 5], description='x' * 1000)
+                     for i in range(10)]
+        rebuild_summaries([cls.user.pk])
+
+    def setUp(self):
+        page_cache.get_cache().clear()
+        self.client.force_login(self.user)
+
+    def test_list(self):
+        # session, user, the count of the offset paginator, the page and the
+        # summary with its categories
+        with self.assertNumQueries(6):
+            response = self.client.get(reverse('todo:tasks-list'))
+        self.assertContains(response, 'Category 4')
+        task = response.context['object_list'][0]
+        self.assertEqual(task.get_deferred_fields(), {'description'})
+
+    def test_detail(self):
+        # session, user and the task with its category
+        with self.assertNumQueries(3):
+            response = self.client.get(reverse('todo:task-detail', args=[self.tasks[1].uuid]))
+        self.assertContains(response, 'Category 1')
+
+    def test_update_and_delete_pages(self):
+        task = self.tasks[2]
+        self.client.get(reverse('todo:task-update', args=[task.uuid]))
+        # session, user and the task, for each page
+        with self.assertNumQueries(3):
+            self.client.get(reverse('todo:task-update', args=[task.uuid]))
+        with self.assertNumQueries(3):
+            response = self.client.get(reverse('todo:task-delete', args=[task.uuid]))
+        self.assertContains(response, 'Task 2')
+        self.assertEqual(response.context['object'].get_deferred_fields(),
+                         {'description', 'created_at', 'updated_at'})
+
+    def test_lookup_is_scoped_to_the_user(self):
+        other = User.objects.create_user('other')
+        foreign = Task.objects.create(title='Foreign', user=other)
+        for name in ('task-detail', 'task-update', 'task-delete'):
+            # session, user and the scoped lookup
+            with self.assertNumQueries(3):
+                response = self.client.get(reverse(f'todo:{name}', args=[foreign.uuid]))
+            self.assertEqual(response.status_code, 404)
+        self.client.post(reverse('todo:task-delete', args=[foreign.uuid]))
+        self.assertTrue(Task.objects.filter(pk=foreign.pk).exists())
+
+    def test_create_page_reads_categories_once(self):
+        url = reverse('todo:task-create')
+        # session, user and the user's categories
+        with self.assertNumQueries(3):
+            response = self.client.get(url)
+        self.assertContains(response, 'Category 4')
+        # the categories come from the cache
+        with self.assertNumQueries(2):
+            self.client.get(url)
+
+    def test_update_uses_cached_categories(self):
+        task = self.tasks[1]
+        url = reverse('todo:task-update', args=[task.uuid])
+        self.client.get(url)
+        # session, user and the task
+        with self.assertNumQueries(3):
+            response = self.client.get(url)
+        self.assertContains(response, f'<option value="{task.category_id}" selected>')
+        category = Category.objects.get(name='Category 3')
+        response = self.client.post(url, {'title': 'Moved', 'priority': 'low',
+                                          'category': category.pk})
+        self.assertEqual(response.status_code, 302)
+        task.refresh_from_db()
+        self.assertEqual(task.category, category)
+
+    def test_category_of_another_user_is_rejected(self):
+        foreign = Category.objects.create(name='Foreign', user=User.objects.create_user('x'))
+        response = self.client.post(reverse('todo:task-create'), {
+            'title': 'Sneaky', 'priority': 'low', 'category': foreign.pk})
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('category', response.context['form'].errors)
+        self.assertNotContains(response, 'Foreign')
+
+    def test_category_change_refreshes_choices(self):
+        url = reverse('todo:task-create')
+        self.client.get(url)
+        Category.objects.create(name='Fresh', user=self.user)
+        self.assertContains(self.client.get(url), 'Fresh')
+
+    def test_admin_task_list(self):
+        # session, user, the count of the page and the rows with owner and category
+        with self.assertNumQueries(4):
+            response = self.client.get(reverse('admin:todo_task_changelist'))
+        self.assertContains(response, 'Category 4')
+
+    def test_admin_task_change(self):
+        url = reverse('admin:todo_task_change', args=[self.tasks[1].pk])
+        # session, user, the task in a savepoint with its content type, and the
+        # labels of the selected owner and category in the autocomplete widgets
+        with self.assertNumQueries(8):
+            response = self.client.get(url)
+        self.assertContains(response, 'Category 1')
+
+    def test_admin_category_list(self):
+        with self.assertNumQueries(4):
+            response = self.client.get(reverse('admin:todo_category_changelist'))
+        self.assertContains(response, 'Category 4')
+
+
+class BenchmarkTests(TestCase):
+    """
+    Smoke test of the routes benchmark and the comparison of its reports.
+    """
+
+    def test_routes(self):
+        out = StringIO()
+        call_command('benchmark', 'routes', size=3, repeat=1, users=2, json=True, stdout=out)
+        results = json.loads(out.getvalue())
+        self.assertEqual({row['route'] for row in results}, {
+            'list', 'detail', 'create', 'update', 'complete', 'login', 'register'})
+        self.assertTrue(all(row['status'] < 400 and row['queries'] > 0 for row in results))
+        compared = compare(results, report('routes', {}, results))
+        self.assertEqual(compared[0]['p50_ms_change'], 0)
+        self.assertFalse(User.objects.filter(username__startswith='bench-').exists())
+
+
+@override_settings(TODO_FRAGMENT_CACHE=True)
+class FragmentCacheTests(TestCase):
+    """
+    Tests for the cached rows of the task list.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='rows', password='pass')
+        cls.category = Category.objects.create(name='Errands', user=cls.user)
+        cls.tasks = [Task.objects.create(title=f'Row {i}', user=cls.user, category=cls.category)
+                     for i in range(3)]
+
+    def setUp(self):
+        page_cache.get_cache().clear()
+        self.client.force_login(self.user)
+        self.url = reverse('todo:tasks-list')
+
+    def rendered_rows(self, response) -> int:
+        return [t.name for t in response.templates].count('todo/task_row.html')
+
+    def test_unchanged_rows_are_not_rendered_again(self):
+        response = self.client.get(self.url)
+        self.assertEqual(self.rendered_rows(response), 3)
+        self.assertContains(response, reverse('todo:task-update', args=[self.tasks[0].uuid]))
+        self.assertEqual(self.rendered_rows(self.client.get(self.url)), 0)
+
+        task = self.tasks[1]
+        task.title = 'Renamed'
+        task.save()
+        response = self.client.get(self.url)
+        self.assertEqual(self.rendered_rows(response), 1)
+        self.assertContains(response, 'Renamed')
+
+    def test_category_rename_renders_its_rows(self):
+        self.client.get(self.url)
+        self.category.name = 'Chores'
+        self.category.save()
+        response = self.client.get(self.url)
+        self.assertEqual(self.rendered_rows(response), 3)
+        self.assertContains(response, 'Chores')
+
+    def test_page_links_are_a_window(self):
+        Task.objects.bulk_create(Task(title=f'Filler {i}', user=self.user) for i in range(97))
+        response = self.client.get(self.url, {'page': 5})
+        self.assertEqual(list(response.context['page_window']), [3, 4, 5, 6, 7])
+        self.assertNotContains(response, '?page=8"')
+
+
+class TaskSearchTests(TestCase):
+    """
+    Tests for the ``?q=`` full-text search of TaskListView.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='searcher', password='pass')
+        other = User.objects.create_user(username='hidden', password='pass')
+        cls.title_match = Task.objects.create(title='Buy groceries', user=cls.user)
+        cls.body_match = Task.objects.create(
+            title='Errands', description='groceries and post office', user=cls.user)
+        Task.objects.create(title='Walk the dog', user=cls.user)
+        Task.objects.create(title='Buy groceries', user=other)
+
+    def setUp(self):
+        self.client.force_login(self.user)
+        self.url = reverse('todo:tasks-list')
+
+    def search(self, q, **params):
+        return list(self.client.get(self.url, {'q': q, **params}).context['object_list'])
+
+    def test_ranks_title_matches_first(self):
+        self.assertEqual(self.search('grocer'), [self.title_match, self.body_match])
+
+    def test_index_follows_writes(self):
+        self.body_match.title = 'Pick up parcel'
+        self.body_match.description = ''
+        self.body_match.save()
+        self.title_match.delete()
+        self.assertEqual(self.search('groceries'), [])
+        self.assertEqual(self.search('parcel'), [self.body_match])
+
+    def test_operators_are_plain_text(self):
+        self.assertEqual(self.search('dog* OR "'), [])
+        self.assertEqual(self.search('the dog'), [Task.objects.get(title='Walk the dog')])
+
+    def test_results_are_paginated_by_cursor(self):
+        Task.objects.bulk_create(
+            Task(title=f'Groceries list {i}', user=self.user) for i in range(15))
+        first = self.client.get(self.url, {'q': 'groceries'}).context['page_obj']
+        second = self.client.get(
+            self.url, {'q': 'groceries', 'cursor': first.next_cursor}).context['page_obj']
+        self.assertEqual(len(first) + len(second), 17)
+        self.assertFalse(second.has_next())
+        self.assertFalse({t.pk for t in first} & {t.pk for t in second})
+
+
+class TaskBulkTests(TestCase):
+    """
+    Tests for the bulk task endpoint.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='triager', password='pass')
+        cls.other = User.objects.create_user(username='owner', password='pass')
+        cls.tasks = [Task.objects.create(title=f'Task {i}', user=cls.user) for i in range(20)]
+        cls.foreign = Task.objects.create(title='Not mine', user=cls.other)
+        rebuild_summaries([cls.user.pk])
+
+    def setUp(self):
+        self.client.force_login(self.user)
+        self.url = reverse('todo:tasks-bulk')
+
+    def post(self, uuids, **data):
+        return self.client.post(self.url, {'uuids': uuids, **data},
+                                HTTP_ACCEPT='application/json')
+
+    def test_reports_result_per_uuid(self):
+        uuids = [self.tasks[0].uuid, self.foreign.uuid, 'bogus']
+        response = self.post(uuids, action='complete')
+        self.assertEqual(response.json()['results'], {
+            str(self.tasks[0].uuid): 'updated',
+            str(self.foreign.uuid): 'not_found',
+            'bogus': 'invalid',
+        })
+        self.assertTrue(Task.objects.get(pk=self.tasks[0].pk).complete)
+        self.assertFalse(Task.objects.get(pk=self.foreign.pk).complete)
+
+    def test_query_count_does_not_grow_with_selection(self):
+        # plus the locked read and the UPDATE of the stats summary
+        with self.assertNumQueries(8) as few:
+            self.post([t.uuid for t in self.tasks[:2]], action='priority', priority='high')
+        # plus one INSERT of all the tombstones
+        with self.assertNumQueries(len(few) + 1):
+            self.post([t.uuid for t in self.tasks], action='delete')
+        self.assertFalse(Task.objects.filter(user=self.user).exists())
+        self.assertTrue(Task.objects.filter(pk=self.foreign.pk).exists())
+
+    def test_missing_value_is_rejected(self):
+        response = self.post([self.tasks[0].uuid], action='priority')
+        self.assertEqual(response.status_code, 400)
+
+    def test_list_page_form_redirects_with_message(self):
+        response = self.client.post(
+            self.url, {'uuids': [self.tasks[0].uuid], 'action': 'uncomplete'}, follow=True)
+        self.assertContains(response, '1 of 1 tasks changed')
+
+
+class TaskExportTests(TestCase):
+    """
+    Tests for the streaming CSV and NDJSON exports.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='exporter', password='pass')
+        cls.category = Category.objects.create(name='Work', user=cls.user)
+        Task.objects.create(title='Write, report', user=cls.user, category=cls.category)
+        Task.objects.create(title='Foreign', user=User.objects.create_user(username='x'))
+
+    def setUp(self):
+        self.client.force_login(self.user)
+
+    def test_csv(self):
+        response = self.client.get(reverse('todo:tasks-export-csv'))
+        lines = b''.join(response.streaming_content).decode().splitlines()
+        self.assertEqual(len(lines), 2)
+        self.assertTrue(lines[0].startswith('uuid,title,'))
+        self.assertIn('"Write, report"', lines[1])
+        self.assertIn('Work', lines[1])
+
+    def test_ndjson_is_one_query(self):
+        with self.assertNumQueries(3):
+            response = self.client.get(reverse('todo:tasks-export-ndjson'))
+            rows = [json.loads(line) for line in b''.join(response.streaming_content).splitlines()]
+        self.assertEqual([row['category'] for row in rows], ['Work'])
+
+
+class ImportTasksTests(TestCase):
+    """
+    Tests for the import_tasks management command.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='importer', password='pass')
+        User.objects.create_user(username='colleague', password='pass')
+
+    def write(self, name, content):
+        path = os.path.join(self.directory.name, name)
+        with open(path, 'w') as stream:
+            stream.write(content)
+        return path
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+
+    def test_csv_with_categories(self):
+        path = self.write('tasks.csv', (
+            'title,complete,due_date,priority,category,user\n'
+            'One,True,2023-04-20T10:00:00+00:00,high,Home,\n'
+            'Two,False,,,Home,colleague\n'))
+        out = StringIO()
+        call_command('import_tasks', path, '--user', 'importer', '--batch-size', '1', stdout=out)
+        self.assertIn('2 rows', out.getvalue())
+        one = Task.objects.get(title='One')
+        self.assertEqual((one.user, one.complete, one.priority), (self.user, True, 'high'))
+        self.assertEqual(Task.objects.get(title='Two').user.username, 'colleague')
+        self.assertEqual(Category.objects.filter(name='Home').count(), 2)
+        self.assertEqual(one.category.user, self.user)
+
+    def test_unknown_priority_names_its_line(self):
+        path = self.write('tasks.csv', 'title,priority\nOne,high\nTwo,urgent\n')
+        with self.assertRaisesMessage(CommandError, "Line 3: unknown priority 'urgent'"):
+            call_command('import_tasks', path, '--user', 'importer', verbosity=0)
+        self.assertFalse(Task.objects.filter(title='Two').exists())
+
+    def test_missing_title_names_its_line(self):
+        path = self.write('tasks.csv', 'title,description\nOne,\n,No title\n')
+        with self.assertRaisesMessage(CommandError, 'Line 3: a title is required'):
+            call_command('import_tasks', path, '--user', 'importer', verbosity=0)
+        path = self.write('untitled.csv', 'uuid,description\n,No title\n')
+        with self.assertRaisesMessage(CommandError, 'Line 2: a title is required'):
+            call_command('import_tasks', path, '--user', 'importer', verbosity=0)
+
+    def test_invalid_due_date_names_its_line(self):
+        for due_date in ('tomorrow', '2024-13-45T00:00'):
+            path = self.write('tasks.csv', f'title,due_date\nOne,2024-05-01T09:00\nTwo,{due_date}\n')
+            with self.assertRaisesMessage(CommandError, f"Line 3: invalid due date '{due_date}'"):
+                call_command('import_tasks', path, '--user', 'importer', verbosity=0)
+        self.assertFalse(Task.objects.exists())
+
+    def test_resumes_from_checkpoint(self):
+        path = self.write('tasks.ndjson', ''.join(
+            json.dumps({'title': f'Task {i}'}) + '\n' for i in range(5)))
+        checkpoint = self.write('tasks.ckpt', json.dumps({'rows': 3}))
+        with self.captureOnCommitCallbacks(execute=True):
+            call_command('import_tasks', path, '--user', 'importer',
+                         '--checkpoint', checkpoint, verbosity=0)
+        self.assertEqual(
+            list(Task.objects.order_by('title').values_list('title', flat=True)),
+            ['Task 3', 'Task 4'])
+        with open(checkpoint) as stream:
+            self.assertEqual(json.load(stream), {'rows': 5})
+
+    def test_checkpoint_only_counts_committed_batches(self):
+        # The third row repeats the uuid of the first, failing the second batch
+        uuid = '7b7a52a2-3e4c-4f2e-9f51-5d6c0f0d1a11'
+        uuids = [uuid, '0f3e4a56-52a4-4d0e-8c8e-6a7b9b0d2c22', uuid]
+        path = self.write('tasks.ndjson', ''.join(
+            json.dumps({'title': f'Task {i}', 'uuid': uuid}) + '\n' for i, uuid in enumerate(uuids)))
+        checkpoint = os.path.join(self.directory.name, 'tasks.ckpt')
+        with self.assertRaises(IntegrityError), self.captureOnCommitCallbacks(execute=True):
+            call_command('import_tasks', path, '--user', 'importer', '--batch-size', '2',
+                         '--checkpoint', checkpoint, verbosity=0)
+        with open(checkpoint) as stream:
+            self.assertEqual(json.load(stream), {'rows': 2})
+        self.assertFalse(os.path.exists(checkpoint + '.tmp'))
+
+
+def resident_memory()->int:
+    """
+    Return the resident set size of this process in bytes.
+    """
+    with open('/proc/self/statm') as statm:
+        return int(statm.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+
+
+@skipUnless(os.path.exists('/proc/self/statm'), 'RSS is read from /proc')
+class TaskExportMemoryTests(TestCase):
+    """
+    Export TODO_EXPORT_ROWS tasks (50,000 by default, small enough for every
+    test run; set it to 1000000 for the full check) and check that the
+    resident memory of the process grows by less than a fixed limit while
+    streaming.
+
+    RSS is sampled during the export rather than read from the high-water
+    mark, which seeding the table has already raised.
+    """
+    rows = int(os.environ.get('TODO_EXPORT_ROWS', 50_000))
+    limit = 64 * 1024 * 1024
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='bulk-exporter', password='pass')
+        category = Category.objects.create(name='Bulk', user=cls.user)
+        new_uuid = {
+            'postgresql': 'gen_random_uuid()',
+            'sqlite': 'lower(hex(randomblob(16)))',
+        }[connection.vendor]
+        with connection.cursor() as cursor:
+            cursor.execute(f"""
+                INSERT INTO todo_task (uuid, created_at, updated_at, title, description,
+                                       complete, priority, user_id, category_id)
+                WITH RECURSIVE n(i) AS (SELECT 1 UNION ALL SELECT i + 1 FROM n WHERE i < %s)
+                SELECT {new_uuid}, CURRENT_TIMESTAMP, CURRENT_TIMESTAMP, 'Task ' || i, %s,
+                       false, 'low', %s, %s
+                FROM n
+            """, [cls.rows, 'x' * 200, cls.user.pk, category.pk])
+
+    def test_peak_rss_is_flat(self):
+        self.client.force_login(self.user)
+        response = self.client.get(reverse('todo:tasks-export-csv'))
+        baseline = peak = resident_memory()
+        lines = 0
+        for lines, _ in enumerate(response.streaming_content, 1):
+            if lines % 10000 == 0:
+                peak = max(peak, resident_memory())
+        self.assertEqual(lines, self.rows + 1)
+        self.assertLess(peak - baseline, self.limit)
+
+
+@override_settings(TODO_PAGE_CACHE=True)
+class UserPageCacheTests(TestCase):
+    """
+    Tests for the per-user generation cache of the list and detail pages.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='cached', password='pass')
+        cls.other = User.objects.create_user(username='other', password='pass')
+        cls.task = Task.objects.create(title='Cached task', user=cls.user)
+        cls.foreign = Task.objects.create(title='Foreign task', user=cls.other)
+
+    def setUp(self):
+        page_cache.get_cache().clear()
+        page_cache.reset_stats()
+        self.client.force_login(self.user)
+        self.url = reverse('todo:tasks-list')
+
+    def test_second_read_is_a_hit(self):
+        self.assertEqual(self.client.get(self.url)['X-Cache'], 'MISS')
+        with self.assertNumQueries(2):
+            response = self.client.get(self.url)
+        self.assertEqual(response['X-Cache'], 'HIT')
+        self.assertContains(response, 'Cached task')
+        self.assertEqual(page_cache.stats(), {'hits': 1, 'misses': 1})
+
+    def test_write_invalidates_immediately(self):
+        self.client.get(self.url)
+        self.client.get(reverse('todo:task-complete', args=[self.task.uuid]), {'complete': 'True'})
+        response = self.client.get(self.url)
+        self.assertEqual(response['X-Cache'], 'MISS')
+        self.assertContains(response, 'checked')
+
+    def test_delete_invalidates_detail(self):
+        url = reverse('todo:task-detail', args=[self.task.uuid])
+        self.client.get(url)
+        self.assertEqual(self.client.get(url)['X-Cache'], 'HIT')
+        self.client.post(reverse('todo:task-delete', args=[self.task.uuid]))
+        self.assertEqual(self.client.get(url).status_code, 404)
+
+    def test_hit_carries_the_csrf_token_of_its_session(self):
+        first, second = Client(enforce_csrf_checks=True), Client(enforce_csrf_checks=True)
+        first.force_login(self.user)
+        second.force_login(self.user)
+        self.assertEqual(first.get(self.url)['X-Cache'], 'MISS')
+        response = second.get(self.url)
+        self.assertEqual(response['X-Cache'], 'HIT')
+        self.assertNotContains(response, page_cache.CSRF_PLACEHOLDER)
+        token = re.search(rb'name="csrfmiddlewaretoken" value="([^"]+)"', response.content).group(1)
+        response = second.post(reverse('todo:tasks-bulk'), {
+            'csrfmiddlewaretoken': token.decode(), 'action': 'complete', 'uuids': [self.task.uuid]})
+        self.assertEqual(response.status_code, 302)
+        self.task.refresh_from_db()
+        self.assertTrue(self.task.complete)
+
+    def test_login_invalidates_pages(self):
+        self.client.get(self.url)
+        self.client.force_login(self.user)
+        self.assertEqual(self.client.get(self.url)['X-Cache'], 'MISS')
+
+    def test_foreign_task_detail_is_404_and_not_cached(self):
+        url = reverse('todo:task-detail', args=[self.foreign.uuid])
+        self.client.get(url)
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 404)
+        self.assertNotIn('X-Cache', response)
+
+
+class AsyncURLConf:
+    """
+    The project URLconf with the task pages routed to the async views.
+    """
+    urlpatterns = [
+        path('', include((task_urlpatterns(True), 'todo'), namespace='todo')),
+        path('accounts/', include(('django.contrib.auth.urls', 'auth'), namespace='auth')),
+        path('accounts/register/', RegisterView.as_view(), name='register'),
+    ]
+
+
+@override_settings(ROOT_URLCONF=AsyncURLConf)
+class AsyncViewTests(TestCase):
+    """
+    Tests for the async task views of todo/async_views.py.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='async', password='pass')
+        cls.task = Task.objects.create(title='Async task', description='notes', user=cls.user)
+        Task.objects.bulk_create(Task(title=f'Filler {i}', user=cls.user) for i in range(12))
+
+    def setUp(self):
+        self.async_client.force_login(self.user)
+
+    async def test_list_pages_by_offset_and_cursor(self):
+        response = await self.async_client.get(reverse('todo:tasks-list'), {'page': 2})
+        self.assertEqual(len(response.context['object_list']), 3)
+        self.assertEqual(response.context['paginator'].count, 13)
+        with self.settings(TODO_LIST_PAGINATION='cursor'):
+            response = await self.async_client.get(reverse('todo:tasks-list'))
+        self.assertTrue(response.context['page_obj'].has_next())
+
+    async def test_detail_and_missing_task(self):
+        response = await self.async_client.get(reverse('todo:task-detail', args=[self.task.uuid]))
+        self.assertContains(response, 'notes')
+        response = await self.async_client.get(reverse('todo:task-detail', args=['missing']))
+        self.assertEqual(response.status_code, 404)
+
+    def post(self, url, data=None):
+        # Django 4.1's AsyncClient truncates multipart bodies (ticket #34063).
+        return self.async_client.post(
+            url, urlencode(data or {}), content_type='application/x-www-form-urlencoded')
+
+    async def test_create_update_delete(self):
+        response = await self.post(
+            reverse('todo:task-create'), {'title': 'Created', 'priority': 'high'})
+        created = await Task.objects.aget(title='Created')
+        self.assertRedirects(response, reverse('todo:task-detail', args=[created.uuid]),
+                             fetch_redirect_response=False)
+        self.assertEqual(created.user_id, self.user.pk)
+
+        await self.post(
+            reverse('todo:task-update', args=[created.uuid]), {'title': 'Renamed', 'priority': 'low'})
+        self.assertTrue(await Task.objects.filter(title='Renamed').aexists())
+
+        await self.post(reverse('todo:task-delete', args=[created.uuid]))
+        self.assertFalse(await Task.objects.filter(uuid=created.uuid).aexists())
+
+    async def test_complete(self):
+        url = reverse('todo:task-complete', args=[self.task.uuid])
+        response = await self.async_client.get(url, {'complete': 'True'})
+        self.assertEqual(response.status_code, 204)
+        self.assertTrue((await Task.objects.aget(pk=self.task.pk)).complete)
+
+    async def test_anonymous_is_sent_to_login(self):
+        self.async_client.cookies.clear()
+        response = await self.async_client.get(reverse('todo:tasks-list'))
+        self.assertEqual(response.status_code, 302)
+
+
+@override_settings(TODO_COUNT_ESTIMATE_THRESHOLD=100)
+class EstimatedCountTests(TestCase):
+    """
+    Tests for the estimated count of the offset-paginated task list.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='estimated', password='pass')
+        Task.objects.bulk_create(Task(title=f'Task {i}', user=cls.user) for i in range(25))
+
+    def setUp(self):
+        self.client.force_login(self.user)
+        self.async_client.force_login(self.user)
+        self.url = reverse('todo:tasks-list')
+
+    def test_exact_count_without_planner_statistics(self):
+        paginator = EstimatedCountPaginator(Task.objects.filter(user=self.user), 10)
+        self.assertEqual((paginator.count, paginator.estimated), (25, False))
+
+    @mock.patch('todo.pagination.estimate_count', return_value=1000)
+    def test_estimate_replaces_count(self, estimate):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(self.url)
+        self.assertFalse(any('COUNT(*)' in query['sql'] for query in queries))
+        self.assertEqual(list(response.context['page_window']), [1, 2, 3])
+        last = self.client.get(self.url, {'page': 3}).context['page_obj']
+        self.assertEqual((len(last), last.has_next()), (5, False))
+        self.assertEqual(self.client.get(self.url, {'page': 4}).status_code, 404)
+
+    @mock.patch('todo.pagination.estimate_count', return_value=5)
+    def test_small_estimate_is_counted(self, estimate):
+        response = self.client.get(self.url, {'page': 3})
+        self.assertEqual(response.context['paginator'].count, 25)
+        self.assertEqual(list(response.context['page_window']), [1, 2, 3])
+
+    @override_settings(ROOT_URLCONF=AsyncURLConf)
+    @mock.patch('todo.pagination.estimate_count', return_value=1000)
+    async def test_async_list(self, estimate):
+        response = await self.async_client.get(self.url, {'page': 2})
+        self.assertTrue(response.context['paginator'].estimated)
+        self.assertTrue(response.context['page_obj'].has_next())
+
+
+PROFILED_MIDDLEWARE = ['todo.profiling.ProfilingMiddleware', *settings.MIDDLEWARE]
+
+
+@override_settings(MIDDLEWARE=PROFILED_MIDDLEWARE)
+class ProfilingTests(TestCase):
+    """
+    Tests for the per-request profile of todo/profiling.py.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='profiled', password='pass')
+        cls.staff = User.objects.create_user(username='ops', password='pass', is_staff=True)
+        Task.objects.bulk_create(Task(title=f'Task {i}', user=cls.user) for i in range(3))
+
+    def setUp(self):
+        profiling.reset_stats()
+        self.client.force_login(self.user)
+        self.async_client.force_login(self.user)
+        # Async views query from the main thread here, whose connection was
+        # opened before the middleware could hook connection_created
+        profiling.install_wrapper(connection)
+        self.addCleanup(connection.execute_wrappers.remove, profiling.record_query)
+
+    def test_header_and_log_line(self):
+        with self.assertLogs('todo.profiling', 'INFO') as logs, \
+                CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('todo:tasks-list'))
+        record = logs.records[-1]
+        self.assertEqual((record.route, record.status), ('todo:tasks-list', 200))
+        self.assertEqual(record.queries, len(queries))
+        self.assertEqual(record.duplicates, 0)
+        self.assertGreater(record.template_ms, 0)
+        self.assertIn(f'db;desc="{len(queries)} queries, 0 duplicate"', response['Server-Timing'])
+
+    def test_duplicates_ignore_in_list_values(self):
+        profile = profiling.RequestProfile()
+        profile.add_query('SELECT 1 FROM t WHERE id IN (%s, %s)', 0.001)
+        profile.add_query('SELECT 1 FROM t WHERE id IN (%s)', 0.001)
+        profile.add_query('SELECT 2', 0.001)
+        self.assertEqual((profile.queries, profile.duplicates()), (3, 1))
+
+    def test_route_stats_are_staff_only(self):
+        for _ in range(3):
+            self.client.get(reverse('todo:tasks-list'))
+        url = reverse('todo:api-profile')
+        self.assertEqual(self.client.get(url).status_code, 403)
+        self.client.force_login(self.staff)
+        routes = self.client.get(url).json()['routes']
+        self.assertEqual(routes['todo:tasks-list']['count'], 3)
+        self.assertEqual(sum(routes['todo:tasks-list']['histogram'].values()), 3)
+
+    @override_settings(TODO_PAGE_CACHE=True)
+    def test_page_cache_hits_render_no_template(self):
+        page_cache.get_cache().clear()
+        with self.assertLogs('todo.profiling', 'INFO') as logs:
+            self.client.get(reverse('todo:tasks-list'))
+            response = self.client.get(reverse('todo:tasks-list'))
+        miss, hit = logs.records
+        self.assertEqual((miss.cache, hit.cache), ('MISS', 'HIT'))
+        self.assertGreater(miss.template_ms, 0)
+        self.assertIsNone(hit.template_ms)
+        self.assertNotIn('tpl;', response['Server-Timing'])
+        stats = profiling.route_stats()['todo:tasks-list']
+        self.assertEqual(stats['cache_hits'], 1)
+        self.assertEqual(stats['template_ms'], round(miss.template_ms, 3))
+
+    @override_settings(ROOT_URLCONF=AsyncURLConf)
+    async def test_async_views(self):
+        with self.assertLogs('todo.profiling', 'INFO') as logs:
+            response = await self.async_client.get(reverse('todo:tasks-list'))
+        self.assertEqual(response.status_code, 200)
+        self.assertGreater(logs.records[-1].queries, 0)
+        self.assertIn('tpl;dur=', response['Server-Timing'])
+
+
+class SessionTests(TestCase):
+    """
+    Tests for the session engines and the purge of expired sessions.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='sessions', password='pass')
+
+    def test_purge_deletes_expired_sessions_in_batches(self):
+        now = timezone.now()
+        Session.objects.bulk_create(
+            [Session(session_key=f'expired{i}', session_data='', expire_date=now - timedelta(days=1))
+             for i in range(5)]
+            + [Session(session_key='live', session_data='', expire_date=now + timedelta(days=1))])
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(purge_expired_sessions(batch_size=2), 5)
+        self.assertEqual(len([q for q in queries if q['sql'].startswith('DELETE')]), 3)
+        self.assertEqual(list(Session.objects.values_list('session_key', flat=True)), ['live'])
+
+    def test_cached_db_reads_sessions_from_the_cache(self):
+        page_cache.get_cache().clear()
+        url = reverse('todo:tasks-list')
+        with self.settings(SESSION_ENGINE=settings.SESSION_ENGINES['cached_db']):
+            self.client.force_login(self.user)
+            self.client.get(url)
+            with CaptureQueriesContext(connection) as queries:
+                self.assertEqual(self.client.get(url).status_code, 200)
+        self.assertFalse([q for q in queries if 'django_session' in q['sql']])
+
+
+class StartupTests(SimpleTestCase):
+    """
+    Tests for the import-time state of the forms and the check_startup command.
+    """
+
+    def test_due_date_minimum_is_computed_per_form(self):
+        with mock.patch('todo.forms.timezone.localtime',
+                        return_value=timezone.now().replace(year=2031, month=5, day=4, hour=3, minute=2)):
+            form = TaskForm()
+        self.assertEqual(form.fields['due_date'].widget.attrs['min'], '2031-05-04T03:02')
+        self.assertNotIn('min', TaskForm.base_fields['due_date'].widget.attrs)
+
+    def test_parse_import_times(self):
+        log = ('import time: self [us] | cumulative | imported package\n'
+               'import time:       150 |        150 |     todo.sync\n'
+               'import time:      2000 |       2150 | todo.api\n')
+        self.assertEqual(parse_import_times(log), [('todo.sync', 0.15, 0.15), ('todo.api', 2.0, 2.15)])
+
+    def test_check_startup_reports_both_applications(self):
+        out = StringIO()
+        call_command('check_startup', top=3, json=True, stdout=out)
+        results = json.loads(out.getvalue())
+        self.assertEqual(set(results), {'lynx.wsgi', 'lynx.asgi'})
+        for timings in results.values():
+            self.assertEqual(timings['status'], 200)
+            self.assertEqual(len(timings['slowest']), 3)
+        with self.assertRaises(CommandError):
+            call_command('check_startup', max_boot_ms=0, stdout=StringIO())
+
+
+class GunicornConfigTests(SimpleTestCase):
+    """
+    Tests for the worker settings of lynx/gunicorn.conf.py.
+    """
+    path = os.path.join(settings.BASE_DIR, 'lynx', 'gunicorn.conf.py')
+
+    def load(self, **env) -> dict:
+        with mock.patch.dict(os.environ, env), mock.patch('os.sched_getaffinity',
+                                                          return_value={0, 1, 2, 3}):
+            return runpy.run_path(self.path)
+
+    def test_workers_follow_the_cores(self):
+        config = self.load()
+        self.assertEqual((config['wsgi_app'], config['worker_class'], config['workers']),
+                         ('lynx.wsgi:application', 'sync', 9))
+        config = self.load(SERVER_MODE='asgi')
+        self.assertEqual((config['wsgi_app'], config['workers']), ('lynx.asgi:application', 4))
+        self.assertEqual(self.load(WEB_CONCURRENCY='2')['workers'], 2)
+
+
+@override_settings(TODO_LOGIN_RATE_IP=4, TODO_LOGIN_RATE_USERNAME=2)
+class AuthTests(TestCase):
+    """
+    Tests for the password hashers and the throttle of the login and
+    registration forms.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='auth', password='pass')
+
+    def setUp(self):
+        page_cache.get_cache().clear()
+
+    def login(self, password='pass', username='auth'):
+        return self.client.post(reverse('auth:login'), {'username': username, 'password': password})
+
+    def test_login_throttled_per_username_before_hashing(self):
+        self.assertEqual(self.login('wrong').status_code, 200)
+        self.assertEqual(self.login('wrong').status_code, 200)
+        with mock.patch.object(User, 'check_password') as check_password:
+            response = self.login()
+        check_password.assert_not_called()
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(response['Retry-After'], '60')
+        self.assertContains(response, 'Too many login attempts', status_code=429)
+        self.assertEqual(self.login(username='other').status_code, 200)
+        self.assertEqual(self.login(username='third').status_code, 429)
+
+    def test_register_throttled_per_ip(self):
+        url = reverse('register')
+        for _ in range(4):
+            self.client.post(url, {'username': 'new', 'password1': 'x', 'password2': 'y'})
+        response = self.client.post(url, {'username': 'new', 'password1': 'x', 'password2': 'y'})
+        self.assertContains(response, 'Too many registrations', status_code=429)
+
+    @override_settings(TODO_TRUSTED_PROXY_HEADER='HTTP_X_FORWARDED_FOR', TODO_LOGIN_RATE_IP=1)
+    def test_client_ip_from_trusted_proxy_header(self):
+        url = reverse('register')
+        data = {'username': 'new', 'password1': 'x', 'password2': 'y'}
+        self.assertEqual(self.client.post(url, data, HTTP_X_FORWARDED_FOR='10.0.0.1').status_code, 200)
+        # The address the client put first is not trusted, only the proxy's last one
+        self.assertEqual(self.client.post(
+            url, data, HTTP_X_FORWARDED_FOR='10.0.0.9, 10.0.0.1').status_code, 429)
+        self.assertEqual(self.client.post(url, data, HTTP_X_FORWARDED_FOR='10.0.0.2').status_code, 200)
+        # Requests without the header are counted by REMOTE_ADDR
+        self.assertEqual(self.client.post(url, data).status_code, 200)
+        self.assertEqual(self.client.post(url, data).status_code, 429)
+
+    @override_settings(TODO_LOGIN_RATE_IP=0, TODO_LOGIN_RATE_USERNAME=0)
+    def test_no_limits(self):
+        for _ in range(3):
+            self.assertEqual(self.login('wrong').status_code, 200)
+
+    def test_hash_upgraded_on_login(self):
+        self.assertTrue(self.user.password.startswith('scrypt$16384$'))
+        with override_settings(PASSWORD_SCRYPT_WORK_FACTOR=2 ** 12):
+            self.assertEqual(self.login().status_code, 302)
+        self.user.refresh_from_db()
+        self.assertTrue(self.user.password.startswith('scrypt$4096$'))
+        self.client.logout()
+        pbkdf2 = settings.PASSWORD_HASHER_CHOICES['pbkdf2']
+        with override_settings(PASSWORD_HASHERS=[pbkdf2, *settings.PASSWORD_HASHERS]):
+            self.user.set_password('pass')
+            self.user.save()
+        self.assertTrue(self.user.password.startswith('pbkdf2_sha256$390000$'))
+        self.assertEqual(self.login().status_code, 302)
+        self.user.refresh_from_db()
+        self.assertTrue(self.user.password.startswith('scrypt$'))
+        self.assertTrue(self.user.check_password('pass'))
+
+    def test_preload_loads_validators_once(self):
+        preload()
+        validators = get_default_password_validators()
+        preload()
+        self.assertIs(get_default_password_validators(), validators)
+
+
+class TaskApiTests(TestCase):
+    """
+    Tests for the JSON API and its conditional requests.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='api', password='pass')
+        cls.other = User.objects.create_user(username='api-other', password='pass')
+        cls.category = Category.objects.create(name='Home', user=cls.user)
+        cls.task = Task.objects.create(title='Mine', description='long text',
+                                       user=cls.user, category=cls.category)
+        Task.objects.create(title='Theirs', user=cls.other)
+
+    def setUp(self):
+        self.client.force_login(self.user)
+
+    def test_list_only_has_own_tasks_and_selected_fields(self):
+        response = self.client.get(reverse('todo:api-tasks'), {'fields': 'title,category'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['results'], [{
+            'uuid': str(self.task.uuid), 'title': 'Mine', 'category': str(self.category.uuid)}])
+
+    def test_unknown_field_is_400(self):
+        response = self.client.get(reverse('todo:api-tasks'), {'fields': 'title,secret'})
+        self.assertEqual(response.status_code, 400)
+
+    def test_unchanged_list_is_304_without_reading_rows(self):
+        url = reverse('todo:api-tasks')
+        etag = self.client.get(url)['ETag']
+        # session, user and the aggregate query
+        with self.assertNumQueries(3):
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response['ETag'], etag)
+        self.assertEqual(response.content, b'')
+
+    def test_list_etag_changes_with_tasks_and_fields(self):
+        url = reverse('todo:api-tasks')
+        etag = self.client.get(url)['ETag']
+        self.assertNotEqual(self.client.get(url, {'fields': 'title'})['ETag'], etag)
+        self.client.post(reverse('todo:api-task-complete', args=[self.task.uuid]),
+                         '{}', content_type='application/json')
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_if_modified_since(self):
+        url = reverse('todo:api-task', args=[self.task.uuid])
+        last_modified = self.client.get(url)['Last-Modified']
+        response = self.client.get(url, HTTP_IF_MODIFIED_SINCE=last_modified)
+        self.assertEqual(response.status_code, 304)
+
+    def test_list_is_modified_by_a_deletion(self):
+        older = Task.objects.create(title='Older', user=self.user)
+        Task.objects.filter(pk=older.pk).update(updated_at=timezone.now() - timedelta(days=1))
+        url = reverse('todo:api-tasks')
+        last_modified = self.client.get(url)['Last-Modified']
+        self.assertEqual(self.client.get(url, HTTP_IF_MODIFIED_SINCE=last_modified).status_code, 304)
+        with mock.patch('django.utils.timezone.now',
+                        return_value=timezone.now() + timedelta(seconds=5)):
+            self.client.delete(reverse('todo:api-task', args=[older.uuid]))
+        response = self.client.get(url, HTTP_IF_MODIFIED_SINCE=last_modified)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([task['title'] for task in response.json()['results']], ['Mine'])
+
+    def test_create_and_patch(self):
+        response = self.client.post(reverse('todo:api-tasks'), json.dumps({
+            'title': 'New', 'due_date': '2030-01-01T10:00:00Z', 'priority': 'high',
+        }), content_type='application/json')
+        self.assertEqual(response.status_code, 201)
+        url = response['Location']
+        response = self.client.patch(url, json.dumps({'complete': True}),
+                                     content_type='application/json',
+                                     HTTP_IF_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, 200)
+        task = Task.objects.get(uuid=response.json()['uuid'])
+        self.assertEqual((task.user, task.priority, task.complete), (self.user, 'high', True))
+
+    def test_stale_if_match_is_412(self):
+        url = reverse('todo:api-task', args=[self.task.uuid])
+        response = self.client.delete(url, HTTP_IF_MATCH='"stale"')
+        self.assertEqual(response.status_code, 412)
+        self.assertEqual(self.client.delete(url).status_code, 204)
+        self.assertFalse(Task.objects.filter(pk=self.task.pk).exists())
+
+    def test_foreign_task_is_404(self):
+        foreign = Task.objects.get(title='Theirs')
+        url = reverse('todo:api-task', args=[foreign.uuid])
+        self.assertEqual(self.client.get(url).status_code, 404)
+        self.assertEqual(self.client.delete(url).status_code, 404)
+
+    def test_anonymous_is_401(self):
+        self.client.logout()
+        self.assertEqual(self.client.get(reverse('todo:api-tasks')).status_code, 401)
+
+    def test_foreign_category_is_404_and_not_assignable(self):
+        foreign = Category.objects.create(name='Home', user=self.other)
+        url = reverse('todo:api-category', args=[foreign.uuid])
+        self.assertEqual(self.client.get(url).status_code, 404)
+        self.assertEqual(self.client.delete(url).status_code, 404)
+        response = self.client.post(reverse('todo:api-tasks'), json.dumps({
+            'title': 'New', 'category': str(foreign.uuid)}), content_type='application/json')
+        self.assertIn('category', response.json()['errors'])
+        response = self.client.post(reverse('todo:api-categories'), json.dumps({
+            'name': 'Home'}), content_type='application/json')
+        self.assertEqual(response.status_code, 400)
+
+
+class TaskStatsTests(TestCase):
+    """
+    Tests for the stats summary and the /tasks/stats endpoint.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='counter', password='pass')
+        cls.category = Category.objects.create(name='Work', user=cls.user)
+        now = timezone.now()
+        cls.tasks = [
+            Task.objects.create(title=f'Task {i}', user=cls.user, priority=priority,
+                                category=cls.category if i % 2 else None,
+                                due_date=now + timedelta(days=i - 2, hours=12))
+            for i, priority in enumerate(['low', 'medium', 'high', 'high'])
+        ]
+
+    def setUp(self):
+        self.client.force_login(self.user)
+        self.url = reverse('todo:task-stats')
+
+    def assertSummaryIsExact(self):
+        kept = summary_data(get_summary(self.user))
+        rebuild_summaries([self.user.pk])
+        self.assertEqual(kept, summary_data(get_summary(self.user)))
+
+    def test_counts(self):
+        self.assertEqual(self.client.get(self.url).json(), {
+            'total': 4, 'open': 4, 'complete': 0, 'overdue': 2,
+            'priority': {'low': 1, 'medium': 1, 'high': 2},
+            'categories': [{'uuid': str(self.category.uuid), 'name': 'Work', 'count': 2}],
+        })
+
+    def test_follows_every_kind_of_write(self):
+        get_summary(self.user)
+        task = Task.objects.create(title='New', user=self.user, category=self.category)
+        self.assertSummaryIsExact()
+        task.priority, task.category, task.due_date = 'high', None, timezone.now()
+        task.save()
+        self.assertSummaryIsExact()
+        self.client.get(reverse('todo:task-complete', args=[self.tasks[0].uuid]),
+                        {'complete': 'True'})
+        self.assertSummaryIsExact()
+        self.client.post(reverse('todo:tasks-bulk'), {
+            'uuids': [t.uuid for t in self.tasks[1:3]], 'action': 'priority',
+            'priority': 'low'}, HTTP_ACCEPT='application/json')
+        self.assertSummaryIsExact()
+        self.client.post(reverse('todo:tasks-bulk'), {
+            'uuids': [self.tasks[3].uuid], 'action': 'delete'}, HTTP_ACCEPT='application/json')
+        self.assertSummaryIsExact()
+        self.client.delete(reverse('todo:api-task', args=[self.tasks[1].uuid]))
+        self.assertSummaryIsExact()
+        task.delete()
+        self.assertSummaryIsExact()
+        self.assertEqual(summary_data(get_summary(self.user))['total'], 2)
+
+    def test_read_does_not_count_tasks(self):
+        get_summary(self.user)
+        # session, user, the summary and the names of its categories
+        with self.assertNumQueries(4):
+            self.client.get(self.url)
+
+    def test_overdue_is_recounted_once_a_due_date_passes(self):
+        self.assertEqual(get_summary(self.user).overdue, 2)
+        later = timezone.now() + timedelta(days=1, hours=1)
+        with mock.patch('todo.stats.timezone.now', return_value=later):
+            self.assertEqual(get_summary(self.user).overdue, 3)
+
+    def test_toggles_keep_the_overdue_count(self):
+        get_summary(self.user)
+        future = Task.objects.create(title='Later', user=self.user, complete=True,
+                                     due_date=timezone.now() + timedelta(hours=1))
+        for task, complete in ((self.tasks[0], 'True'), (self.tasks[0], 'False'),
+                               (self.tasks[3], 'True'), (future, 'False')):
+            self.client.get(reverse('todo:task-complete', args=[task.uuid]), {'complete': complete})
+            self.assertIsNotNone(TaskSummary.objects.get(user=self.user).overdue_at)
+            with self.assertNumQueries(1):
+                get_summary(self.user)
+            self.assertSummaryIsExact()
+        self.assertEqual(TaskSummary.objects.get(user=self.user).next_due_at, future.due_date)
+
+    def test_unknown_priority_is_rejected(self):
+        get_summary(self.user)
+        with self.assertRaisesMessage(ValueError, "Unknown priority 'urgent'"):
+            apply_changes(self.user.pk, added=[(False, 'urgent', None, None)])
+
+    def test_rebuild_command(self):
+        get_summary(self.user)
+        Task.objects.filter(pk=self.tasks[0].pk).update(complete=True)
+        call_command('rebuild_task_summaries', batch_size=1, stdout=StringIO())
+        self.assertEqual(summary_data(get_summary(self.user))['complete'], 1)
+
+
+@override_settings(TODO_SYNC_OVERLAP_SECONDS=0)
+class TaskSyncTests(TestCase):
+    """
+    Tests for the /tasks/changes delta-sync feed and its tombstones.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='syncer', password='pass')
+        cls.tasks = [Task.objects.create(title=f'Sync {i}', user=cls.user) for i in range(3)]
+        # Pretend the tasks were written a while ago
+        for hours, task in enumerate(reversed(cls.tasks), 1):
+            Task.objects.filter(pk=task.pk).update(
+                updated_at=timezone.now() - timedelta(hours=hours))
+
+    def setUp(self):
+        self.client.force_login(self.user)
+        self.url = reverse('todo:task-changes')
+
+    def sync(self, since=None, **params):
+        if since:
+            params['since'] = since
+        response = self.client.get(self.url, params)
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def test_full_sync_then_only_changes(self):
+        first = self.sync(fields='title')
+        self.assertEqual(len(first['changes']), 3)
+        self.assertFalse(first['has_more'])
+
+        task = self.tasks[1]
+        self.client.post(reverse('todo:api-task-complete', args=[task.uuid]),
+                         '{}', content_type='application/json')
+        second = self.sync(first['next'])
+        self.assertEqual([change['uuid'] for change in second['changes']], [str(task.uuid)])
+        self.assertEqual(second['deleted'], [])
+
+    def test_deletions_leave_tombstones(self):
+        since = self.sync()['next']
+        self.client.post(reverse('todo:task-delete', args=[self.tasks[0].uuid]))
+        self.client.post(reverse('todo:tasks-bulk'),
+                         {'action': 'delete', 'uuids': [str(self.tasks[1].uuid)]})
+        page = self.sync(since)
+        self.assertCountEqual(page['deleted'], [str(self.tasks[0].uuid), str(self.tasks[1].uuid)])
+        self.assertEqual(page['changes'], [])
+
+    def test_pages_walk_every_task(self):
+        seen, since = [], None
+        for _ in range(5):
+            page = self.sync(since, limit=1)
+            seen += [change['uuid'] for change in page['changes']]
+            since = page['next']
+            if not page['has_more']:
+                break
+        self.assertEqual(seen, [str(task.uuid) for task in self.tasks])
+
+    def test_expired_token_is_410(self):
+        since = self.sync()['next']
+        with override_settings(TODO_TOMBSTONE_RETENTION_DAYS=0):
+            response = self.client.get(self.url, {'since': since})
+        self.assertEqual(response.status_code, 410)
+
+    def test_frequent_syncs_outlive_the_retention(self):
+        token = changes(self.user)['next']
+        start = timezone.now()
+        for days in (20, 40, 60):
+            with mock.patch('django.utils.timezone.now', return_value=start + timedelta(days=days)):
+                token = changes(self.user, token)['next']
+        with mock.patch('django.utils.timezone.now', return_value=start + timedelta(days=100)):
+            with self.assertRaises(StaleToken):
+                changes(self.user, token)
+
+    def test_compaction_and_user_deletion(self):
+        self.tasks[1].delete()
+        self.tasks[2].delete()
+        TaskTombstone.objects.update(deleted_at=timezone.now() - timedelta(days=90))
+        Task.objects.create(title='Gone too', user=self.user).delete()
+        out = StringIO()
+        with CaptureQueriesContext(connection) as queries:
+            call_command('compact_tombstones', batch_size=1, stdout=out)
+        self.assertEqual(out.getvalue(), '2 tombstones deleted\n')
+        self.assertEqual(len([q for q in queries if q['sql'].startswith('DELETE')]), 2)
+        self.assertEqual(TaskTombstone.objects.count(), 1)
+        self.user.delete()
+        self.assertFalse(TaskTombstone.objects.exists())
+
+
+class StubEventStream(EventStream):
+    """
+    An EventStream trusting the user id put in the scope by the test.
+    """
+
+    async def authenticate(self, scope):
+        return scope.get('user_id')
+
+
+class FakeStreamClient:
+    """
+    The ASGI receive and send callables of one client of an EventStream.
+    """
+
+    def __init__(self, user_id=1):
+        self.scope = {'type': 'http', 'method': 'GET', 'path': '/events/',
+                      'headers': [], 'user_id': user_id}
+        self.messages = []
+        self.gone = asyncio.get_running_loop().create_future()
+
+    async def receive(self):
+        await self.gone
+        return {'type': 'http.disconnect'}
+
+    async def send(self, message):
+        self.messages.append(message)
+
+    def body(self) -> bytes:
+        return b''.join(message.get('body', b'') for message in self.messages)
+
+    def disconnect(self):
+        self.gone.set_result(None)
+
+
+class EventStreamTests(SimpleTestCase):
+    """
+    Tests for the live update stream and its broker.
+    """
+
+    async def test_events_reach_only_their_user(self):
+        broker = LocalBroker(queue_size=10)
+        app = StubEventStream(broker, heartbeat=60)
+        mine, other = FakeStreamClient(1), FakeStreamClient(2)
+        streams = [asyncio.ensure_future(app(c.scope, c.receive, c.send)) for c in (mine, other)]
+        await asyncio.sleep(0)
+        await asyncio.to_thread(broker.publish, 1, {'type': 'deleted', 'uuids': ['abc']})
+        await asyncio.sleep(0.05)
+        self.assertIn(b'data: {"type": "deleted", "uuids": ["abc"]}\n\n', mine.body())
+        self.assertNotIn(b'data:', other.body())
+        mine.disconnect()
+        other.disconnect()
+        await asyncio.gather(*streams)
+        self.assertEqual(broker.connections(), 0)
+
+    async def test_overflow_sends_resync(self):
+        broker = LocalBroker(queue_size=2)
+        app = StubEventStream(broker, heartbeat=60)
+        client = FakeStreamClient()
+        stream = asyncio.ensure_future(app(client.scope, client.receive, client.send))
+        await asyncio.sleep(0)
+        subscription = next(iter(broker._subscriptions[1]))
+        for n in range(5):
+            subscription.deliver(b'%d' % n)
+        self.assertEqual(len(subscription.events), 2)
+        await asyncio.sleep(0.01)
+        self.assertTrue(client.body().endswith(b'data: ' + RESYNC + b'\n\n'))
+        client.disconnect()
+        await stream
+
+    async def test_ten_thousand_idle_connections_have_bounded_memory(self):
+        connections, queue_size = 10000, 5
+        broker = LocalBroker(queue_size=queue_size)
+        app = StubEventStream(broker, heartbeat=3600, max_connections=connections)
+        tracemalloc.start()
+        before = tracemalloc.get_traced_memory()[0]
+        clients = [FakeStreamClient(n % 100) for n in range(connections)]
+        streams = [asyncio.ensure_future(app(c.scope, c.receive, c.send)) for c in clients]
+        await asyncio.sleep(0.1)
+        idle = tracemalloc.get_traced_memory()[0] - before
+        # Nobody reads: every queue stops growing at queue_size
+        for n in range(3 * queue_size):
+            for user_id in range(100):
+                broker.publish(user_id, {'type': 'changed', 'uuids': []})
+        flooded = tracemalloc.get_traced_memory()[0] - before
+        tracemalloc.stop()
+
+        refused = FakeStreamClient()
+        await app(refused.scope, refused.receive, refused.send)
+        self.assertEqual(refused.messages[0]['status'], 503)
+        self.assertEqual(broker.connections(), connections)
+        self.assertLess(idle / connections, 8 * 1024)
+        self.assertLess(flooded / connections, 8 * 1024 + queue_size * 64)
+        for client in clients:
+            client.disconnect()
+        await asyncio.gather(*streams)
+        self.assertEqual(broker.connections(), 0)
+
+
+class LiveUpdateTests(TestCase):
+    """
+    Tests that task writes publish events and that /events/ needs a session.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='live', password='pass')
+        cls.task = Task.objects.create(title='Watched', user=cls.user)
+
+    def setUp(self):
+        self.client.force_login(self.user)
+        self.published = []
+        recorder = LocalBroker()
+        recorder.publish = lambda *args: self.published.append(args)
+        patcher = mock.patch.object(broker_module, '_broker', recorder)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_writes_publish_after_commit(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.get(reverse('todo:task-complete', args=[self.task.uuid]),
+                            {'complete': 'True'})
+            self.assertEqual(self.published, [])
+        with self.captureOnCommitCallbacks(execute=True):
+            self.task.delete()
+        self.assertEqual(self.published, [
+            (self.user.pk, {'type': 'completed', 'uuids': [str(self.task.uuid)], 'complete': True}),
+            (self.user.pk, {'type': 'deleted', 'uuids': [str(self.task.uuid)]}),
+        ])
+
+    # Closing the connection would end the test's transaction, which is why
+    # Django's test client also keeps close_old_connections off its requests
+    @mock.patch('todo.events.close_old_connections')
+    def test_stream_requires_a_session(self, close_old_connections):
+        # lynx.asgi sets its defaults in os.environ when first imported
+        with mock.patch.dict(os.environ):
+            from lynx.asgi import application
+
+        async def get(cookie):
+            client = FakeStreamClient()
+            client.scope['headers'] = [(b'cookie', cookie.encode())] if cookie else []
+            client.disconnect()
+            await application(client.scope, client.receive, client.send)
+            return client.messages[0]['status']
+
+        self.assertEqual(async_to_sync(get)(None), 401)
+        cookie = f'{settings.SESSION_COOKIE_NAME}={self.client.cookies[settings.SESSION_COOKIE_NAME].value}'
+        self.assertEqual(async_to_sync(get)(cookie), 200)
+
+    def test_stream_releases_its_connection(self):
+        calls = []
+
+        def get_user(request):
+            calls.append('get_user')
+            return self.user
+
+        cookie = f'{settings.SESSION_COOKIE_NAME}={self.client.cookies[settings.SESSION_COOKIE_NAME].value}'
+        scope = {'headers': [(b'cookie', cookie.encode())]}
+        with mock.patch('todo.events.close_old_connections', lambda: calls.append('close')), \
+                mock.patch('todo.events.get_user', get_user):
+            self.assertEqual(async_to_sync(EventStream().authenticate)(scope), self.user.pk)
+        self.assertEqual(calls, ['close', 'get_user', 'close'])
+
+
+class FakeConnection:
+    """
+    Stands in for a DB-API connection in the pool tests.
+    """
+
+    def __init__(self, alive=True):
+        self.alive = alive
+        self.closed = False
+
+    def cursor(self):
+        if not self.alive:
+            raise OSError('server closed the connection')
+        return self
+
+    def execute(self, sql):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        pass
+
+    def close(self):
+        self.closed = True
+
+
+class ConnectionPoolTests(SimpleTestCase):
+    """
+    Tests for lynx.db.pool.ConnectionPool.
+    """
+
+    def make_pool(self, **options):
+        return ConnectionPool(FakeConnection, **{'size': 1, 'max_overflow': 1, **options})
+
+    def test_reuses_returned_connections(self):
+        pool = self.make_pool()
+        first = pool.checkout()
+        pool.checkin(first)
+        self.assertIs(pool.checkout(), first)
+        self.assertEqual(pool.stats()['created'], 1)
+
+    def test_overflow_is_closed_on_checkin(self):
+        pool = self.make_pool()
+        first, second = pool.checkout(), pool.checkout()
+        pool.checkin(first)
+        pool.checkin(second)
+        self.assertTrue(second.closed)
+        self.assertEqual(pool.stats()['open'], 1)
+
+    def test_waits_then_times_out(self):
+        pool = self.make_pool(max_overflow=0, timeout=0.05)
+        held = pool.checkout()
+        with self.assertRaises(PoolTimeout):
+            pool.checkout()
+        threading.Timer(0.01, pool.checkin, [held]).start()
+        pool.timeout = 5
+        self.assertIs(pool.checkout(), held)
+        stats = pool.stats()
+        self.assertEqual((stats['waits'], stats['timeouts']), (2, 1))
+        self.assertGreater(stats['wait_time'], 0)
+
+    def test_replaces_dead_and_stale_connections(self):
+        pool = self.make_pool(recycle=60)
+        dead = pool.checkout()
+        dead.alive = False
+        pool.checkin(dead)
+        self.assertIsNot(pool.checkout(), dead)
+        pool.recycle = -1
+        stale = pool.checkout()
+        pool.checkin(stale)
+        self.assertIsNot(pool.checkout(), stale)
+        stats = pool.stats()
+        self.assertEqual((stats['failed_pings'], stats['recycled']), (1, 1))
+
+
+@skipUnless(connection.vendor == 'postgresql', 'EXPLAIN plans are checked on PostgreSQL')
+class QueryPlanTests(TestCase):
+    """
+    Fail if a hot query in todo/views.py falls back to a sequential scan.
+
+    The table is seeded with TODO_EXPLAIN_ROWS tasks (1M by default) spread
+    over 1,000 users so that the planner statistics look like production.
+    """
+    rows = int(os.environ.get('TODO_EXPLAIN_ROWS', 1_000_000))
+
+    @classmethod
+    def setUpTestData(cls):
+        with connection.cursor() as cursor:
+            cursor.execute("""
+                INSERT INTO auth_user (password, is_superuser, username, first_name,
+                                       last_name, email, is_staff, is_active, date_joined)
+                SELECT '!', false, 'explain-' || n, '', '', '', false, true, now()
+                FROM generate_series(1, 1000) AS n
+            """)
+            cursor.execute("""
+                INSERT INTO todo_task (uuid, created_at, updated_at, title, description,
+                                       complete, due_date, priority, user_id)
+                SELECT gen_random_uuid(), now(), now(), 'Task ' || n, 'description',
+                       n % 3 = 0, now() - (n % 5000) * interval '1 minute', 'low', u.id
+                FROM generate_series(1, %s) AS n
+                JOIN auth_user u ON u.username = 'explain-' || (n % 1000 + 1)
+            """, [cls.rows])
+            cursor.execute('ANALYZE auth_user')
+            cursor.execute('ANALYZE todo_task')
+        cls.user = User.objects.get(username='explain-1')
+        cls.task = Task.objects.filter(user=cls.user).first()
+
+    def assertNoSeqScan(self, queryset):
+        plan = queryset.explain()
+        self.assertNotIn('Seq Scan on todo_task', plan, plan)
+
+    def list_queryset(self):
+        request = RequestFactory().get(reverse('todo:tasks-list'))
+        request.user = self.user
+        view = TaskListView()
+        view.setup(request)
+        return view.get_queryset()
+
+    def test_list_query(self):
+        self.assertNoSeqScan(self.list_queryset()[:10])
+
+    def test_cursor_list_query(self):
+        paginator = CursorPaginator(self.list_queryset(), 10)
+        queryset = paginator.queryset.filter(
+            paginator._after(self.task.due_date, self.task.pk)).order_by(*paginator.ordering)
+        self.assertNoSeqScan(queryset[:11])
+
+    def test_detail_query(self):
+        self.assertNoSeqScan(Task.objects.filter(uuid=self.task.uuid))
+
+    def test_complete_query(self):
+        # The UPDATE of complete_task, compiled the way QuerySet.update() does
+        tasks = Task.objects.filter(uuid=self.task.uuid, user=self.user).exclude(complete=True)
+        query = tasks.query.chain(UpdateQuery)
+        query.add_update_values({'complete': True, 'updated_at': timezone.now()})
+        sql, params = query.get_compiler(tasks.db).as_sql()
+        with connection.cursor() as cursor:
+            cursor.execute('EXPLAIN ' + sql, params)
+            plan = '\n'.join(row[0] for row in cursor.fetchall())
+        self.assertIn('Update on todo_task', plan, plan)
+        self.assertNotIn('Seq Scan on todo_task', plan, plan)
@@ -0,0 +1,82 @@
+"""
+Rate limits of the login and registration forms.
+
+Each form hashes a password, which costs far more CPU than the rest of the
+request, so a flood of posts from one client, or against one account, is
+turned away before the form is validated. Attempts are counted in the cache
+over fixed windows of TODO_LOGIN_RATE_WINDOW seconds, per client IP and per
+username. With the per-process locmem cache every worker counts on its own;
+share the counts with the file or redis cache backends.
+
+Behind a reverse proxy every request comes from the proxy's address, so
+all clients would share one count. TODO_TRUSTED_PROXY_HEADER names the
+request header in which the proxy passes on the client's address instead.
+"""
+import hashlib
+
+from django.conf import settings
+from django.core.cache import caches
+
+
+def throttle_key(scope: str, kind: str, value: str) -> str:
+    digest = hashlib.md5(value.encode()).hexdigest()
+    return f'todo:throttle:{scope}:{kind}:{digest}'
+
+
+def hit(key: str, window: int) -> int:
+    """
+    Count an attempt and return the attempts made in the current window.
+    """
+    cache = caches[settings.TODO_CACHE_ALIAS]
+    if cache.add(key, 1, timeout=window):
+        return 1
+    try:
+        return cache.incr(key)
+    except ValueError:
+        # The window ended between add() and incr()
+        cache.add(key, 1, timeout=window)
+        return 1
+
+
+def client_ip(request) -> str:
+    """
+    Return the address of the client of ``request``.
+
+    With TODO_TRUSTED_PROXY_HEADER set, this is the last address of that
+    header, the one the proxy added: the ones before it were sent by the
+    client and can be anything. Requests without the header, which did not
+    pass through the proxy, fall back to REMOTE_ADDR.
+    """
+    header = settings.TODO_TRUSTED_PROXY_HEADER
+    if header:
+        forwarded = request.META.get(header, '').rsplit(',', 1)[-1].strip()
+        if forwarded:
+            return forwarded
+    return request.META.get('REMOTE_ADDR') or ''
+
+
+def is_throttled(request, scope: str, username: str = '') -> bool:
+    """
+    Count an attempt of ``scope`` by the client of ``request`` and tell
+    whether it went over one of the limits.
+
+    Args:
+        request (HttpRequest): The request making the attempt.
+        scope (str): What is attempted, 'login' or 'register'.
+        username (str): The username posted, if the attempt is limited per
+            username too.
+
+    Returns:
+        bool: True when TODO_LOGIN_RATE_IP attempts from the client, or
+        TODO_LOGIN_RATE_USERNAME attempts on the username, were already made
+        in the window. A limit of 0 is off.
+    """
+    window = settings.TODO_LOGIN_RATE_WINDOW
+    limits = [('ip', client_ip(request), settings.TODO_LOGIN_RATE_IP)]
+    if username:
+        limits.append(('username', username.lower(), settings.TODO_LOGIN_RATE_USERNAME))
+    throttled = False
+    for kind, value, limit in limits:
+        if limit and hit(throttle_key(scope, kind, value), window) > limit:
+            throttled = True
+    return throttled
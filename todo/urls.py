@@ -1,3 +1,4 @@
+from django.conf import settings
 from django.urls import path
 from .views import (
     TaskListView,
@@ -5,19 +6,66 @@ from .views import (
     TaskCreateView,
     TaskUpdateView, 
     TaskDeleteView,
+    TaskBulkView,
+    TaskExportView,
     complete_task
 )
+from .async_views import (
+    AsyncTaskListView,
+    AsyncTaskDetailView,
+    AsyncTaskCreateView,
+    AsyncTaskUpdateView,
+    AsyncTaskDeleteView,
+    acomplete_task
+)
+from .api import (
+    TaskListApiView,
+    TaskDetailApiView,
+    TaskCompleteApiView,
+    TaskChangesApiView,
+    TaskStatsApiView,
+    ProfileApiView,
+    CategoryListApiView,
+    CategoryDetailApiView
+)
 from django.contrib.auth.decorators import login_required
 
-urlpatterns = [
-    path('', TaskListView.as_view(), name='tasks-list'),
-    path('tasks/', TaskListView.as_view(), name='tasks-list'),
-    path('task/<slug:pk>', TaskDetailView.as_view(), name='task-detail'),
-    path('tasks/create/', TaskCreateView.as_view(), name='task-create'),
-    path('task/<slug:pk>/update/', TaskUpdateView.as_view(), name='task-update'),
-    path('task/<slug:pk>/delete/', TaskDeleteView.as_view(), name='task-delete'),
 
-    path('task/<slug:pk>/complete/', complete_task, name='task-complete'),
+def task_urlpatterns(use_async: bool) -> list:
+    """
+    Build the task routes with the sync views, or with their async versions.
+    """
+    if use_async:
+        list_view, detail_view = AsyncTaskListView, AsyncTaskDetailView
+        create_view, update_view = AsyncTaskCreateView, AsyncTaskUpdateView
+        delete_view, complete = AsyncTaskDeleteView, acomplete_task
+    else:
+        list_view, detail_view = TaskListView, TaskDetailView
+        create_view, update_view = TaskCreateView, TaskUpdateView
+        delete_view, complete = TaskDeleteView, complete_task
+
+    return [
+        path('', list_view.as_view(), name='tasks-list'),
+        path('tasks/', list_view.as_view(), name='tasks-list'),
+        path('task/<slug:pk>', detail_view.as_view(), name='task-detail'),
+        path('tasks/bulk/', TaskBulkView.as_view(), name='tasks-bulk'),
+        path('tasks/export.csv', TaskExportView.as_view(export_format='csv'), name='tasks-export-csv'),
+        path('tasks/export.ndjson', TaskExportView.as_view(export_format='ndjson'), name='tasks-export-ndjson'),
+        path('tasks/changes', TaskChangesApiView.as_view(), name='task-changes'),
+        path('tasks/stats', TaskStatsApiView.as_view(), name='task-stats'),
+        path('tasks/create/', create_view.as_view(), name='task-create'),
+        path('task/<slug:pk>/update/', update_view.as_view(), name='task-update'),
+        path('task/<slug:pk>/delete/', delete_view.as_view(), name='task-delete'),
+
+        path('task/<slug:pk>/complete/', complete, name='task-complete'),
+
+        path('api/tasks/', TaskListApiView.as_view(), name='api-tasks'),
+        path('api/tasks/<slug:pk>/', TaskDetailApiView.as_view(), name='api-task'),
+        path('api/tasks/<slug:pk>/complete/', TaskCompleteApiView.as_view(), name='api-task-complete'),
+        path('api/categories/', CategoryListApiView.as_view(), name='api-categories'),
+        path('api/categories/<slug:pk>/', CategoryDetailApiView.as_view(), name='api-category'),
+        path('api/profile/', ProfileApiView.as_view(), name='api-profile'),
+    ]
 
-]
 
+urlpatterns = task_urlpatterns(settings.TODO_ASYNC_VIEWS)
@@ -4,13 +4,31 @@ from django.views.generic import (
     UpdateView, DeleteView)
 from django.contrib.messages.views import SuccessMessageMixin
 from django.contrib.auth.mixins import LoginRequiredMixin
-from django.http import HttpResponse, HttpRequest
+from django.contrib.auth.views import LoginView as AuthLoginView
+from django.http import HttpResponse, HttpRequest, JsonResponse, StreamingHttpResponse
 from django.urls import reverse_lazy
-from django.shortcuts import redirect, render, get_object_or_404
+from django.shortcuts import redirect, render
 from django.http import Http404
-
-from .models import Task
-from .forms import TaskForm, CustomUserCreationForm
+from django.core.exceptions import ValidationError
+from django.contrib.auth.decorators import login_required
+from django.utils import timezone
+from django.conf import settings
+from django.contrib import messages
+from django.db import transaction
+
+from .models import Task, SUMMARY_KEY
+from .forms import TaskForm, CustomUserCreationForm, BulkTaskForm
+from .pagination import (
+    CursorPaginator, EstimatedCountPaginator, SearchCursorPaginator,
+    page_window, paginate_by_cursor)
+from .search import search_tasks
+from .broker import publish_task_event
+from .cache import UserPageCacheMixin, bump_generation
+from .deletion import delete_rows
+from .export import EXPORT_FORMATS
+from .stats import apply_changes, apply_completion, get_summary, summary_data
+from .sync import record_deletions
+from .throttle import is_throttled
 
 
 class BaseView(View):
@@ -20,33 +38,69 @@ class BaseView(View):
     This class provides common functionality for views that deal with tasks,
     such as retrieving a task object from the database based on a URL parameter.
 
+    Lookups are scoped to the requesting user, so a task of another user is
+    not found and the ownership check needs no query of its own: the task is
+    read through the (user, uuid) index in one query, with only the columns
+    the view uses.
+
     Attributes:
-        None
+        object_fields (tuple): The fields loaded with the task, or None for
+            all of them.
 
     Methods:
+        get_owned_queryset: Restrict a queryset to the user's tasks and the view's fields.
         get_object: Retrieve a task object from the database based on a URL parameter.
     """
+    object_fields = None
+
+    def get_owned_queryset(self, queryset=None):
+        """
+        Restrict a queryset of tasks to those of the requesting user, reading
+        only ``object_fields``.
+
+        Args:
+            queryset (QuerySet, optional): Defaults to the view's get_queryset().
+
+        Returns:
+            QuerySet: The user's tasks; none for an anonymous user.
+        """
+        if queryset is None:
+            queryset = self.get_queryset()
+        user = self.request.user
+        if not user.is_authenticated:
+            return queryset.none()
+        queryset = queryset.filter(user=user)
+        if self.object_fields is not None:
+            queryset = queryset.only(*self.object_fields)
+        return queryset
 
     def get_object(self, queryset=None)->Task:
         """
         Retrieve a task object from the database based on a URL parameter.
 
-        This method retrieves a Task object from the database based on the value of
-        the 'pk' URL parameter, which is expected to be a UUID. If the Task object
-        is not found in the database, a Http404 exception is raised.
+        This method retrieves the requesting user's Task object whose UUID is
+        the 'pk' URL parameter. A task this request already loaded is returned
+        without a query. If the user has no such task, a Http404 exception is
+        raised.
 
         Args:
             queryset (QuerySet, optional): A QuerySet of Task objects to search for
-                the specified UUID. Defaults to None.
+                the specified UUID. Defaults to the view's get_queryset().
 
         Returns:
             Task: A Task object with the specified UUID.
 
         Raises:
-            Http404: If no Task object with the specified UUID is found in the database.
+            Http404: If the user has no Task object with the specified UUID.
         """
-        
-        return get_object_or_404(Task, uuid=self.kwargs['pk'])
+        pk = str(self.kwargs['pk'])
+        loaded = getattr(self, 'object', None)
+        if loaded is not None and str(loaded.uuid) == pk:
+            return loaded
+        try:
+            return self.get_owned_queryset(queryset).get(uuid=pk)
+        except (Task.DoesNotExist, ValidationError):
+            raise Http404('No task found')
     
     def dispatch(self, request, *args, **kwargs):
         """
@@ -58,32 +112,64 @@ class BaseView(View):
             return render(request, 'todo/404.html', {'message': 'Page not found'}, status=404)
         
 
-class TaskDetailView(BaseView, DetailView):
+class TaskDetailView(LoginRequiredMixin, BaseView, UserPageCacheMixin, DetailView):
     """
-    Display detailed information about a single task.
+    Display detailed information about one of the user's tasks.
+
+    Rendered pages are cached per user.
     """
     model = Task
 
+    def get_queryset(self)->Task:
+        """
+        Load the task with its category in the same query.
+        """
+        return Task.objects.select_related('category')
+
 
-class TaskListView(LoginRequiredMixin, ListView):
+class TaskListView(LoginRequiredMixin, UserPageCacheMixin, ListView):
     """
     Display a list of tasks.
 
     This view displays a list of tasks. The list is paginated to display 10 tasks per page.
     If the user is not authenticated, the list is empty.
 
+    Two pagination modes are supported. 'offset' uses Django's Paginator and
+    numbered pages. 'cursor' walks the list with an opaque ``?cursor=`` token
+    ordered on (due_date, id), which skips the COUNT(*) and keeps deep pages as
+    cheap as the first one.
+
+    With ``?q=`` the list only shows tasks whose title or description match,
+    best matches first, paginated by cursor.
+
+    Rendered pages are cached per user when TODO_PAGE_CACHE is enabled. With
+    TODO_LIVE_UPDATES the page listens to the ``/events/`` stream and follows
+    changes made in other tabs and devices.
+
     Attributes:
         model (Task): The Task model that this view operates on.
         ordering (str): The field to order the tasks by. Defaults to '-due_date'.
         paginate_by (int): The number of tasks to display per page. Defaults to 10.
+        paginator_class (EstimatedCountPaginator): Counts the tasks, or estimates
+            them above TODO_COUNT_ESTIMATE_THRESHOLD.
+        pagination_mode (str): 'offset' or 'cursor'. Defaults to the
+            TODO_LIST_PAGINATION setting.
 
     Methods:
         get_queryset: Retrieve a QuerySet of Task objects from the database.
+        get_pagination_mode: Return the pagination mode used for this request.
+        get_search_query: Return the text of the ``?q=`` search.
+        paginate_queryset: Paginate the queryset by offset or by cursor.
+        get_stats: Return the counts shown in the stats panel.
+        get_page_window: Return the page numbers linked around the current one.
+        live_updates: Whether the page listens to the live update stream.
 
     """
     model = Task
     ordering = ['-due_date']
     paginate_by = 10
+    paginator_class = EstimatedCountPaginator
+    pagination_mode = None
 
     def get_queryset(self)->Task:
         """
@@ -93,18 +179,87 @@ class TaskListView(LoginRequiredMixin, ListView):
         include only tasks that belong to the current user (if authenticated). The list
         of tasks is sorted by due date, with the most urgent tasks displayed first.
 
+        The category of each task is joined in, and the description, which the
+        list does not show, is left out.
+
         Returns:
             QuerySet: A QuerySet of Task objects.
 
         """
-        queryset = super().get_queryset()
+        queryset = super().get_queryset().select_related('category').defer('description')
         user = self.request.user
         if user.is_authenticated:
             queryset = queryset.filter(user=user)
         else:
             queryset = queryset.none()
+        if self.get_search_query():
+            queryset = search_tasks(queryset, self.get_search_query())
         return queryset
 
+    def get_search_query(self)->str:
+        """
+        Return the search text of the ``?q=`` parameter, or an empty string.
+        """
+        return self.request.GET.get('q', '').strip()
+
+    def get_stats(self)->dict:
+        """
+        Return the counts shown in the stats panel, from the user's TaskSummary.
+        """
+        return summary_data(get_summary(self.request.user))
+
+    def get_page_window(self, page)->range:
+        """
+        Return the page numbers linked around the current one, rather than
+        walking the whole page range of the paginator in the template.
+        """
+        if not hasattr(page, 'number'):
+            return range(0)
+        return page_window(page)
+
+    def get_context_data(self, **kwargs)->dict:
+        context = super().get_context_data(**kwargs)
+        context['stats'] = self.get_stats()
+        context['page_window'] = self.get_page_window(context['page_obj'])
+        return context
+
+    def live_updates(self)->bool:
+        """
+        Whether the page listens to the live update stream.
+        """
+        return settings.TODO_LIVE_UPDATES
+
+    def get_pagination_mode(self)->str:
+        """
+        Return the pagination mode used for this request.
+
+        Search results are always paginated by cursor, ordered by rank.
+
+        Returns:
+            str: 'offset', 'cursor' or 'search'.
+        """
+        if self.get_search_query():
+            return 'search'
+        return self.pagination_mode or settings.TODO_LIST_PAGINATION
+
+    def paginate_queryset(self, queryset, page_size):
+        """
+        Paginate the queryset by offset or by cursor.
+
+        In cursor mode the ordering of the queryset is replaced by the stable
+        (due_date, id) key and the position is read from ``?cursor=``.
+
+        Returns:
+            tuple: (paginator, page, object_list, is_paginated)
+        """
+        mode = self.get_pagination_mode()
+        if mode == 'offset':
+            return super().paginate_queryset(queryset, page_size)
+        paginator, page = paginate_by_cursor(
+            queryset, page_size, self.request.GET.get('cursor'),
+            SearchCursorPaginator if mode == 'search' else CursorPaginator)
+        return (paginator, page, page.object_list, page.has_other_pages())
+
 
 class TaskCreateView(SuccessMessageMixin, LoginRequiredMixin, CreateView):
     """
@@ -132,6 +287,12 @@ class TaskCreateView(SuccessMessageMixin, LoginRequiredMixin, CreateView):
             str: The URL to redirect to.
         """
         return reverse_lazy('todo:task-detail', kwargs={'pk': self.object.uuid})
+
+    def get_form_kwargs(self)->dict:
+        """
+        Offer the form the categories of the current user.
+        """
+        return {**super().get_form_kwargs(), 'user': self.request.user}
     
     def form_valid(self, form:TaskForm)->HttpResponse:
         """
@@ -177,6 +338,12 @@ class TaskUpdateView(LoginRequiredMixin, BaseView, UpdateView):
         """
         return reverse_lazy('todo:task-detail', kwargs={'pk': self.object.uuid})
 
+    def get_form_kwargs(self)->dict:
+        """
+        Offer the form the categories of the current user.
+        """
+        return {**super().get_form_kwargs(), 'user': self.request.user}
+
 
 class TaskDeleteView(LoginRequiredMixin, BaseView, DeleteView):
     """
@@ -190,9 +357,163 @@ class TaskDeleteView(LoginRequiredMixin, BaseView, DeleteView):
     model = Task
     success_message = "Task deleted successfully"
     success_url = reverse_lazy('todo:tasks-list')
+    # What the confirmation page shows and the delete signals read; the
+    # description and timestamps are not loaded
+    object_fields = ('uuid', 'user', 'title', *SUMMARY_KEY)
+
+
+class TaskBulkView(LoginRequiredMixin, View):
+    """
+    Apply one action to many of the user's tasks in a single request.
+
+    The action runs as one set-based UPDATE or DELETE whose WHERE clause checks
+    both the uuids and the owner, inside a transaction that first locks the
+    user's matching rows to report a result per submitted uuid.
+
+    JSON clients (``Accept: application/json``) get ``{"results": {uuid: status}}``
+    where status is 'updated', 'deleted', 'not_found' or 'invalid'; the list
+    page form gets a summary message and a redirect back to the list.
+
+    Methods:
+        post: Validate the form and apply the action.
+        apply: Run the action and return the per-uuid results.
+    """
+
+    def post(self, request: HttpRequest)->HttpResponse:
+        """
+        Validate the form and apply the action.
+
+        Returns:
+            HttpResponse: JSON results, or a redirect to the task list.
+        """
+        form = BulkTaskForm(request.POST, user=request.user)
+        wants_json = 'application/json' in request.headers.get('Accept', '')
+        if not form.is_valid():
+            if wants_json:
+                return JsonResponse({'errors': form.errors}, status=400)
+            messages.error(request, ' '.join(
+                error for errors in form.errors.values() for error in errors))
+            return redirect('todo:tasks-list')
+
+        results = self.apply(form.cleaned_data)
+        results.update((value, 'invalid') for value in form.invalid_uuids)
+        if wants_json:
+            return JsonResponse({'results': results})
+        done = sum(status in ('updated', 'deleted') for status in results.values())
+        messages.success(request, f'{done} of {len(results)} tasks changed')
+        return redirect('todo:tasks-list')
+
+    def apply(self, data: dict)->dict:
+        """
+        Run the action and return the per-uuid results.
+
+        Args:
+            data (dict): The cleaned data of a BulkTaskForm.
+
+        Returns:
+            dict: A status per submitted uuid.
+        """
+        action = data['action']
+        tasks = Task.objects.filter(user=self.request.user, uuid__in=data['uuids'])
+        results = {str(uuid): 'not_found' for uuid in data['uuids']}
+        with transaction.atomic():
+            rows = tasks.order_by().select_for_update().values_list('pk', 'uuid', *SUMMARY_KEY)
+            owned, pks = {}, []
+            for pk, uuid, *key in rows:
+                owned[uuid] = key
+                pks.append(pk)
+            if action == 'delete':
+                # Task has no dependent rows, so skip the collector and its
+                # per-object signals; tombstones and the summary are updated
+                # in one batch and the cache is invalidated once below.
+                delete_rows(Task, pks, using=tasks.db)
+                record_deletions(self.request.user.pk, owned)
+                apply_changes(self.request.user.pk, removed=owned.values())
+                status = 'deleted'
+            else:
+                values = {
+                    'complete': {'complete': True},
+                    'uncomplete': {'complete': False},
+                    'priority': {'priority': data['priority']},
+                    'category': {'category_id': getattr(data['category'], 'pk', None)},
+                }[action]
+                tasks.update(updated_at=timezone.now(), **values)
+                apply_changes(self.request.user.pk, removed=owned.values(), added=[
+                    tuple(values.get(name, value) for name, value in zip(SUMMARY_KEY, key))
+                    for key in owned.values()])
+                status = 'updated'
+        results.update((str(uuid), status) for uuid in owned)
+        if owned:
+            bump_generation(self.request.user.pk)
+            publish_task_event(self.request.user.pk, status, owned)
+        return results
+
+
+class TaskExportView(LoginRequiredMixin, View):
+    """
+    Stream all of the user's tasks as CSV or NDJSON.
+
+    The response is a StreamingHttpResponse fed by a server-side cursor, so
+    memory stays flat no matter how many tasks the user has.
+
+    Attributes:
+        export_format (str): 'csv' or 'ndjson', set in the URLconf.
+    """
+    export_format = 'csv'
+
+    def get(self, request: HttpRequest)->StreamingHttpResponse:
+        """
+        Stream the export file.
+
+        Returns:
+            StreamingHttpResponse: The export, served as an attachment.
+        """
+        rows, content_type = EXPORT_FORMATS[self.export_format]
+        response = StreamingHttpResponse(
+            rows(Task.objects.filter(user=request.user)), content_type=content_type)
+        response['Content-Disposition'] = f'attachment; filename="tasks.{self.export_format}"'
+        return response
 
 
-class RegisterView(CreateView):
+class ThrottleMixin:
+    """
+    Turn away posts of a form that hashes a password once the client, or the
+    posted username, made too many of them (see todo/throttle.py).
+
+    A throttled post is answered with 429 and the blank form, before the
+    form is validated, so it costs no hashing.
+
+    Attributes:
+        throttle_scope (str): The name the attempts are counted under.
+        throttle_username (bool): Whether attempts are also counted per username.
+    """
+    throttle_scope = None
+    throttle_username = False
+
+    def post(self, request, *args, **kwargs):
+        username = request.POST.get('username', '') if self.throttle_username else ''
+        if is_throttled(request, self.throttle_scope, username):
+            kwargs = self.get_form_kwargs()
+            kwargs.pop('data', None)
+            kwargs.pop('files', None)
+            kwargs['initial'] = {'username': request.POST.get('username', '')}
+            form = self.get_form_class()(**kwargs)
+            response = self.render_to_response(
+                self.get_context_data(form=form, throttled=True), status=429)
+            response['Retry-After'] = settings.TODO_LOGIN_RATE_WINDOW
+            return response
+        return super().post(request, *args, **kwargs)
+
+
+class LoginView(ThrottleMixin, AuthLoginView):
+    """
+    Django's login view, with the attempts limited per client and per username.
+    """
+    throttle_scope = 'login'
+    throttle_username = True
+
+
+class RegisterView(ThrottleMixin, CreateView):
     """
     A view that allows a user to register for an account.
 
@@ -208,6 +529,8 @@ class RegisterView(CreateView):
     - success_url (str): The URL to redirect to upon successful registration.
     - template_name (str): The name of the HTML template to use for rendering
       the registration form.
+    - throttle_scope (str): Registrations are limited per client, as each
+      one hashes a password.
 
     Methods:
     - dispatch(request, *args, **kwargs): Overridden method that redirects
@@ -217,6 +540,7 @@ class RegisterView(CreateView):
     form_class = CustomUserCreationForm
     success_url = reverse_lazy('auth:login')
     template_name = 'registration/register.html'
+    throttle_scope = 'register'
 
     def dispatch(self, request, *args, **kwargs):
         """
@@ -224,32 +548,46 @@ class RegisterView(CreateView):
         """
         if self.request.user.is_authenticated:
             return redirect('todo:tasks-list') 
+        self.object = None
         return super().dispatch(request, *args, **kwargs)
     
 
+@login_required
 def complete_task(request: HttpRequest, pk: str) -> HttpResponse:
     """
     This function is used to complete or uncomplete a Task object by updating the 'complete' attribute of the Task.
-    
+
+    The toggle is a single conditional ``UPDATE ... WHERE uuid = %s AND user_id = %s``,
+    so the row is neither fetched first nor rewritten column by column, and a
+    task of another user is never touched. A task already in the requested
+    state is left alone.
+
     Args:
         - request (HttpRequest): The HTTP request sent to the server.
         - pk (str): The uuid of the Task object to be updated.
-        
+
     Returns:
-        - HttpResponse: The HTTP response with a redirect to the tasks-list page.
+        - HttpResponse: An empty 204 response, or 404 if the user has no such task.
     """
 
-    # Retrieve the Task object using the pk
-    task = get_object_or_404(Task, uuid=pk)
-
-    # Get the 'complete' parameter from the request GET parameters
-    complete = request.GET.get('complete')
-
-    # Set the 'complete' attribute of the Task to True or False depending on the 'complete' parameter
-    task.complete = True if complete == 'True' else False
-
-    # Save the updated Task object to the database
-    task.save()
-
-    # Redirect to the tasks-list page
-    return redirect('todo:tasks-list')
+    # Set 'complete' to True or False depending on the 'complete' GET parameter
+    complete = request.GET.get('complete') == 'True'
+
+    # Update the row in one statement, scoped to the requesting user. Only a
+    # task that actually flips is written, so the summary knows it moved.
+    try:
+        tasks = Task.objects.filter(uuid=pk, user=request.user)
+        updated = tasks.exclude(complete=complete).update(
+            complete=complete, updated_at=timezone.now())
+        if not updated:
+            return HttpResponse(status=204 if tasks.exists() else 404)
+    except ValidationError:
+        return HttpResponse(status=404)
+
+    # QuerySet.update() sends no post_save signal, so invalidate cached pages
+    # and move the task in the summary here
+    bump_generation(request.user.pk)
+    apply_completion(request.user.pk, complete, tasks)
+    publish_task_event(request.user.pk, 'completed', [pk], complete=complete)
+
+    return HttpResponse(status=204)